@@ -0,0 +1,170 @@
+"""
+Resident catalogues for analytics-service.
+
+Each registered domain (music, art) is loaded once and kept in memory in two
+shapes: a pandas DataFrame for the in-process engine, and a Spark DataFrame
+partitioned by its lookup column and persisted in executor memory, so request
+handlers only build a query plan against data that is already resident. The
+Spark frame is built up front for catalogues above the pandas threshold and
+on first use otherwise (see engines.py).
+
+Both are tagged with the ETL data version (`etl:version`, bumped by every
+published ETL run) and rebuilt by the watch thread when that version moves;
+request threads only load a domain that has no frames yet. A failed or empty
+load keeps the previous frames and is retried with exponential backoff, so a
+down source costs one attempt per backoff step, not one per request.
+"""
+import sys
+import threading
+import time
+
+import pandas as pd
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, lower
+
+from shared.utils import get_data_version
+
+
+class ResidentCatalogue:
+    def __init__(self, spark, cache, partitions=4, eager_spark_rows=None, retry_seconds=30, max_retry_seconds=600):
+        """eager_spark_rows: catalogues larger than this get their Spark frame at load time"""
+        self.spark = spark
+        self.cache = cache
+        self.partitions = partitions
+        self.eager_spark_rows = eager_spark_rows
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._sources = {}
+        self._frames = {}
+        self._failures = {}  # domain -> {"version", "attempts", "retry_at", "error"} of the last failed load
+        self._lock = threading.Lock()
+
+    def register(self, domain, schema, load_rows, lower_columns=(), partition_by=None):
+        """
+        load_rows() returns the rows (tuples matching schema) of the domain.
+        lower_columns get a `<name>_lc` twin for case-insensitive lookups.
+        """
+        self._sources[domain] = {
+            "schema": schema,
+            "load_rows": load_rows,
+            "lower_columns": lower_columns,
+            "partition_by": partition_by
+        }
+
+    def rows(self, domain):
+        return self._entry(domain)["rows"]
+
+    def pandas_frame(self, domain):
+        return self._entry(domain)["pdf"]
+
+    def spark_frame(self, domain):
+        entry = self._entry(domain)
+        if entry["df"] is None:
+            with self._lock:
+                if entry["df"] is None:
+                    entry["df"] = self._build_spark(domain, entry["data"])
+        return entry["df"]
+
+    def _entry(self, domain):
+        """Current entry of a domain; newer ETL versions are picked up by watch(), not by requests"""
+        entry = self._frames.get(domain)
+        if entry:
+            return entry
+        return self.refresh(domain)
+
+    def refresh(self, domain, version=None):
+        """Reload a domain if its frames are older than the data version (unless backing off after a failure)"""
+        if version is None:
+            version = get_data_version(self.cache)
+
+        with self._lock:
+            old = self._frames.get(domain)
+            if old and old["version"] == version:
+                return old
+            failure = self._failures.get(domain)
+            if failure and failure["version"] == version and time.time() < failure["retry_at"]:
+                return old or self._empty_entry(domain, version)
+
+            start = time.time()
+            source = self._sources[domain]
+            try:
+                data = source["load_rows"]()
+                error = None if data else "source returned no rows"
+            except Exception as e:
+                data, error = [], str(e)
+            if error:
+                # Source down or empty: keep serving the previous frames, retry this version later
+                attempts = failure["attempts"] + 1 if failure and failure["version"] == version else 1
+                delay = min(self.retry_seconds * 2 ** (attempts - 1), self.max_retry_seconds)
+                self._failures[domain] = {"version": version, "attempts": attempts,
+                                          "retry_at": time.time() + delay, "error": error}
+                print(f"⚠️ [CATALOGUE] {domain}: load of version {version} failed ({error}), "
+                      f"keeping {'version ' + str(old['version']) if old else 'no frames'}, retry in {delay}s",
+                      file=sys.stderr)
+                return old or self._empty_entry(domain, version)
+
+            self._failures.pop(domain, None)
+            entry = {"version": version, "rows": len(data), "data": data, "df": None,
+                     "pdf": self._build_pandas(domain, data), "loaded_at": time.time()}
+
+            if self.eager_spark_rows is not None and len(data) > self.eager_spark_rows:
+                entry["df"] = self._build_spark(domain, data)
+            self._frames[domain] = entry
+            print(f"✅ [CATALOGUE] {domain}: {len(data)} rows cached (version {version}, "
+                  f"spark={'yes' if entry['df'] is not None else 'lazy'}) in {time.time() - start:.1f}s",
+                  file=sys.stderr)
+
+        if old and old["df"] is not None:
+            old["df"].unpersist()
+        return entry
+
+    def _empty_entry(self, domain, version):
+        """Frames of a domain that could not be loaded yet (not cached)"""
+        return {"version": version, "rows": 0, "data": [], "df": None,
+                "pdf": self._build_pandas(domain, []), "loaded_at": time.time()}
+
+    def _build_pandas(self, domain, data):
+        source = self._sources[domain]
+        pdf = pd.DataFrame(data, columns=source["schema"].fieldNames())
+        for field in source["schema"].fields:
+            if field.dataType.typeName() == "integer":
+                # Missing years become NaN instead of turning the column into objects
+                pdf[field.name] = pd.to_numeric(pdf[field.name], errors="coerce")
+        for name in source["lower_columns"]:
+            pdf[f"{name}_lc"] = pdf[name].fillna("").str.lower()
+        return pdf
+
+    def _build_spark(self, domain, data):
+        source = self._sources[domain]
+        df = self.spark.createDataFrame(data, schema=source["schema"])
+        for name in source["lower_columns"]:
+            df = df.withColumn(f"{name}_lc", lower(col(name)))
+        if source["partition_by"]:
+            df = df.repartition(self.partitions, col(source["partition_by"]))
+        df = df.persist(StorageLevel.MEMORY_ONLY)
+        # Materialize now so the first Spark request does not pay for the load
+        df.count()
+        return df
+
+    def watch(self, interval=10):
+        """Background loop: reload every registered domain when etl:version changes"""
+        while True:
+            for domain in list(self._sources):
+                try:
+                    self.refresh(domain)
+                except Exception as e:
+                    print(f"❌ [CATALOGUE] {domain} refresh failed: {e}", file=sys.stderr)
+            time.sleep(interval)
+
+    def stats(self):
+        stats = {
+            domain: {"version": entry["version"], "rows": entry["rows"],
+                     "spark_resident": entry["df"] is not None,
+                     "age_seconds": round(time.time() - entry["loaded_at"], 1)}
+            for domain, entry in self._frames.items()
+        }
+        for domain, failure in self._failures.items():
+            stats.setdefault(domain, {})["failed_load"] = {
+                "version": failure["version"], "attempts": failure["attempts"], "error": failure["error"],
+                "retry_in_seconds": max(0, round(failure["retry_at"] - time.time(), 1))}
+        return stats
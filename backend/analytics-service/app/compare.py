@@ -0,0 +1,133 @@
+"""
+Single-pass metrics for /analytics/compare.
+
+The engine (see engines.py) reduces both groups with ONE aggregation over
+(side, pivot, decade) and returns small "cells"; every group metric (totals,
+diversity, top-N, year stats, decade histogram, rare-value ratio,
+common/unique pivot values) is derived here from those cells. The band
+overlap is a second aggregation, so a Spark compare costs two jobs.
+"""
+from shared.utils import normalize
+
+EMPTY_STATS = {
+    "total_bands": 0, "diversity_score": 0,
+    "top_distribution": [], "avg_founded_year": "N/A", "era_range": "N/A",
+    "decade_breakdown": {}, "most_productive_decade": "N/A", "genre_uniqueness": 0
+}
+
+
+MODES = ("country", "genre")
+
+
+def pivot_column(mode):
+    """Country comparisons break groups down by genre, genre comparisons by location"""
+    return "genre" if mode == "country" else "location"
+
+
+def group_stats(cells, top_n=3, rare_share=0.05):
+    """Group metrics from its cells; returns (stats, set of pivot values)"""
+    total = sum(cell[2] for cell in cells)
+    if total == 0:
+        return dict(EMPTY_STATS), set()
+
+    pivots = {}
+    decades = {}
+    year_rows, year_sum, oldest, newest = 0, 0, None, None
+    for value, decade, rows, y_rows, y_sum, y_min, y_max in cells:
+        pivots[value] = pivots.get(value, 0) + rows
+        if y_rows:
+            year_rows += y_rows
+            year_sum += y_sum
+            oldest = y_min if oldest is None else min(oldest, y_min)
+            newest = y_max if newest is None else max(newest, y_max)
+            decades[decade] = decades.get(decade, 0) + y_rows
+
+    top = sorted(pivots.items(), key=lambda kv: (-kv[1], str(kv[0])))[:top_n]
+    stats = dict(EMPTY_STATS)
+    stats.update({
+        "total_bands": total,
+        "diversity_score": round(len(pivots) / total * 100, 1),
+        "top_distribution": [f"{value} ({n})" for value, n in top]
+    })
+
+    if year_rows:
+        decade_counts = sorted(decades.items())
+        best_decade, best_count = max(decade_counts, key=lambda kv: kv[1])
+        # Genre Uniqueness Score: % of pivot values holding < 5% of the group
+        rare = sum(1 for n in pivots.values() if n < total * rare_share)
+        stats.update({
+            "avg_founded_year": int(year_sum / year_rows),
+            "era_range": f"{oldest} - {newest}",
+            "decade_breakdown": {f"{decade}s": n for decade, n in decade_counts},
+            "most_productive_decade": f"{best_decade}s ({best_count} bands)",
+            "genre_uniqueness": round(rare / len(pivots) * 100, 1)
+        })
+    return stats, set(pivots)
+
+
+def comparative_insights(t1, t2, stats1, stats2, values1, values2):
+    """Common / unique pivot values and per-category winners"""
+    common = sorted(values1 & values2, key=str)
+    insights = {
+        "common_elements": common[:5],
+        "unique_to_" + t1.replace(" ", "_"): sorted(values1 - values2, key=str)[:3],
+        "unique_to_" + t2.replace(" ", "_"): sorted(values2 - values1, key=str)[:3]
+    }
+
+    year1, year2 = stats1["avg_founded_year"], stats2["avg_founded_year"]
+    insights["insights"] = {
+        "more_diverse": t1 if stats1["diversity_score"] > stats2["diversity_score"] else t2,
+        "more_prolific": t1 if stats1["total_bands"] > stats2["total_bands"] else t2,
+        "oldest_scene": t1 if isinstance(year1, int) and isinstance(year2, int) and year1 < year2 else t2
+    }
+    return insights
+
+
+def compare_key(mode, t1, t2):
+    """
+    Symmetric cache key: "A vs B" and "B vs A" share one entry.
+    Returns (key parts, swapped) where swapped means t1/t2 were reversed.
+    """
+    n1, n2 = normalize(t1), normalize(t2)
+    swapped = n1 > n2
+    return ["compare", normalize(mode), *((n2, n1) if swapped else (n1, n2))], swapped
+
+
+def compare_groups(engine, df1, df2, mode):
+    """
+    Label-free compare result (one group aggregation + one overlap), so it
+    can be cached once per unordered pair and rendered for either order.
+    """
+    cells1, cells2 = engine.group_cells(df1, df2, pivot_column(mode))
+    stats1, values1 = group_stats(cells1)
+    stats2, values2 = group_stats(cells2)
+
+    both = stats1["total_bands"] > 0 and stats2["total_bands"] > 0
+    return {
+        "stats": [stats1, stats2],
+        "values": [sorted(values1, key=str), sorted(values2, key=str)],
+        "overlap": engine.overlap_count(df1, df2) if both else 0,
+        "engine": engine.name
+    }
+
+
+def render_compare(result, mode, t1, t2, swapped=False):
+    """Response payload of /analytics/compare for the requested side order"""
+    stats, values = result["stats"], result["values"]
+    if swapped:
+        stats, values = stats[::-1], values[::-1]
+    stats1, stats2 = stats
+    both = stats1["total_bands"] > 0 and stats2["total_bands"] > 0
+
+    return {
+        "mode": mode,
+        "comparison": f"{t1} vs {t2}",
+        "data": {
+            t1: stats1,
+            t2: stats2
+        },
+        "overlap": result["overlap"],
+        "comparative_insights": comparative_insights(t1, t2, stats1, stats2, set(values[0]), set(values[1]))
+        if both else {},
+        "engine": result["engine"]
+    }
@@ -0,0 +1,161 @@
+"""
+Execution engines for the analytics endpoints.
+
+The catalogues this service works on are small (a few thousand rows), where
+Spark's JVM round-trips dominate latency. PandasEngine runs the same
+operations vectorized in-process; SparkEngine runs them on the resident
+Spark DataFrames. pick_engine() chooses by the number of rows the request
+scans (ANALYTICS_PANDAS_MAX_ROWS) and every response reports the engine used
+in the X-Analytics-Engine header, so the threshold can be tuned.
+"""
+import os
+import threading
+
+from pyspark.sql.functions import col, count, floor, lit, when
+from pyspark.sql.functions import max as spark_max, min as spark_min, sum as spark_sum
+
+PANDAS_MAX_ROWS = int(os.getenv("ANALYTICS_PANDAS_MAX_ROWS", "50000"))
+
+# Same cap as the per-group Fuseki query the compare endpoint used to run
+GROUP_LIMIT = 3000
+
+
+def group_column(mode):
+    return "location_lc" if mode == "country" else "genre_lc"
+
+
+class SparkEngine:
+    name = "spark"
+
+    def frame(self, catalogue, domain):
+        return catalogue.spark_frame(domain)
+
+    def first_match(self, df, column, value):
+        row = df.filter(col(column) == value).first()
+        return row.asDict() if row else None
+
+    def similar(self, df, any_of, exclude, columns, limit=5, distinct=False):
+        """Rows equal to any of any_of's (column, value) pairs, minus the excluded one"""
+        cond = None
+        for column, value in any_of.items():
+            cond = col(column) == value if cond is None else cond | (col(column) == value)
+        result = df.filter(cond & (col(exclude[0]) != exclude[1])).select(*columns)
+        if distinct:
+            result = result.distinct()
+        return [row.asDict() for row in result.limit(limit).collect()]
+
+    def select_group(self, df, mode, target, limit=GROUP_LIMIT):
+        """Rows of the music catalogue whose location / genre contains target"""
+        return df.filter(col(group_column(mode)).contains(target.lower()) &
+                         (col("genre_lc") != "unknown")).limit(limit)
+
+    def group_cells(self, df1, df2, pivot_col):
+        """
+        One aggregation for both groups. Returns two lists of cells
+        (pivot value, decade, rows, rows with year, year sum, oldest, newest).
+        """
+        tagged = df1.withColumn("side", lit(1)).unionByName(df2.withColumn("side", lit(2)))
+        rows = tagged.withColumn("decade", (floor(col("year") / 10) * 10).cast("int")) \
+            .groupBy("side", pivot_col, "decade") \
+            .agg(count(lit(1)).alias("rows"),
+                 count("year").alias("year_rows"),
+                 spark_sum("year").alias("year_sum"),
+                 spark_min("year").alias("oldest"),
+                 spark_max("year").alias("newest")) \
+            .collect()
+
+        cells = {1: [], 2: []}
+        for r in rows:
+            cells[r["side"]].append((r[pivot_col], r["decade"], r["rows"], r["year_rows"],
+                                     r["year_sum"], r["oldest"], r["newest"]))
+        return cells[1], cells[2]
+
+    def overlap_count(self, df1, df2):
+        """Same count as df1.join(df2, "name").count(), as a single aggregation"""
+        tagged = df1.select("name", lit(1).alias("side")).unionByName(df2.select("name", lit(2).alias("side")))
+        row = tagged.groupBy("name") \
+            .agg(spark_sum(when(col("side") == 1, 1).otherwise(0)).alias("n1"),
+                 spark_sum(when(col("side") == 2, 1).otherwise(0)).alias("n2")) \
+            .agg(spark_sum(col("n1") * col("n2")).alias("pairs")) \
+            .collect()[0]
+        return int(row["pairs"] or 0)
+
+
+class PandasEngine:
+    name = "pandas"
+
+    def frame(self, catalogue, domain):
+        return catalogue.pandas_frame(domain)
+
+    def first_match(self, df, column, value):
+        rows = df[df[column] == value]
+        return _plain(rows.iloc[0].to_dict()) if len(rows) else None
+
+    def similar(self, df, any_of, exclude, columns, limit=5, distinct=False):
+        mask = None
+        for column, value in any_of.items():
+            mask = df[column] == value if mask is None else mask | (df[column] == value)
+        result = df[mask & (df[exclude[0]] != exclude[1])][list(columns)]
+        if distinct:
+            result = result.drop_duplicates()
+        return [_plain(r) for r in result.head(limit).to_dict("records")]
+
+    def select_group(self, df, mode, target, limit=GROUP_LIMIT):
+        mask = df[group_column(mode)].str.contains(target.lower(), regex=False) & (df["genre_lc"] != "unknown")
+        return df[mask].head(limit)
+
+    def group_cells(self, df1, df2, pivot_col):
+        return self._cells(df1, pivot_col), self._cells(df2, pivot_col)
+
+    def _cells(self, df, pivot_col):
+        if df.empty:
+            return []
+        decade = (df["year"] // 10) * 10
+        grouped = df.assign(decade=decade).groupby([pivot_col, "decade"], dropna=False)["year"] \
+            .agg(["size", "count", "sum", "min", "max"])
+        cells = []
+        for (value, dec), r in grouped.iterrows():
+            has_year = r["count"] > 0
+            cells.append((value, int(dec) if has_year else None, int(r["size"]), int(r["count"]),
+                          int(r["sum"]) if has_year else None,
+                          int(r["min"]) if has_year else None,
+                          int(r["max"]) if has_year else None))
+        return cells
+
+    def overlap_count(self, df1, df2):
+        n1 = df1["name"].value_counts()
+        n2 = df2["name"].value_counts()
+        return int((n1 * n2.reindex(n1.index, fill_value=0)).sum())
+
+
+SPARK = SparkEngine()
+PANDAS = PandasEngine()
+ENGINES = {engine.name: engine for engine in (SPARK, PANDAS)}
+
+_usage = {name: 0 for name in ENGINES}
+_usage_lock = threading.Lock()
+
+
+def pick_engine(rows, requested=None):
+    """Explicit ?engine= wins; otherwise pandas up to PANDAS_MAX_ROWS scanned rows"""
+    engine = ENGINES.get(requested) or (PANDAS if rows <= PANDAS_MAX_ROWS else SPARK)
+    with _usage_lock:
+        _usage[engine.name] += 1
+    return engine
+
+
+def usage():
+    with _usage_lock:
+        return {"pandas_max_rows": PANDAS_MAX_ROWS, "requests": dict(_usage)}
+
+
+def _plain(record):
+    """numpy scalars / NaN -> JSON-friendly Python values"""
+    out = {}
+    for key, value in record.items():
+        if hasattr(value, "item"):
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            value = None
+        out[key] = value
+    return out
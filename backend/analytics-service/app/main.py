@@ -2,15 +2,23 @@ import sys
 import os
 import time
 import re
+import json
+import redis
+import threading
 from datetime import datetime
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from SPARQLWrapper import SPARQLWrapper, JSON
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, avg, count, min as spark_min, max as spark_max, floor
 # --- IMPORTURI NOI PENTRU SCHEMĂ ---
 from pyspark.sql.types import StructType, StructField, StringType, IntegerType
-from pyspark.sql.functions import lower, col, lit
+from shared import aggregates, redis_index
+from shared.columnar import ColumnarCatalogue
+from shared.result_cache import ResultCache
+from shared.sparql_client import SparqlClient
+from catalogue import ResidentCatalogue
+from compare import MODES as COMPARE_MODES, compare_key, compare_groups, render_compare
+from music_stats import MusicStats
+from engines import pick_engine, usage as engine_usage, PANDAS_MAX_ROWS
 
 app = Flask(__name__)
 CORS(app)
@@ -26,8 +34,12 @@ DATA_LAKE_PATH = "/app/data_lake/comparisons"
 
 FUSEKI_HOST = os.getenv('FUSEKI_HOST', 'fuseki')
 FUSEKI_ENDPOINT = f"http://{FUSEKI_HOST}:3030/bir/query"
-sparql_client = SPARQLWrapper(FUSEKI_ENDPOINT)
-sparql_client.setReturnFormat(JSON)
+FUSEKI_QUERY_URL = FUSEKI_ENDPOINT
+
+cache = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
+
+# Client SPARQL comun: conexiuni reutilizate, rezultate cache-uite în Redis per versiune ETL
+fuseki = SparqlClient(FUSEKI_QUERY_URL, cache, namespace="sparql:analytics")
 
 def clean_value(val):
     """Curăță URL-urile urâte și păstrează doar numele."""
@@ -36,234 +48,142 @@ def clean_value(val):
         val = val.split('/')[-1].split('#')[-1]
     return val.replace('_', ' ')
 
-def fetch_dynamic_data(criteria, target_value):
-    print(f"📥 Fetching data for {criteria} = {target_value}...", file=sys.stderr)
-
-    filter_logic = ""
-    if criteria == 'country':
-        filter_logic = f"""
-        FILTER (
-            contains(lcase(str(?location)), lcase("{target_value}"))
-        )
-        """
-    elif criteria == 'genre':
-        filter_logic = f"""
-        FILTER (
-            contains(lcase(str(?genreLabel)), lcase("{target_value}")) || 
-            contains(lcase(str(?genre)), lcase("{target_value}"))
-        )
-        """
+# --- CATALOAGE REZIDENTE (încărcate o dată, reîmprospătate la fiecare etl:version nou) ---
+MUSIC_CATALOGUE_QUERY = """
+PREFIX schema: <http://schema.org/>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+
+SELECT ?name ?genre ?location ?startYear
+WHERE {
+  ?s a schema:MusicGroup ;
+     schema:name ?name .
+  OPTIONAL { ?s schema:genre ?genre }
+  OPTIONAL { ?s schema:location ?location }
+  OPTIONAL { ?s dbo:activeYearsStartYear ?startYear }
+}
+"""
+
+MUSIC_SCHEMA = StructType([
+    StructField("name", StringType(), True),
+    StructField("genre", StringType(), True),
+    StructField("location", StringType(), True),
+    StructField("year", IntegerType(), True)
+])
+
+ART_SCHEMA = StructType([
+    StructField("name", StringType(), True),
+    StructField("creator", StringType(), True),
+    StructField("movement", StringType(), True)
+])
+
+
+def parse_year(value):
+    try:
+        return int(value[:4])
+    except (TypeError, ValueError):
+        return None
 
-    query = f"""
-    PREFIX schema: <http://schema.org/>
-    PREFIX dbo: <http://dbpedia.org/ontology/>
-    
-    SELECT ?bandName ?location ?genre ?genreLabel ?startYear
-    WHERE {{
-      ?band a schema:MusicGroup ;
-            schema:name ?bandName .
-      
-      OPTIONAL {{ ?band schema:location ?location }}
-      
-      ?band schema:genre ?genre .
-      OPTIONAL {{ ?genre <http://www.w3.org/2000/01/rdf-schema#label> ?genreLabel }}
-      
-      OPTIONAL {{ ?band dbo:activeYearsStartYear ?startYear }}
 
-      {filter_logic}
-    }}
-    LIMIT 3000
-    """
-    
-    sparql_client.setQuery(query)
-    try:
-        results = sparql_client.query().convert()
-        data = []
-        years_found = 0
-        for r in results["results"]["bindings"]:
-            band = clean_value(r["bandName"]["value"])
-            loc = clean_value(r["location"]["value"]) if "location" in r else "Unknown"
+def load_music_rows():
+    """Toate trupele din Fuseki: un rând per (trupă, gen, locație)"""
+    # Încărcare mare, o singură dată per versiune ETL: nu are rost în cache-ul de rezultate
+    bindings = fuseki.select(MUSIC_CATALOGUE_QUERY, cache=False, timeout=120)
+    return [(
+        clean_value(r["name"]["value"]),
+        clean_value(r["genre"]["value"]) if "genre" in r else "Unknown",
+        clean_value(r["location"]["value"]) if "location" in r else "Unknown",
+        parse_year(r["startYear"]["value"]) if "startYear" in r else None
+    ) for r in bindings]
 
-            if "genreLabel" in r:
-                gen = clean_value(r["genreLabel"]["value"])
-            elif "genre" in r:
-                gen = clean_value(r["genre"]["value"])
-            else:
-                gen = "Unknown"
 
-            year = r["startYear"]["value"] if "startYear" in r else None
+def load_art_rows():
+    """Toate operele din lista art:all scrisă de ETL"""
+    return [(
+        art.get('name', 'Unknown'),
+        art.get('creator', 'Unknown'),
+        art.get('movement', 'Unknown')
+    ) for art in (json.loads(a) for a in cache.lrange("art:all", 0, -1))]
 
-            if year:
-                try:
-                    year = int(year[:4])
-                    years_found += 1
-                except: year = None
 
-            data.append({
-                "band": band,
-                "location": loc,
-                "genre": gen,
-                "year": year,
-                "target": target_value
-            })
-        print(f"✅ Fetched {len(data)} bands for {target_value}, {years_found} with years", file=sys.stderr)
-        return data
-    except Exception as e:
-        print(f"❌ Error fetching {target_value}: {e}", file=sys.stderr)
-        return []
+catalogue = ResidentCatalogue(spark, cache, partitions=int(os.getenv("CATALOGUE_PARTITIONS", "4")),
+                              eager_spark_rows=PANDAS_MAX_ROWS)
+catalogue.register("music", MUSIC_SCHEMA, load_music_rows,
+                   lower_columns=("name", "genre", "location"), partition_by="genre_lc")
+catalogue.register("art", ART_SCHEMA, load_art_rows,
+                   lower_columns=("name", "creator", "movement"), partition_by="creator_lc")
+
+compare_cache = ResultCache(cache, "analytics:compare", ttl=int(os.getenv("COMPARE_CACHE_TTL", "3600")))
+
+# Catalog columnar (coduri NumPy) din <domain>:all: lookup-uri și similaritate fără Redis/Spark per request
+columns = ColumnarCatalogue(cache)
+
+# Statistici muzică din agregatele materializate de ETL (shared/aggregates.py)
+music_stats = MusicStats(cache, fuseki)
+
+
+def with_engine(response, engine):
+    """Expune motorul care a servit request-ul (pt tuning ANALYTICS_PANDAS_MAX_ROWS)"""
+    response.headers["X-Analytics-Engine"] = getattr(engine, "name", engine)
+    return response
+
 
 @app.route('/analytics/compare', methods=['GET'])
 def compare_universal():
-    mode = request.args.get('mode', 'country')
+    # Modul normalizat o singură dată: filtrul, pivotul, cheia de cache și răspunsul folosesc aceeași valoare
+    mode = request.args.get('mode', 'country').strip().lower()
+    if mode not in COMPARE_MODES:
+        return jsonify({"error": f"Unknown mode '{mode}', expected one of: {', '.join(COMPARE_MODES)}"}), 400
     t1 = request.args.get('t1', 'United States')
     t2 = request.args.get('t2', 'United Kingdom')
 
-    raw_data1 = fetch_dynamic_data(mode, t1)
-    raw_data2 = fetch_dynamic_data(mode, t2)
+    # Cache Redis pe perechea neordonată (A vs B == B vs A), invalidat de etl:version
+    key_parts, swapped = compare_key(mode, t1, t2)
+    first, second = key_parts[2], key_parts[3]  # ținte normalizate, în ordinea canonică
+    requested_engine = request.args.get('engine')
+    if requested_engine:
+        key_parts.append(requested_engine)
+
+    def compute():
+        # Grupurile se filtrează din catalogul rezident (fără query-uri Fuseki per request)
+        engine = pick_engine(catalogue.rows("music"), requested_engine)
+        music = engine.frame(catalogue, "music")
+        df1 = engine.select_group(music, mode, first)
+        df2 = engine.select_group(music, mode, second)
+
+        # Toate metricile ambelor grupuri într-o singură agregare + o agregare pt overlap
+        print(f"📊 Comparing {first} vs {second} ({mode}) with {engine.name}...", file=sys.stderr)
+        return compare_groups(engine, df1, df2, mode)
+
+    try:
+        result, cache_status = compare_cache.get_or_compute(key_parts, compute)
+    except Exception as e:
+        print(f"❌ Compare failed: {e}", file=sys.stderr)
+        return jsonify({"error": str(e)}), 500
+
+    response = render_compare(result, mode, t1, t2, swapped)
+    response["cache"] = cache_status
+    stats1, stats2 = response["data"][t1], response["data"][t2]
 
     # Dacă nu găsim nimic, nu mai are sens să continuăm
-    if not raw_data1 and not raw_data2:
+    if stats1["total_bands"] == 0 and stats2["total_bands"] == 0:
          return jsonify({"error": f"Nu am găsit date nici pentru {t1}, nici pentru {t2}."}), 404
 
-    # --- DEFINIRE SCHEMA EXPLICITĂ (AICI REPARĂM EROAREA) ---
-    schema = StructType([
-        StructField("band", StringType(), True),
-        StructField("location", StringType(), True),
-        StructField("genre", StringType(), True),
-        StructField("year", IntegerType(), True), # Îi spunem forțat că e număr!
-        StructField("target", StringType(), True)
-    ])
-
-    # Creăm DataFrame-urile folosind schema
-    # (Dacă lista e goală, va crea un tabel gol cu structura corectă, fără erori)
-    df1 = spark.createDataFrame(raw_data1 if raw_data1 else [], schema=schema)
-    df2 = spark.createDataFrame(raw_data2 if raw_data2 else [], schema=schema)
-
-    def analyze_group(df):
-        # Dacă tabelul e gol, returnăm direct 0
-        if df.count() == 0:
-            return {
-                "total_bands": 0, "diversity_score": 0,
-                "top_distribution": [], "avg_founded_year": "N/A", "era_range": "N/A",
-                "decade_breakdown": {}, "most_productive_decade": "N/A", "genre_uniqueness": 0
-            }
-
-        count_bands = df.count()
-        pivot_col = "genre" if mode == 'country' else "location"
-
-        diversity = df.select(pivot_col).distinct().count()
-        top_items = df.groupBy(pivot_col).count().orderBy(col("count").desc()).limit(3).collect()
-        top_list = [f"{row[pivot_col]} ({row['count']})" for row in top_items]
-
-        # Calculăm anii doar dacă există valori non-null
-        year_df = df.filter(col("year").isNotNull())
-        if year_df.count() > 0:
-            year_stats = year_df.select(
-                avg("year").alias("avg_year"),
-                spark_min("year").alias("oldest"),
-                spark_max("year").alias("newest")
-            ).collect()[0]
-
-            avg_val = int(year_stats['avg_year'])
-            range_val = f"{year_stats['oldest']} - {year_stats['newest']}"
-
-            # --- NOI METRICI AVANSATE ---
-
-            # 1. Breakdown pe decade
-            decade_df = year_df.withColumn("decade", floor(col("year") / 10) * 10)
-            decade_counts = decade_df.groupBy("decade").count().orderBy("decade").collect()
-            decade_breakdown = {f"{int(row['decade'])}s": row['count'] for row in decade_counts}
-
-            # 2. Cea mai productivă decadă
-            most_productive = max(decade_counts, key=lambda x: x['count'], default=None)
-            most_productive_decade = f"{int(most_productive['decade'])}s ({most_productive['count']} bands)" if most_productive else "N/A"
-
-            # 3. Genre Uniqueness Score (numărul de genuri unice/rare cu < 5% din total)
-            genre_counts = df.groupBy(pivot_col).count().collect()
-            rare_genres = sum(1 for row in genre_counts if row['count'] < count_bands * 0.05)
-            genre_uniqueness = round(rare_genres / len(genre_counts) * 100, 1) if genre_counts else 0
+    print(f"📤 Sending response ({cache_status}): {response}", file=sys.stderr)
 
-        else:
-            avg_val = "N/A"
-            range_val = "N/A"
-            decade_breakdown = {}
-            most_productive_decade = "N/A"
-            genre_uniqueness = 0
-
-        return {
-            "total_bands": count_bands,
-            "diversity_score": round(diversity / count_bands * 100, 1) if count_bands > 0 else 0,
-            "top_distribution": top_list,
-            "avg_founded_year": avg_val,
-            "era_range": range_val,
-            "decade_breakdown": decade_breakdown,
-            "most_productive_decade": most_productive_decade,
-            "genre_uniqueness": genre_uniqueness
-        }
-
-    print(f"📊 Analyzing group 1: {t1}...", file=sys.stderr)
-    stats1 = analyze_group(df1)
-    print(f"✅ Stats1: {stats1}", file=sys.stderr)
-
-    print(f"📊 Analyzing group 2: {t2}...", file=sys.stderr)
-    stats2 = analyze_group(df2)
-    print(f"✅ Stats2: {stats2}", file=sys.stderr)
-
-    # Calculăm overlap doar dacă ambele DataFrame-uri au date
-    print(f"🔍 Calculating overlap...", file=sys.stderr)
-    if df1.count() > 0 and df2.count() > 0:
-        overlap_count = df1.join(df2, "band").count()
-    else:
-        overlap_count = 0
-    print(f"✅ Overlap: {overlap_count}", file=sys.stderr)
-
-    # --- METRICI COMPARATIVE CROSS-GROUP ---
-    comparative_insights = {}
-
-    if df1.count() > 0 and df2.count() > 0:
-        pivot_col = "genre" if mode == 'country' else "location"
-
-        # 1. Genuri/Locații comune
-        genres1 = set([row[pivot_col] for row in df1.select(pivot_col).distinct().collect()])
-        genres2 = set([row[pivot_col] for row in df2.select(pivot_col).distinct().collect()])
-
-        common = genres1 & genres2
-        unique_1 = genres1 - genres2
-        unique_2 = genres2 - genres1
-
-        comparative_insights["common_elements"] = list(common)[:5]
-        comparative_insights["unique_to_" + t1.replace(" ", "_")] = list(unique_1)[:3]
-        comparative_insights["unique_to_" + t2.replace(" ", "_")] = list(unique_2)[:3]
-
-        # 2. "Winner" pe diferite categorii
-        winner_diversity = t1 if stats1["diversity_score"] > stats2["diversity_score"] else t2
-        winner_volume = t1 if stats1["total_bands"] > stats2["total_bands"] else t2
-
-        comparative_insights["insights"] = {
-            "more_diverse": winner_diversity,
-            "more_prolific": winner_volume,
-            "oldest_scene": t1 if isinstance(stats1["avg_founded_year"], int) and isinstance(stats2["avg_founded_year"], int) and stats1["avg_founded_year"] < stats2["avg_founded_year"] else t2
-        }
-
-    response = {
-        "mode": mode,
-        "comparison": f"{t1} vs {t2}",
-        "data": {
-            t1: stats1,
-            t2: stats2
-        },
-        "overlap": overlap_count,
-        "comparative_insights": comparative_insights
-    }
-    print(f"📤 Sending response: {response}", file=sys.stderr)
-    
+    # Jurnalul din data lake se scrie în fundal, ca un hit din cache să rămână rapid
+    record = [{"ts": time.time(), "mode": mode, "t1": t1, "t2": t2, "overlap": response["overlap"]}]
+    threading.Thread(target=log_comparison, args=(record,), daemon=True).start()
+
+    return with_engine(jsonify(response), result["engine"])
+
+
+def log_comparison(record):
     try:
-        record = [{"ts": time.time(), "mode": mode, "t1": t1, "t2": t2, "overlap": overlap_count}]
         # Aici nu mai definim schema că e simplu, Spark se descurcă
         spark.createDataFrame(record).write.mode("append").parquet(DATA_LAKE_PATH)
     except: pass
 
-    return jsonify(response)
+
 @app.route('/analytics/natural-search', methods=['GET'])
 def natural_search():
     query_text = request.args.get('q', '').lower()
@@ -322,11 +242,9 @@ def natural_search():
     
     print(f"🛠️ Generated SPARQL:\n{query}", file=sys.stderr) # Debug print
 
-    sparql_client.setQuery(query)
     try:
-        results = sparql_client.query().convert()
         data = []
-        for r in results["results"]["bindings"]:
+        for r in fuseki.select(query):
             # LOGICA DE FALLBACK PENTRU NUME
             if "genreLabel" in r:
                 name = clean_value(r["genreLabel"]["value"])
@@ -352,96 +270,100 @@ def natural_search():
         print(f"❌ Error in NLP Search: {e}", file=sys.stderr)
         return jsonify({"error": str(e)}), 500
     
+def find_target(domain, name):
+    """Catalogue object by name: columnar table once loaded, else the Redis index"""
+    table = columns.get(domain)
+    if table is not None:
+        row = table.find(name)
+        return table.row(row) if row is not None else None
+    return redis_index.find_by_name(cache, domain, name)
+
+
+def columnar_similar(domain, name, groups, limit=5):
+    """[(catalogue object, matched fields)] for an exact name, None until the columnar table is loaded"""
+    table = columns.get(domain)
+    if table is None:
+        return None
+    row = table.find(name)
+    if row is None or table.names[row].lower() != name.lower():
+        return []
+    return [(table.row(match), group) for match, group in table.similar(row, groups, limit=limit)]
+
+
+def precomputed_similar(domain, name, limit=5):
+    """Top neighbours from the precomputed <domain>:sim hash, None if not available"""
+    try:
+        target = find_target(domain, name)
+        if not target or target.get('name', '').lower() != name.lower():
+            return None
+        neighbours = redis_index.get_neighbours(cache, domain, target['id'])
+    except Exception as e:
+        print(f"⚠️ Precomputed neighbours lookup failed: {e}", file=sys.stderr)
+        return None
+    if neighbours is None:
+        return None
+    return [{"name": n["name"], "reason": "; ".join(n["reasons"]), "score": n["score"]}
+            for n in neighbours[:limit]]
+
+
 @app.route('/analytics/similar', methods=['GET'])
 def get_similar_items():
     band_name = request.args.get('band', '')
     if not band_name:
         return jsonify([])
 
-    print(f"⚡ Spark is finding similars for: {band_name}", file=sys.stderr)
+    # 0. FAST PATH: vecinii precalculați de recommendation-service (similarity.py)
+    neighbours = precomputed_similar("music", band_name)
+    if neighbours is not None:
+        return jsonify(neighbours)
 
-    # 1. FETCH RAW DATA: Luăm TOT din Fuseki (nu filtrăm încă)
-    # Aducem Numele și Genul pentru toate trupele din bază
-    query = """
-    PREFIX schema: <http://schema.org/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    # 1. CATALOGUL COLUMNAR: același gen, operații vectoriale pe coduri
+    try:
+        matches = columnar_similar("music", band_name, (("genre",),))
+        if matches is not None:
+            return jsonify([{"name": doc['name'], "reason": f"Same genre: {doc['genre']}"} for doc, _ in matches])
+    except Exception as e:
+        print(f"⚠️ Columnar lookup failed, falling back to Spark: {e}", file=sys.stderr)
 
-    SELECT ?name ?genre ?genreLabel
-    WHERE {
-      ?s a schema:MusicGroup ;
-         schema:name ?name .
-      
-      OPTIONAL { 
-        ?s schema:genre ?genre .
-        OPTIONAL { ?genre rdfs:label ?genreLabel }
-      }
-    }
-    LIMIT 10000
-    """
-    
-    sparql_client.setQuery(query)
+    print(f"⚡ Spark is finding similars for: {band_name}", file=sys.stderr)
+
+    # 1. CATALOGUL REZIDENT (nu mai descărcăm 10k rânduri per click)
     try:
-        results = sparql_client.query().convert()
-        raw_data = []
-        
-        for r in results["results"]["bindings"]:
-            b_name = clean_value(r["name"]["value"])
-            
-            # Încercăm să luăm eticheta genului, dacă nu, curățăm linkul
-            if "genreLabel" in r:
-                g_val = r["genreLabel"]["value"]
-            elif "genre" in r:
-                g_val = clean_value(r["genre"]["value"])
-            else:
-                g_val = "Unknown"
-                
-            raw_data.append((b_name, g_val))
-            
+        engine = pick_engine(catalogue.rows("music"), request.args.get('engine'))
+        df = engine.frame(catalogue, "music")
     except Exception as e:
-        print(f"❌ Error fetching raw data: {e}", file=sys.stderr)
+        print(f"❌ Error loading music catalogue: {e}", file=sys.stderr)
         return jsonify([])
 
-    # 2. CREARE DATAFRAME SPARK
-    schema = StructType([
-        StructField("name", StringType(), True),
-        StructField("genre", StringType(), True)
-    ])
-    
-    # Încărcăm datele brute în Spark
-    df = spark.createDataFrame(raw_data, schema=schema)
-
-    # 3. PROCESARE SPARK
+    # 2. PROCESARE (pandas sau Spark, datele sunt deja în memorie)
     
     # A. Găsim genul trupei căutate (ex: Daft Punk)
     # Filter: name == band_name (case insensitive)
-    target_row = df.filter(lower(col("name")) == band_name.lower()).first()
+    target_row = engine.first_match(df, "name_lc", band_name.lower())
     
     if not target_row:
-        return jsonify([]) # Trupa nu există în datele noastre
+        return with_engine(jsonify([]), engine) # Trupa nu există în datele noastre
 
     target_genre = target_row['genre']
     
     if target_genre == "Unknown":
-         return jsonify([])
+         return with_engine(jsonify([]), engine)
 
     # B. Găsim alte trupe cu același gen
-    # Filter: genre == target_genre AND name != band_name
-    similar_df = df.filter(
-        (lower(col("genre")) == target_genre.lower()) & 
-        (lower(col("name")) != band_name.lower())
-    ).limit(5) # Luăm doar primele 5
-
-    # 4. REZULTATE
-    similars = similar_df.collect()
+    # Filter: genre == target_genre AND name != band_name (primele 5)
+    similars = engine.similar(df, {"genre_lc": target_genre.lower()}, ("name_lc", band_name.lower()),
+                              ("name", "genre"), limit=5, distinct=True)
+
+    # 3. REZULTATE
     
     output = []
     for row in similars:
         output.append({
             "name": row['name'],
-            "reason": row['genre'] # Trimitem genul ca motiv al similarității
+            "reason": f"Same genre: {row['genre']}" # Trimitem genul ca motiv al similarității
         })
 
-    return jsonify(output)
+    return with_engine(jsonify(output), engine)
     
 
 
@@ -454,54 +376,53 @@ def get_similar_artworks():
     if not artwork_name:
         return jsonify([])
 
-    print(f"⚡ Spark is finding similar artworks for: {artwork_name}", file=sys.stderr)
+    # 0. FAST PATH: vecinii precalculați, apoi indexul Redis scris de ETL (shared/redis_index.py)
+    neighbours = precomputed_similar("art", artwork_name)
+    if neighbours is not None:
+        return jsonify(neighbours)
 
-    # 1. FETCH RAW DATA: Get all artworks from Redis cache
     try:
-        import redis
-        import json
-
-        cache = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
-        all_artworks_raw = cache.lrange("art:all", 0, -1)
-
-        if not all_artworks_raw:
-            print("❌ No artworks in Redis cache", file=sys.stderr)
-            return jsonify([])
+        # Catalogul columnar (același creator, apoi aceeași mișcare), apoi indexul Redis scris de ETL
+        matches = columnar_similar("art", artwork_name, (("creator",), ("movement",)))
+        source = "columnar catalogue"
+        if matches is None and redis_index.has_index(cache, "art"):
+            target = redis_index.find_by_name(cache, "art", artwork_name)
+            if not target or target.get('name', '').lower() != artwork_name.lower():
+                matches = []
+            else:
+                matches = [(doc, (field,)) for doc, field in
+                           redis_index.similar_by_facets(cache, "art", target, ("creator", "movement"), limit=5)]
+            source = "Redis index"
+        if matches is not None:
+            if not matches:
+                print(f"❌ Artwork not found (or nothing similar): {artwork_name}", file=sys.stderr)
+            output = [{
+                "name": doc['name'],
+                "reason": f"Same creator: {doc['creator']}" if group == ("creator",)
+                          else f"Same movement: {doc['movement']}"
+            } for doc, group in matches]
+            print(f"✅ Found {len(output)} similar artworks ({source})", file=sys.stderr)
+            return jsonify(output)
+    except Exception as e:
+        print(f"⚠️ Catalogue lookup failed, falling back to Spark: {e}", file=sys.stderr)
 
-        all_artworks = [json.loads(a) for a in all_artworks_raw]
-        print(f"✅ Loaded {len(all_artworks)} artworks from Redis", file=sys.stderr)
+    print(f"⚡ Spark is finding similar artworks for: {artwork_name}", file=sys.stderr)
 
+    # 1. CATALOGUL REZIDENT (construit din art:all o dată per versiune ETL)
+    try:
+        engine = pick_engine(catalogue.rows("art"), request.args.get('engine'))
+        df = engine.frame(catalogue, "art")
     except Exception as e:
-        print(f"❌ Redis error: {e}", file=sys.stderr)
+        print(f"❌ Error loading art catalogue: {e}", file=sys.stderr)
         return jsonify([])
 
-    # 2. CREARE DATAFRAME SPARK
-    from pyspark.sql.types import StructType, StructField, StringType
-
-    raw_data = [
-        (
-            art.get('name', 'Unknown'),
-            art.get('creator', 'Unknown'),
-            art.get('movement', 'Unknown')
-        )
-        for art in all_artworks
-    ]
-
-    schema = StructType([
-        StructField("name", StringType(), True),
-        StructField("creator", StringType(), True),
-        StructField("movement", StringType(), True)
-    ])
-
-    df = spark.createDataFrame(raw_data, schema=schema)
-
-    # 3. PROCESARE SPARK
+    # 2. PROCESARE (pandas sau Spark)
     # Găsim artwork-ul țintă
-    target_row = df.filter(lower(col("name")) == artwork_name.lower()).first()
+    target_row = engine.first_match(df, "name_lc", artwork_name.lower())
 
     if not target_row:
         print(f"❌ Artwork not found: {artwork_name}", file=sys.stderr)
-        return jsonify([])
+        return with_engine(jsonify([]), engine)
 
     target_creator = target_row['creator']
     target_movement = target_row['movement']
@@ -509,14 +430,10 @@ def get_similar_artworks():
     print(f"✅ Target: creator={target_creator}, movement={target_movement}", file=sys.stderr)
 
     # Găsim artworks similare (același creator SAU același movement)
-    similar_df = df.filter(
-        ((lower(col("creator")) == target_creator.lower()) |
-         (lower(col("movement")) == target_movement.lower())) &
-        (lower(col("name")) != artwork_name.lower())
-    ).limit(5)
+    similars = engine.similar(df, {"creator_lc": target_creator.lower(), "movement_lc": target_movement.lower()},
+                              ("name_lc", artwork_name.lower()), ("name", "creator", "movement"), limit=5)
 
-    # 4. REZULTATE
-    similars = similar_df.collect()
+    # 3. REZULTATE
 
     output = []
     for row in similars:
@@ -531,40 +448,88 @@ def get_similar_artworks():
             "reason": reason
         })
 
-    print(f"✅ Found {len(output)} similar artworks", file=sys.stderr)
-    return jsonify(output)
+    print(f"✅ Found {len(output)} similar artworks ({engine.name})", file=sys.stderr)
+    return with_engine(jsonify(output), engine)
+
+@app.route('/stats/global', methods=['GET'])
+def global_stats():
+    """Top countries by number of bands as [{label, value}] (dashboard list, see docs/openapi.yaml)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        summary = aggregates.summary(cache, "music", limit=limit)
+        if summary is not None:
+            return jsonify(summary["countries"])
+        # Agregatele nu sunt încă publicate -> cubul construit dintr-un GROUP BY live
+        counts = aggregates.rollup_cube(music_stats.cells()[0], aggregates.CUBES["music"])
+        return jsonify([{"label": country, "value": count}
+                        for country, count in counts["country"].most_common(limit)])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/stats/music', methods=['GET'])
+def music_dashboard_stats():
+    """Genre / country / decade distribution plus award and member rankings (?genre=&country=&decade=)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        return jsonify(music_stats.stats(genre=request.args.get('genre') or None,
+                                         country=request.args.get('country') or None,
+                                         decade=request.args.get('decade', type=int),
+                                         limit=limit))
+    except Exception as e:
+        print(f"❌ Music stats failed: {e}", file=sys.stderr)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/stats/music/filters', methods=['GET'])
+def music_stats_filters():
+    try:
+        return jsonify(music_stats.filters())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
 @app.route('/stats/art', methods=['GET'])
 def art_stats():
-    """Get art statistics from Fuseki - top movements and countries"""
+    """Top movements, countries, creators, decades, types and materials (materialized by the ETL)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        materialized = aggregates.summary(cache, "art", limit=limit)
+    except Exception as e:
+        print(f"⚠️ [STATS] art aggregates unavailable: {e}", file=sys.stderr)
+        materialized = None
+    if materialized:
+        materialized["source"] = "materialized"
+        return jsonify(materialized)
+
+    # Fallback: agregatele nu au fost încă publicate de ETL -> GROUP BY live în Fuseki
     # Top Art Movements
     sparql_movements = """
     SELECT ?movement (COUNT(?s) AS ?count) WHERE {
         ?s <http://schema.org/artMovement> ?movement .
-    } GROUP BY ?movement ORDER BY DESC(?count) LIMIT 10
-    """
+    } GROUP BY ?movement ORDER BY DESC(?count) LIMIT %d
+    """ % limit
 
     # Top Countries
     sparql_countries = """
     SELECT ?country (COUNT(?s) AS ?count) WHERE {
         ?s <http://schema.org/locationCreated> ?country .
-    } GROUP BY ?country ORDER BY DESC(?count) LIMIT 10
-    """
+    } GROUP BY ?country ORDER BY DESC(?count) LIMIT %d
+    """ % limit
 
     try:
         # Get movements
-        resp_mov = requests.get(FUSEKI_QUERY_URL, params={'query': sparql_movements})
         movements = [{"label": i["movement"]["value"], "value": int(i["count"]["value"])}
-                     for i in resp_mov.json()["results"]["bindings"]]
+                     for i in fuseki.select(sparql_movements)]
 
         # Get countries
-        resp_cnt = requests.get(FUSEKI_QUERY_URL, params={'query': sparql_countries})
         countries = [{"label": i["country"]["value"], "value": int(i["count"]["value"])}
-                     for i in resp_cnt.json()["results"]["bindings"]]
+                     for i in fuseki.select(sparql_countries)]
 
         return jsonify({
             "movements": movements,
-            "countries": countries
+            "countries": countries,
+            "source": "sparql"
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -587,8 +552,7 @@ def art_influences():
     """
 
     try:
-        resp = requests.get(FUSEKI_QUERY_URL, params={'query': sparql})
-        data = resp.json()["results"]["bindings"]
+        data = fuseki.select(sparql)
         res = [{
             "name": i["name"]["value"],
             "creator": i["creator"]["value"],
@@ -600,5 +564,18 @@ def art_influences():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "healthy", "service": "analytics-service", "catalogues": catalogue.stats(),
+                    "engines": engine_usage(), "compare_cache": compare_cache.report(), "columnar": columns.report(),
+                    "sparql": fuseki.report()})
+
+
 if __name__ == '__main__':
+    # Încărcăm cataloagele în fundal și le reîncărcăm când ETL-ul publică o versiune nouă
+    threading.Thread(target=catalogue.watch, args=(int(os.getenv("CATALOGUE_WATCH_SECONDS", "10")),),
+                     daemon=True).start()
+    # Ultimul catalog bun de pe disc (mmap, milisecunde), apoi reîmprospătare din Redis în fundal
+    columns.load_files()
+    threading.Thread(target=columns.refresh, daemon=True).start()
     app.run(host='0.0.0.0', port=8002)
\ No newline at end of file
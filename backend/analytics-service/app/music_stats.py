@@ -0,0 +1,152 @@
+"""
+/stats/music: dashboard numbers for the music catalogue.
+
+Genre / country / decade counts come from the aggregates the ETL
+materializes (shared/aggregates.py): unfiltered requests read the sorted
+sets, filtered ones roll up the music cube, which is parsed once per ETL
+version and kept in memory. Only when the aggregates are missing (before the
+first ETL publish) is the cube built from one live GROUP BY query instead.
+Award and member rankings depend on multi-valued properties that the
+catalogue does not carry, so they stay SPARQL queries (cached per ETL
+version by the shared client).
+"""
+import sys
+import threading
+from collections import Counter
+
+from shared import aggregates
+from shared.utils import is_missing
+
+DIMS = aggregates.CUBES["music"]
+
+CUBE_QUERY = """
+PREFIX schema: <http://schema.org/>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+SELECT ?genre ?location ?startYear (COUNT(DISTINCT ?s) AS ?count)
+WHERE {
+  ?s a schema:MusicGroup .
+  OPTIONAL { ?s schema:genre ?genre }
+  OPTIONAL { ?s schema:location ?location }
+  OPTIONAL { ?s dbo:activeYearsStartYear ?startYear }
+}
+GROUP BY ?genre ?location ?startYear
+"""
+
+RANKING_QUERY = """
+PREFIX schema: <http://schema.org/>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+SELECT ?name (SAMPLE(?genre) AS ?g) (SAMPLE(?location) AS ?c)
+       (COUNT(DISTINCT ?o) AS ?count) (GROUP_CONCAT(DISTINCT ?o; separator="|") AS ?values)
+WHERE {
+  ?s a schema:MusicGroup ;
+     schema:name ?name ;
+     <%(predicate)s> ?o .
+  OPTIONAL { ?s schema:genre ?genre }
+  OPTIONAL { ?s schema:location ?location }
+  %(filters)s
+}
+GROUP BY ?name
+ORDER BY DESC(?count)
+LIMIT %(limit)d
+"""
+
+
+def literal(value):
+    return '"%s"' % str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class MusicStats:
+    def __init__(self, cache, fuseki):
+        self.cache = cache
+        self.fuseki = fuseki
+        self._cube = (None, [])  # (built_at, version) of the aggregates -> parsed cells
+        self._lock = threading.Lock()
+
+    def cells(self):
+        """(cube cells, source, version): materialized cube, else one live GROUP BY"""
+        info = aggregates.meta(self.cache, "music")
+        if info is not None:
+            stamp = (info["built_at"], info["version"])
+            with self._lock:
+                if self._cube[0] != stamp:
+                    self._cube = (stamp, aggregates.cube(self.cache, "music"))
+                return self._cube[1], "materialized", info["version"]
+
+        print("⚠️ [STATS] music aggregates missing, falling back to SPARQL", file=sys.stderr)
+        cube = Counter()
+        for r in self.fuseki.select(CUBE_QUERY):
+            cell = tuple(aggregates.dimension_value(dim, r[var]["value"] if var in r else None) or ""
+                         for dim, var in zip(DIMS, ("genre", "location", "startYear")))
+            cube[cell] += int(r["count"]["value"])
+        return list(cube.items()), "sparql", None
+
+    def filters(self):
+        """Values offered by the dashboard filters"""
+        if aggregates.meta(self.cache, "music") is not None:
+            genres = sorted(aggregates.values(self.cache, "music", "genre"))
+            countries = sorted(aggregates.values(self.cache, "music", "country"))
+            decades = aggregates.values(self.cache, "music", "decade")
+        else:
+            counts = aggregates.rollup_cube(self.cells()[0], DIMS)
+            genres, countries, decades = sorted(counts["genre"]), sorted(counts["country"]), list(counts["decade"])
+        return {"genres": genres, "countries": countries, "decades": sorted(int(d[:-1]) for d in decades)}
+
+    def stats(self, genre=None, country=None, decade=None, limit=10):
+        filters = {"genre": genre, "country": country, "decade": f"{decade}s" if decade is not None else None}
+        meta = aggregates.meta(self.cache, "music")
+
+        if meta is not None and not any(filters.values()):
+            # Without filters: straight from the materialized sorted sets (every decade, top-N of the rest)
+            counts = {dim: Counter(dict(aggregates.top(self.cache, "music", dim,
+                                                       limit=None if dim == "decade" else limit)))
+                      for dim in DIMS}
+            total, source, version = meta["total"], "materialized", meta["version"]
+        else:
+            cells, source, version = self.cells()
+            counts = aggregates.rollup_cube(cells, DIMS, filters)
+            total = counts["total"]
+
+        return {
+            "total_bands": total,
+            "top_genres": [{"name": v, "count": c} for v, c in counts["genre"].most_common(limit)],
+            "top_countries": [{"name": v, "count": c} for v, c in counts["country"].most_common(limit)],
+            "bands_per_decade": [{"decade": v, "count": c} for v, c in
+                                 sorted(counts["decade"].items(), key=lambda item: int(item[0][:-1]))],
+            "top_awarded_bands": self.ranking("award", filters, limit),
+            "bands_with_most_members": self.ranking("member", filters, limit),
+            "filters": {"genre": genre, "country": country, "decade": decade},
+            "source": source,
+            "version": version
+        }
+
+    def ranking(self, feature, filters, limit):
+        """Bands with the most awards / members under the filters"""
+        clauses = []
+        if filters.get("genre"):
+            clauses.append(f"?s schema:genre {literal(filters['genre'])} .")
+        if filters.get("country"):
+            clauses.append(f"?s schema:location {literal(filters['country'])} .")
+        if filters.get("decade"):
+            start = int(filters["decade"][:-1])
+            clauses.append(f"?s dbo:activeYearsStartYear ?year . FILTER (?year >= {start} && ?year < {start + 10})")
+
+        query = RANKING_QUERY % {"predicate": f"http://schema.org/{feature}", "filters": "\n  ".join(clauses),
+                                 "limit": limit}
+        try:
+            rows = self.fuseki.select(query)
+        except Exception as e:
+            print(f"⚠️ [STATS] {feature} ranking failed: {e}", file=sys.stderr)
+            return []
+
+        result = []
+        for r in rows:
+            entry = {
+                "name": r["name"]["value"],
+                "genre": r["g"]["value"] if "g" in r else "Unknown",
+                "country": r["c"]["value"] if "c" in r else "Unknown",
+                f"{feature}s_count": int(r["count"]["value"])
+            }
+            if feature == "award":
+                entry["awards"] = [a for a in r["values"]["value"].split("|") if not is_missing(a)]
+            result.append(entry)
+        return result
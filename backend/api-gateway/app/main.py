@@ -1,83 +1,320 @@
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import requests
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+import asyncio
+import json
+import os
+import sys
+import httpx
+import redis.asyncio as aioredis
+import uvicorn
+from urllib.parse import parse_qsl, urlsplit
+from werkzeug.datastructures import MultiDict
+from response_cache import DataVersion, ResponseCache, cache_key
+from resilience import Bulkhead, CircuitBreaker, CircuitOpen, Shed, parse_limits
 
-app = Flask(__name__)
-CORS(app)
+# Gateway async (ASGI): un client HTTP pooled per serviciu, keep-alive, timeout-uri per upstream
+# și body-ul răspunsului trimis mai departe în streaming, fără să-l parsăm.
+app = cors(Quart(__name__), allow_origin="*")
 
-SPARQL = "http://sparql-service:8001"
-ANALYTICS = "http://analytics-service:8002"
-REC = "http://recommendation-service:8003"
+UPSTREAMS = {
+    "sparql": {
+        "url": os.getenv("SPARQL_URL", "http://sparql-service:8001"),
+        "timeout": float(os.getenv("SPARQL_TIMEOUT", "10"))
+    },
+    # Compare / similar pe Spark pot dura mai mult
+    "analytics": {
+        "url": os.getenv("ANALYTICS_URL", "http://analytics-service:8002"),
+        "timeout": float(os.getenv("ANALYTICS_TIMEOUT", "60"))
+    },
+    "recommendation": {
+        "url": os.getenv("REC_URL", "http://recommendation-service:8003"),
+        "timeout": float(os.getenv("REC_TIMEOUT", "10"))
+    }
+}
 # ART service removed - functionality moved to other services
 
-@app.route('/api/music', methods=['GET'])
-def music():
-    try: return jsonify(requests.get(f"{SPARQL}/search/music", params=request.args).json())
-    except: return jsonify([]), 503
+POOL_SIZE = int(os.getenv("GATEWAY_POOL_SIZE", "100"))
+CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "2"))
+WORKERS = int(os.getenv("GATEWAY_WORKERS", "2"))
 
-@app.route('/api/stats', methods=['GET'])
-def stats():
-    try: return jsonify(requests.get(f"{ANALYTICS}/stats/global").json())
-    except: return jsonify([]), 503
+# Header-ele upstream care au sens pentru client (restul sunt hop-by-hop sau interne)
+PASSTHROUGH_HEADERS = {"content-type", "content-encoding", "content-length", "cache-control",
+                       "etag", "last-modified", "x-analytics-engine"}
 
-@app.route('/api/influences', methods=['GET'])
-def influences():
-    try: return jsonify(requests.get(f"{ANALYTICS}/analytics/influences", params=request.args).json())
-    except: return jsonify([]), 503
+clients = {}
 
-@app.route('/api/compare', methods=['GET'])
-def compare():
+# Cache de răspunsuri per proces, invalidat de etl:version (ETag / 304 pt clienți)
+data_version = DataVersion(aioredis.Redis(host=os.getenv("REDIS_HOST", "redis"), port=6379, decode_responses=True),
+                           interval=float(os.getenv("GATEWAY_VERSION_POLL", "2")))
+response_cache = ResponseCache(max_entries=int(os.getenv("GATEWAY_CACHE_SIZE", "1024")),
+                               ttl=int(os.getenv("GATEWAY_CACHE_TTL", "300")))
+background_tasks = []
+
+
+@app.before_serving
+async def open_clients():
+    for name, cfg in UPSTREAMS.items():
+        clients[name] = httpx.AsyncClient(
+            base_url=cfg["url"],
+            timeout=httpx.Timeout(cfg["timeout"], connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE // 2)
+        )
+    # Semafoarele se creează în event loop-ul serverului (Python 3.9 le leagă de loop la creare)
+    for route in ROUTES:
+        bulkheads[route] = Bulkhead(route, ROUTE_LIMITS.get(route, DEFAULT_ROUTE_LIMIT), queue_timeout=QUEUE_TIMEOUT)
+    await data_version.refresh()
+    background_tasks.append(asyncio.ensure_future(data_version.watch()))
+
+
+@app.after_serving
+async def close_clients():
+    for task in background_tasks:
+        task.cancel()
+    for client in clients.values():
+        await client.aclose()
+
+
+# Ruta publică -> (upstream, ruta internă, body de rezervă la eroare, se trimit parametrii?)
+ROUTES = {
+    "/api/music": ("sparql", "/search/music", [], True),
+    # Autocomplete per tastă (nume, titluri, creatori, genuri, mișcări)
+    "/api/suggest": ("sparql", "/suggest", [], True),
+    "/api/stats": ("analytics", "/stats/global", [], False),
+    # Statistici muzică (agregate materializate de ETL), cu filtre genre / country / decade
+    "/api/stats/music": ("analytics", "/stats/music", {"error": "Stats Service Unavailable"}, True),
+    "/api/stats/music/filters": ("analytics", "/stats/music/filters",
+                                 {"genres": [], "countries": [], "decades": []}, False),
+    "/api/influences": ("analytics", "/analytics/influences", [], True),
+    # Trimite toți parametrii (mode, t1, t2) automat
+    "/api/compare": ("analytics", "/analytics/compare", {"error": "Gateway Error"}, True),
+    "/api/recommend": ("recommendation", "/recommend", [], True),
+    # Mai multe trupe / opere într-un singur apel (?domain=music&name=A&name=B)
+    "/api/recommend/batch": ("recommendation", "/recommend/batch", {"results": {}}, True),
+    "/api/search/natural": ("analytics", "/analytics/natural-search", {"error": "Search Service Unavailable"}, True),
+    "/api/similar": ("analytics", "/analytics/similar", {}, True),
+    # --- FINE ARTS ROUTES ---
+    # Search artworks - now in sparql-service
+    "/api/art": ("sparql", "/search/art", [], True),
+    # Art statistics / artworks by movement - now in analytics-service
+    "/api/art/stats": ("analytics", "/stats/art", {}, False),
+    "/api/art/influences": ("analytics", "/analytics/art-influences", [], True),
+    # Recommend similar artworks - now in analytics-service using Spark
+    "/api/art/recommend": ("analytics", "/analytics/similar/art", [], True)
+}
+
+# Bulkhead per rută: câte request-uri simultane are voie fiecare (Spark compare nu poate bloca /api/music)
+ROUTE_LIMITS = {
+    "/api/compare": 4,
+    "/api/search/natural": 8,
+    "/api/similar": 16,
+    "/api/art/recommend": 16
+}
+ROUTE_LIMITS.update(parse_limits(os.getenv("GATEWAY_ROUTE_LIMITS")))
+DEFAULT_ROUTE_LIMIT = int(os.getenv("GATEWAY_ROUTE_LIMIT", "64"))
+QUEUE_TIMEOUT = float(os.getenv("GATEWAY_QUEUE_TIMEOUT_MS", "1000")) / 1000
+
+breakers = {
+    name: CircuitBreaker(name,
+                         failure_threshold=int(os.getenv("GATEWAY_BREAKER_FAILURES", "5")),
+                         reset_timeout=float(os.getenv("GATEWAY_BREAKER_RESET", "30")))
+    for name in UPSTREAMS
+}
+bulkheads = {}
+
+BATCH_MAX = int(os.getenv("GATEWAY_BATCH_MAX", "100"))
+BATCH_CONCURRENCY = int(os.getenv("GATEWAY_BATCH_CONCURRENCY", "20"))
+SCALARS = (str, int, float, bool)
+
+
+def error_body(fallback):
+    return json.dumps(fallback).encode("utf-8")
+
+
+async def call_route(route, args, stream=False):
+    """
+    Execută o rută publică (prin cache-ul de răspunsuri). Întoarce (status, headers, body);
+    body e bytes, sau un iterator async când stream=True și răspunsul nu intră în cache.
+    """
+    upstream, path, fallback, forward = ROUTES[route]
+    key = cache_key(route, args)
+    version = data_version.version
+
+    entry = response_cache.get(key, version)
+    if entry:
+        headers = dict(entry["headers"], **data_version.validators(key, version))
+        headers["X-Cache"] = "HIT"
+        return entry["status"], headers, entry["body"]
+
+    # Circuit breaker pe upstream, apoi slot în bulkhead-ul rutei (sau shed dacă coada e prea lungă)
+    breaker, bulkhead = breakers[upstream], bulkheads[route]
     try:
-        # Trimite toți parametrii (mode, t1, t2) automat
-        response = requests.get(f"{ANALYTICS}/analytics/compare", params=request.args)
-        return jsonify(response.json())
-    except Exception as e:
-        return jsonify({"error": "Gateway Error"}), 503
-
-@app.route('/api/recommend', methods=['GET'])
-def recommend():
-    try: return jsonify(requests.get(f"{REC}/recommend", params=request.args).json())
-    except: return jsonify([]), 503
-    
-@app.route('/api/search/natural', methods=['GET'])
-def natural_search_proxy():
+        breaker.allow()
+    except CircuitOpen:
+        return 503, {"Content-Type": "application/json", "Retry-After": str(breaker.retry_after()),
+                     "X-Gateway-Reject": "circuit-open"}, error_body(fallback)
     try:
-        response = requests.get(f"{ANALYTICS}/analytics/natural-search", params=request.args)
-        return jsonify(response.json()), response.status_code
-    except Exception as e:
-        return jsonify({"error": "Search Service Unavailable"}), 503
+        await bulkhead.acquire()
+    except Shed:
+        breaker.release_probe()
+        return 503, {"Content-Type": "application/json", "Retry-After": "1",
+                     "X-Gateway-Reject": "shed"}, error_body(fallback)
 
-@app.route('/api/similar', methods=['GET'])
-def similar_proxy():
+    released, succeeded = False, None
     try:
-        response = requests.get(f"{ANALYTICS}/analytics/similar", params=request.args)
-        return jsonify(response.json())
-    except: return jsonify({}), 503
-# --- FINE ARTS ROUTES ---
-
-@app.route('/api/art', methods=['GET'])
-def art():
-    """Search artworks - now in sparql-service"""
-    try: return jsonify(requests.get(f"{SPARQL}/search/art", params=request.args).json())
-    except: return jsonify([]), 503
-
-@app.route('/api/art/stats', methods=['GET'])
-def art_stats():
-    """Get art statistics - now in analytics-service"""
-    try: return jsonify(requests.get(f"{ANALYTICS}/stats/art").json())
-    except: return jsonify({}), 503
-
-@app.route('/api/art/influences', methods=['GET'])
-def art_influences():
-    """Get artworks by movement - now in analytics-service"""
-    try: return jsonify(requests.get(f"{ANALYTICS}/analytics/art-influences", params=request.args).json())
-    except: return jsonify([]), 503
-
-@app.route('/api/art/recommend', methods=['GET'])
-def art_recommend():
-    """Recommend similar artworks - now in analytics-service using Spark"""
-    try: return jsonify(requests.get(f"{ANALYTICS}/analytics/similar/art", params=request.args).json())
-    except: return jsonify([]), 503
+        status, headers, body = await fetch_upstream(upstream, path, fallback, forward, args, key, version,
+                                                     stream, bulkhead)
+        released = not isinstance(body, bytes)  # stream-ul eliberează slotul când se termină
+        succeeded = status < 500
+    except Exception:
+        succeeded = False
+        raise
+    finally:
+        if not released:
+            bulkhead.release()
+        # CancelledError (client deconectat) nu e Exception: proba half-open se eliberează, fără rezultat
+        if succeeded is None:
+            breaker.release_probe()
+        elif succeeded:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    return status, headers, body
+
+
+async def fetch_upstream(upstream, path, fallback, forward, args, key, version, stream, bulkhead):
+    client = clients[upstream]
+    params = list(args.items(multi=True)) if forward else None
+    json_headers = {"Content-Type": "application/json"}
+    try:
+        req = client.build_request("GET", path, params=params)
+        resp = await client.send(req, stream=True)
+    except httpx.TimeoutException:
+        print(f"⏱️ [GATEWAY] {upstream}{path} timed out", file=sys.stderr)
+        return 504, json_headers, error_body(fallback)
+    except httpx.HTTPError as e:
+        print(f"❌ [GATEWAY] {upstream}{path} unavailable: {e}", file=sys.stderr)
+        return 503, json_headers, error_body(fallback)
+
+    headers = {k: v for k, v in resp.headers.items() if k.lower() in PASSTHROUGH_HEADERS}
+    size = int(resp.headers.get("content-length") or 0)
+    cacheable = resp.status_code == 200 and 0 < size <= response_cache.max_body
+    if cacheable or not stream:
+        try:
+            body = await resp.aread()
+        except httpx.HTTPError as e:
+            print(f"❌ [GATEWAY] {upstream}{path} failed mid-response: {e}", file=sys.stderr)
+            return 502, json_headers, error_body(fallback)
+        finally:
+            await resp.aclose()
+        headers.pop("content-encoding", None)
+        headers.pop("content-length", None)
+        if cacheable:
+            response_cache.put(key, version, resp.status_code, headers, body)
+            headers.update(data_version.validators(key, version))
+            headers["X-Cache"] = "MISS"
+        return resp.status_code, headers, body
+
+    async def body():
+        try:
+            async for chunk in resp.aiter_raw():
+                yield chunk
+        finally:
+            await resp.aclose()
+            bulkhead.release()
+
+    return resp.status_code, headers, body()
+
+
+async def proxy():
+    """Handler comun pentru rutele din ROUTES: 304 dacă ETag-ul clientului e la zi, altfel upstream/cache"""
+    route = request.url_rule.rule
+    key = cache_key(route, request.args)
+    if data_version.not_modified(request.headers, key):
+        response_cache.stats["not_modified"] += 1
+        return Response("", status=304, headers=data_version.validators(key))
+
+    status, headers, body = await call_route(route, request.args, stream=True)
+    return Response(body, status=status, headers=headers)
+
+
+for route in ROUTES:
+    app.add_url_rule(route, endpoint=route, view_func=proxy, methods=['GET'])
+
+
+@app.route('/api/batch', methods=['POST'])
+async def batch():
+    """
+    Mai multe GET-uri într-un singur round trip:
+    {"requests": [{"id": "a", "path": "/api/similar?band=Muse"}, {"path": "/api/art/stats"}, ...]}
+    -> {"responses": [{"id": "a", "path": ..., "status": 200, "body": ...}, ...]} în aceeași ordine.
+    Sub-request-urile rulează concurent (max GATEWAY_BATCH_CONCURRENCY) și trec prin cache.
+    """
+    payload = await request.get_json(silent=True) or {}
+    items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected {\"requests\": [...]}"}), 400
+    if len(items) > BATCH_MAX:
+        return jsonify({"error": f"At most {BATCH_MAX} sub-requests per batch"}), 413
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index, item):
+        if isinstance(item, str):
+            item = {"path": item}
+        if not isinstance(item, dict):
+            return {"id": index, "status": 400, "body": {"error": "Expected a path or {\"path\", \"params\"}"}}
+        item_id = item.get("id", index)
+        path, params = item.get("path", ""), item.get("params") or {}
+        if not isinstance(path, str):
+            return {"id": item_id, "status": 400, "body": {"error": "\"path\" must be a string"}}
+        if not isinstance(params, dict) or not all(isinstance(v, SCALARS) for v in params.values()):
+            return {"id": item_id, "path": path, "status": 400,
+                    "body": {"error": "\"params\" must be an object of string / number / boolean values"}}
+
+        url = urlsplit(path)
+        args = MultiDict(parse_qsl(url.query, keep_blank_values=True))
+        for name, value in params.items():
+            args.add(name, str(value))
+
+        result = {"id": item_id, "path": url.path}
+        if url.path not in ROUTES:
+            return dict(result, status=404, body={"error": f"Unknown route {url.path}"})
+
+        async with slots:
+            status, headers, body = await call_route(url.path, args)
+        try:
+            result["body"] = json.loads(body)
+        except ValueError:
+            result["body"] = body.decode("utf-8", "replace")
+        result["status"] = status
+        return result
+
+    responses = await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    return jsonify({"responses": responses})
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Starea breaker-elor, bulkhead-urilor și a cache-ului (per proces uvicorn)"""
+    return jsonify({
+        "pid": os.getpid(),
+        "breakers": {name: breaker.report() for name, breaker in breakers.items()},
+        "bulkheads": {route: bulkhead.report() for route, bulkhead in bulkheads.items()},
+        "rejections": {
+            "circuit_open": sum(b.stats["rejected"] for b in breakers.values()),
+            "shed_deadline": sum(b.stats["shed_deadline"] for b in bulkheads.values()),
+            "shed_queue_full": sum(b.stats["shed_queue_full"] for b in bulkheads.values())
+        },
+        "cache": response_cache.report()
+    })
+
+
+@app.route('/health', methods=['GET'])
+async def health():
+    return jsonify({"status": "healthy", "service": "api-gateway", "data_version": data_version.version,
+                    "cache": response_cache.report()})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
+    # Câteva procese uvicorn, fiecare cu event loop-ul lui (mii de conexiuni concurente per proces)
+    uvicorn.run("main:app", host='0.0.0.0', port=8000, workers=WORKERS,
+                timeout_keep_alive=int(os.getenv("GATEWAY_KEEPALIVE", "30")))
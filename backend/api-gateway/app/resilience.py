@@ -0,0 +1,135 @@
+"""
+Failure isolation for the gateway (all state is per process / event loop).
+
+CircuitBreaker   one per upstream. After `failure_threshold` consecutive
+                 failures (timeouts, connection errors, 5xx) it opens and
+                 requests fail fast; after `reset_timeout` seconds it lets
+                 `half_open_probes` requests through and closes again on
+                 the first success (or re-opens on a failure). A probe that
+                 never reports back is expired after another `reset_timeout`.
+Bulkhead         one per public route: at most `limit` requests in flight,
+                 so slow routes (Spark compare) cannot starve fast ones.
+                 A request that cannot get a slot within the queue deadline,
+                 or finds too many requests already waiting, is shed.
+"""
+import asyncio
+import time
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Shed(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_probes=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.probe_started = 0.0
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0, "expired_probes": 0}
+
+    def allow(self):
+        """Raise CircuitOpen if the upstream should not be called right now"""
+        now = time.time()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probes = 0
+        if self.state == self.HALF_OPEN and self.probes and now - self.probe_started >= self.reset_timeout:
+            # Probes that never recorded an outcome must not keep the breaker half-open forever
+            self.stats["expired_probes"] += 1
+            self.probes = 0
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.HALF_OPEN and self.probes < self.half_open_probes:
+            self.probes += 1
+            self.probe_started = now
+            return
+        self.stats["rejected"] += 1
+        raise CircuitOpen(self.name)
+
+    def release_probe(self):
+        """A half-open probe without an outcome (shed, or cancelled before the upstream answered)"""
+        if self.state == self.HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.time()
+
+    def retry_after(self):
+        return max(1, int(self.reset_timeout - (time.time() - self.opened_at)))
+
+    def report(self):
+        return dict(self.stats, state=self.state, consecutive_failures=self.failures)
+
+
+class Bulkhead:
+    def __init__(self, name, limit, queue_timeout=1.0, max_waiting=None):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting if max_waiting is not None else limit * 4
+        self._slots = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"accepted": 0, "shed_queue_full": 0, "shed_deadline": 0, "max_queue_ms": 0.0}
+
+    async def acquire(self):
+        """Wait for a slot until the queue deadline; raise Shed otherwise"""
+        if self.waiting >= self.max_waiting:
+            self.stats["shed_queue_full"] += 1
+            raise Shed(self.name)
+
+        start = time.time()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["shed_deadline"] += 1
+            raise Shed(self.name)
+        finally:
+            self.waiting -= 1
+
+        queued_ms = (time.time() - start) * 1000
+        self.stats["max_queue_ms"] = round(max(self.stats["max_queue_ms"], queued_ms), 1)
+        self.stats["accepted"] += 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def report(self):
+        return dict(self.stats, limit=self.limit, in_flight=self.in_flight, waiting=self.waiting,
+                    queue_timeout_ms=int(self.queue_timeout * 1000))
+
+
+def parse_limits(spec):
+    """"/api/compare=4,/api/similar=16" -> {"/api/compare": 4, "/api/similar": 16}"""
+    limits = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            route, value = part.rsplit("=", 1)
+            limits[route.strip()] = int(value)
+    return limits
@@ -0,0 +1,115 @@
+"""
+In-process response cache for the gateway.
+
+Every proxied GET answer depends only on its route, its query string and the
+data published by the ETL. Entries are keyed by route + normalized query and
+stamped with the ETL data version (`etl:version` in Redis), which also drives
+the ETag / Last-Modified validators: a client that revalidates with the
+current ETag gets a 304 without any upstream call.
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+
+from shared.utils import DATA_VERSION_KEY
+
+
+def normalize_query(args):
+    """Sorted (key, stripped value) pairs, so ?b=1&a=2 and ?a=2&b=1 share an entry"""
+    return sorted((k, v.strip()) for k, v in args.items(multi=True))
+
+
+def cache_key(path, args):
+    """Route + percent-encoded query: a value containing & or = cannot collide with another query"""
+    return path + "?" + urlencode(normalize_query(args))
+
+
+class DataVersion:
+    """Current ETL data version, polled from Redis in the background"""
+
+    def __init__(self, redis_client, interval=2.0):
+        self.redis = redis_client
+        self.interval = interval
+        self.version = 0
+        self.changed_at = time.time()
+
+    async def refresh(self):
+        try:
+            version = int(await self.redis.get(DATA_VERSION_KEY) or 0)
+        except Exception as e:
+            print(f"⚠️ [GATEWAY-CACHE] Could not read {DATA_VERSION_KEY}: {e}", file=sys.stderr)
+            return
+        if version != self.version:
+            self.version = version
+            self.changed_at = time.time()
+
+    async def watch(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def etag(self, key, version=None):
+        version = self.version if version is None else version
+        digest = hashlib.sha1(f"{version}:{key}".encode("utf-8")).hexdigest()[:16]
+        return f'"v{version}-{digest}"'
+
+    def last_modified(self):
+        return formatdate(self.changed_at, usegmt=True)
+
+    def validators(self, key, version=None):
+        """ETag / Last-Modified headers; no-cache makes browsers revalidate (cheap 304) every time"""
+        return {"ETag": self.etag(key, version), "Last-Modified": self.last_modified(),
+                "Cache-Control": "no-cache"}
+
+    def not_modified(self, headers, key):
+        """True if the client's validators still match the current data version"""
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match:
+            tags = {tag.strip() for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag(key) in tags or f"W/{self.etag(key)}" in tags
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(self.changed_at)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class ResponseCache:
+    """LRU + TTL cache of (status, headers, body), entries tagged with the data version"""
+
+    def __init__(self, max_entries=1024, ttl=300, max_body=1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_body = max_body
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0}
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None or entry["version"] != version or entry["expires"] < time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, key, version, status, headers, body):
+        if len(body) > self.max_body:
+            return
+        self._entries[key] = {"version": version, "status": status, "headers": headers,
+                              "body": body, "expires": time.time() + self.ttl}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def report(self):
+        return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
@@ -11,6 +11,10 @@ import redis
 import requests
 import threading
 import time
+from shared import aggregates, columnar, redis_index
+from shared.delta import fingerprint, sync_snapshot
+from shared.models import DOMAINS
+from shared.sparql_client import SparqlClient
 
 app = Flask(__name__)
 CORS(app)
@@ -25,6 +29,11 @@ try:
 except:
     cache = None
 
+ART = DOMAINS["art"]
+
+# Client SPARQL comun: conexiuni reutilizate, rezultate cache-uite în Redis per versiune ETL
+fuseki = SparqlClient(FUSEKI_QUERY_URL, cache, namespace="sparql:art-service")
+
 
 def wait_for_fuseki(max_retries=30, delay=2):
     """Wait for Fuseki to be ready"""
@@ -44,13 +53,11 @@ def wait_for_fuseki(max_retries=30, delay=2):
 def check_fuseki_has_data():
     """Check if Fuseki already has art data (loaded by Spark ETL)"""
     try:
-        query = "SELECT (COUNT(*) AS ?count) WHERE { ?s a <http://schema.org/VisualArtwork> }"
-        resp = requests.get(FUSEKI_QUERY_URL, params={'query': query},
-                           headers={'Accept': 'application/sparql-results+json'})
-        if resp.status_code == 200:
-            count = int(resp.json()["results"]["bindings"][0]["count"]["value"])
-            return count > 100  # Minimum threshold
-        return False
+        query = f"SELECT (COUNT(*) AS ?count) WHERE {{ ?s a <{ART.rdf_type}> }}"
+        # Fără cache: starea se schimbă cât timp Spark ETL încarcă date
+        bindings = fuseki.select(query, cache=False, timeout=10)
+        count = int(bindings[0]["count"]["value"])
+        return count > 100  # Minimum threshold
     except:
         return False
 
@@ -59,59 +66,36 @@ def sync_redis_from_fuseki():
     """Sync Redis cache from Fuseki (source of truth loaded by Spark ETL)"""
     print("[ART-SERVICE] Syncing Redis from Fuseki...", file=sys.stderr)
 
-    query = """
-    SELECT ?artwork ?name ?type ?creator ?movement ?country ?date ?material ?location
-    WHERE {
-        ?artwork a <http://schema.org/VisualArtwork> .
-        OPTIONAL { ?artwork <http://schema.org/name> ?name }
-        OPTIONAL { ?artwork <http://schema.org/artform> ?type }
-        OPTIONAL { ?artwork <http://schema.org/creator> ?creator }
-        OPTIONAL { ?artwork <http://schema.org/artMovement> ?movement }
-        OPTIONAL { ?artwork <http://schema.org/locationCreated> ?country }
-        OPTIONAL { ?artwork <http://schema.org/dateCreated> ?date }
-        OPTIONAL { ?artwork <http://schema.org/material> ?material }
-        OPTIONAL { ?artwork <http://schema.org/contentLocation> ?location }
-    }
-    """
+    # Un obiect per artwork, cu câmpurile / predicatele declarate în shared/models.py
+    query = ART.fuseki_query()
 
     try:
-        resp = requests.get(FUSEKI_QUERY_URL, params={'query': query},
-                           headers={'Accept': 'application/sparql-results+json'})
-        if resp.status_code != 200:
-            print(f"[ART-SERVICE] Fuseki query failed: {resp.status_code}", file=sys.stderr)
+        try:
+            bindings = fuseki.select(query, cache=False, timeout=300)
+        except requests.RequestException as e:
+            print(f"[ART-SERVICE] Fuseki query failed: {e}", file=sys.stderr)
             return False
 
-        bindings = resp.json()["results"]["bindings"]
         print(f"[ART-SERVICE] Found {len(bindings)} artworks in Fuseki.", file=sys.stderr)
 
         if not cache:
             return False
 
-        # Clear old data first
-        cache.delete("art:all")
-
-        redis_pipeline = cache.pipeline()
+        # Snapshot nou in staging, publicat atomic (RENAME) - art:all nu e niciodata gol
+        entities = []
         seen = set()
 
         for item in bindings:
-            artwork_id = item.get("artwork", {}).get("value", "")
+            obj = ART.from_fuseki(item)
+            artwork_id = obj["id"]
             if artwork_id and artwork_id not in seen:
-                obj = {
-                    "id": artwork_id,
-                    "name": item.get("name", {}).get("value", "Unknown"),
-                    "type": item.get("type", {}).get("value", "Unknown"),
-                    "creator": item.get("creator", {}).get("value", "Unknown"),
-                    "movement": item.get("movement", {}).get("value", "Unknown"),
-                    "country": item.get("country", {}).get("value", "Unknown"),
-                    "date": item.get("date", {}).get("value", "N/A"),
-                    "material": item.get("material", {}).get("value", "Unknown"),
-                    "location": item.get("location", {}).get("value", "Unknown")
-                }
-                redis_pipeline.rpush("art:all", json.dumps(obj))
+                entities.append({"obj": obj, "fp": fingerprint(obj)})
                 seen.add(artwork_id)
 
-        redis_pipeline.execute()
-        print(f"[ART-SERVICE] Redis synced with {len(seen)} artworks from Fuseki.", file=sys.stderr)
+        changes, _, _ = sync_snapshot(cache, "art", entities)
+        print(f"[ART-SERVICE] Redis synced with {len(seen)} artworks from Fuseki: {changes}", file=sys.stderr)
+        aggregates.materialize(cache, "art")
+        columnar.publish_snapshot(cache, "art", directory=columnar.CATALOGUE_DIR)
         return True
     except Exception as e:
         print(f"[ART-SERVICE] Sync error: {e}", file=sys.stderr)
@@ -123,18 +107,12 @@ def cache_sync_pipeline():
     Cache Sync Pipeline - Only syncs Redis from Fuseki (Spark ETL loads the data)
 
     Flow:
-    1. Wait for Fuseki to be ready
-    2. Wait for Spark ETL to populate Fuseki (poll until data exists)
-    3. Sync Redis cache from Fuseki
+    1. Redis already has data -> nothing to do (no Fuseki wait)
+    2. Redis empty but a local catalogue file exists -> republish it (last good snapshot, no SPARQL scan)
+    3. Otherwise wait for Fuseki / Spark ETL and sync Redis from Fuseki
     """
     time.sleep(5)  # Initial wait
 
-    if not wait_for_fuseki():
-        print("[ART-SERVICE] Fuseki not available. Aborting.", file=sys.stderr)
-        return
-
-    print("[ART-SERVICE] Starting Cache Sync (Fuseki -> Redis)...", file=sys.stderr)
-
     # Check if Redis already has data
     redis_has_data = cache and cache.exists("art:all") and cache.llen("art:all") > 100
 
@@ -142,6 +120,18 @@ def cache_sync_pipeline():
         print("[ART-SERVICE] Redis already has data. Skipping sync.", file=sys.stderr)
         return
 
+    if cache and columnar.restore_from_file(cache, "art", min_rows=101):
+        print("[ART-SERVICE] Redis restored from the local catalogue file. Skipping Fuseki sync.", file=sys.stderr)
+        aggregates.materialize(cache, "art")
+        columnar.publish_snapshot(cache, "art", directory=columnar.CATALOGUE_DIR)
+        return
+
+    if not wait_for_fuseki():
+        print("[ART-SERVICE] Fuseki not available. Aborting.", file=sys.stderr)
+        return
+
+    print("[ART-SERVICE] Starting Cache Sync (Fuseki -> Redis)...", file=sys.stderr)
+
     # Wait for Spark ETL to populate Fuseki (poll every 10 seconds, max 5 minutes)
     max_wait = 30  # 30 attempts * 10s = 5 minutes
     for i in range(max_wait):
@@ -162,55 +152,56 @@ threading.Thread(target=cache_sync_pipeline, daemon=True).start()
 @app.route('/search/art', methods=['GET'])
 def search_art():
     """Search artworks in Redis cache"""
-    q = request.args.get('q', '').lower()
+    q = request.args.get('q', '')
     if cache and cache.exists("art:all"):
-        raw = cache.lrange("art:all", 0, -1)
-        res = []
-        for d in raw:
-            obj = json.loads(d)
-            # Search in name, creator, movement, type
-            if (q in obj['name'].lower() or
-                q in obj['creator'].lower() or
-                q in obj['movement'].lower() or
-                q in obj['type'].lower()):
-                res.append(obj)
-                if len(res) >= 50:
-                    break
-        return jsonify(res)
+        if not q.strip():
+            return jsonify([json.loads(d) for d in cache.lrange("art:all", 0, 49)])
+        # Token index written next to art:all (see shared/redis_index.py)
+        return jsonify(redis_index.search(cache, "art", q, limit=50))
     return jsonify([])
 
 
 @app.route('/stats/art', methods=['GET'])
 def art_stats():
-    """Get art statistics from Fuseki - top movements and countries"""
+    """Top movements, countries, creators, decades, types and materials (materialized by the ETL)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        materialized = aggregates.summary(cache, "art", limit=limit)
+    except Exception as e:
+        print(f"⚠️ [STATS] art aggregates unavailable: {e}", file=sys.stderr)
+        materialized = None
+    if materialized:
+        materialized["source"] = "materialized"
+        return jsonify(materialized)
+
+    # Fallback: agregatele nu au fost încă publicate de ETL -> GROUP BY live în Fuseki
     # Top Art Movements
     sparql_movements = """
     SELECT ?movement (COUNT(?s) AS ?count) WHERE {
         ?s <http://schema.org/artMovement> ?movement .
-    } GROUP BY ?movement ORDER BY DESC(?count) LIMIT 10
-    """
+    } GROUP BY ?movement ORDER BY DESC(?count) LIMIT %d
+    """ % limit
 
     # Top Countries
     sparql_countries = """
     SELECT ?country (COUNT(?s) AS ?count) WHERE {
         ?s <http://schema.org/locationCreated> ?country .
-    } GROUP BY ?country ORDER BY DESC(?count) LIMIT 10
-    """
+    } GROUP BY ?country ORDER BY DESC(?count) LIMIT %d
+    """ % limit
 
     try:
         # Get movements
-        resp_mov = requests.get(FUSEKI_QUERY_URL, params={'query': sparql_movements})
         movements = [{"label": i["movement"]["value"], "value": int(i["count"]["value"])}
-                     for i in resp_mov.json()["results"]["bindings"]]
+                     for i in fuseki.select(sparql_movements)]
 
         # Get countries
-        resp_cnt = requests.get(FUSEKI_QUERY_URL, params={'query': sparql_countries})
         countries = [{"label": i["country"]["value"], "value": int(i["count"]["value"])}
-                     for i in resp_cnt.json()["results"]["bindings"]]
+                     for i in fuseki.select(sparql_countries)]
 
         return jsonify({
             "movements": movements,
-            "countries": countries
+            "countries": countries,
+            "source": "sparql"
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -235,8 +226,7 @@ def art_influences():
     """
 
     try:
-        resp = requests.get(FUSEKI_QUERY_URL, params={'query': sparql})
-        data = resp.json()["results"]["bindings"]
+        data = fuseki.select(sparql)
         res = [{
             "name": i["name"]["value"],
             "creator": i["creator"]["value"],
@@ -271,8 +261,7 @@ def recommend_art():
     """
 
     try:
-        resp = requests.get(FUSEKI_QUERY_URL, params={'query': sparql})
-        data = resp.json()["results"]["bindings"]
+        data = fuseki.select(sparql)
         res = [{
             "name": i["similarName"]["value"],
             "reason": f"Same creator: {i['creator']['value']}"
@@ -292,7 +281,8 @@ def health():
     return jsonify({
         "status": "healthy" if redis_ok and fuseki_ok else "degraded",
         "redis": {"connected": redis_ok, "art_count": redis_count},
-        "fuseki": {"has_data": fuseki_ok}
+        "fuseki": {"has_data": fuseki_ok},
+        "sparql": fuseki.report()
     })
 
 
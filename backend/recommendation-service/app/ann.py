@@ -0,0 +1,162 @@
+"""
+Approximate nearest neighbours for the recommender's feature space.
+
+LshIndex is random-hyperplane LSH (SimHash) over the L2-normalized TF-IDF
+rows: every table draws `bits` Gaussian hyperplanes (generated column chunk
+by column chunk, so the projection never needs a dense features x planes
+matrix in memory) and each row gets one `bits`-wide sign code per table.
+Rows are sorted by code per table, so a bucket is a searchsorted range. A
+query collects the seed's buckets (plus, with probes=1, every bucket one bit
+away) across all tables, keeps the rows that collide most often, and the
+caller re-ranks those candidates with the exact cosine.
+
+Operating point (ann_benchmark.py --synthetic 150000, 100 queries; all
+settings hit the 5000-candidate cap):
+
+    tables bits probes  recall@10  p50 ms   (brute force p50 12.8 ms)
+        32    8      1      0.608     6.4
+        64    8      1      0.722    10.6
+        96    8      1      0.826    14.6
+
+No setting reaches the 0.9 recall@10 target before it gets slower than
+brute force, so the recommender stays exact by default (ANN_MIN_ENTITIES=0)
+and the LSH path is opt-in: per request with exact=0, or per catalogue size
+with ANN_MIN_ENTITIES when lower recall is an acceptable price for latency.
+
+save_model / load_model persist a whole recommender model (CSR matrix, LSH
+arrays, ids, names, vocabulary, fingerprints) as .npy files plus one JSON
+file under <ANN_DIR>/<domain>/v<version>/. Arrays are loaded with
+mmap_mode="r", so a restarted service answers right away, shares the pages
+with the OS cache and only refreshes the entities the ETL changed since.
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+from scipy import sparse
+
+ANN_TABLES = int(os.getenv("ANN_TABLES", "32"))
+ANN_BITS = int(os.getenv("ANN_BITS", "8"))
+ANN_PROBES = int(os.getenv("ANN_PROBES", "1"))
+ANN_MAX_CANDIDATES = int(os.getenv("ANN_MAX_CANDIDATES", "5000"))
+
+
+class LshIndex:
+    def __init__(self, codes, order, sorted_codes, bits, probes=ANN_PROBES, max_candidates=ANN_MAX_CANDIDATES):
+        self.codes = codes                  # (rows, tables) code of every row in every table
+        self.order = order                  # (tables, rows) row ids sorted by code
+        self.sorted_codes = sorted_codes    # (tables, rows) codes in that order
+        self.bits = bits
+        self.probes = probes
+        self.max_candidates = max_candidates
+
+    @property
+    def tables(self):
+        return self.codes.shape[1]
+
+    @classmethod
+    def build(cls, matrix, tables=ANN_TABLES, bits=ANN_BITS, seed=0, chunk_cols=16384, **kwargs):
+        if bits > 31:
+            raise ValueError("LSH codes are uint32: bits must be <= 31")
+        rows, cols = matrix.shape
+        csc = matrix.tocsc()
+        rng = np.random.default_rng(seed)
+        powers = (1 << np.arange(bits)).astype(np.uint32)
+        codes = np.empty((rows, tables), dtype=np.uint32)
+        for t in range(tables):
+            projected = np.zeros((rows, bits), dtype=np.float32)
+            for start in range(0, cols, chunk_cols):
+                planes = rng.standard_normal((min(chunk_cols, cols - start), bits)).astype(np.float32)
+                projected += csc[:, start:start + chunk_cols] @ planes
+            codes[:, t] = ((projected > 0) * powers).sum(axis=1)
+
+        order = np.argsort(codes, axis=0, kind="stable").T.astype(np.int32)
+        sorted_codes = np.take_along_axis(codes.T, order, axis=1)
+        return cls(codes, np.ascontiguousarray(order), np.ascontiguousarray(sorted_codes), bits, **kwargs)
+
+    def candidates(self, row, probes=None):
+        """Row ids sharing a bucket with row (or a bucket one bit away if probes) in any table"""
+        probes = self.probes if probes is None else probes
+        flips = (1 << np.arange(self.bits)).astype(np.uint32)
+        found = []
+        for t in range(self.tables):
+            code = self.codes[row, t]
+            probe_codes = np.concatenate(([code], code ^ flips)) if probes else np.array([code], dtype=np.uint32)
+            lo = np.searchsorted(self.sorted_codes[t], probe_codes, side="left")
+            hi = np.searchsorted(self.sorted_codes[t], probe_codes, side="right")
+            found.extend(self.order[t, a:b] for a, b in zip(lo, hi) if b > a)
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        cand, hits = np.unique(np.concatenate(found), return_counts=True)
+        if len(cand) > self.max_candidates:
+            # Rows colliding in more buckets are more likely to be close: keep those
+            cand = cand[np.argpartition(-hits, self.max_candidates - 1)[:self.max_candidates]]
+        return cand
+
+    def report(self):
+        return {"tables": self.tables, "bits": self.bits, "probes": self.probes}
+
+
+def model_dir(base_dir, domain, version):
+    return os.path.join(base_dir, domain, f"v{version}")
+
+
+def save_model(base_dir, domain, version, model, fps):
+    """Write the model next to older versions, flip CURRENT, then drop the older versions"""
+    target = model_dir(base_dir, domain, version)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    matrix, lsh = model["matrix"], model["lsh"]
+    arrays = {"matrix_data": matrix.data, "matrix_indices": matrix.indices, "matrix_indptr": matrix.indptr}
+    if lsh is not None:
+        arrays.update({"lsh_codes": lsh.codes, "lsh_order": lsh.order, "lsh_sorted": lsh.sorted_codes})
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array))
+
+    meta = {"version": version, "shape": list(matrix.shape), "ids": model["ids"], "names": model["names"],
+            "vocab": [list(pair) for pair in model["vocab"]], "fps": fps,
+            "lsh_bits": lsh.bits if lsh is not None else None}
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(tmp, target)
+    pointer = os.path.join(base_dir, domain, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(os.path.basename(target))
+    os.replace(pointer + ".tmp", pointer)
+
+    for entry in os.listdir(os.path.join(base_dir, domain)):
+        if entry.startswith("v") and entry != os.path.basename(target):
+            shutil.rmtree(os.path.join(base_dir, domain, entry), ignore_errors=True)
+
+
+def load_model(base_dir, domain):
+    """The last saved model with memory-mapped arrays, or None"""
+    try:
+        with open(os.path.join(base_dir, domain, "CURRENT")) as f:
+            directory = os.path.join(base_dir, domain, f.read().strip())
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    def mapped(name):
+        return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+    try:
+        matrix = sparse.csr_matrix((mapped("matrix_data"), mapped("matrix_indices"), mapped("matrix_indptr")),
+                                   shape=tuple(meta["shape"]), copy=False)
+        lsh = None
+        if meta["lsh_bits"] is not None:
+            lsh = LshIndex(mapped("lsh_codes"), mapped("lsh_order"), mapped("lsh_sorted"), meta["lsh_bits"])
+    except (OSError, ValueError) as e:
+        print(f"⚠️ [ANN] Could not load {directory}: {e}", file=sys.stderr)
+        return None
+
+    return {"version": meta["version"], "matrix": matrix, "lsh": lsh, "ids": meta["ids"],
+            "names": meta["names"], "vocab": [tuple(pair) for pair in meta["vocab"]], "fps": meta["fps"]}
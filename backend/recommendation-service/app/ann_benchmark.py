@@ -0,0 +1,123 @@
+"""
+Recall-vs-latency benchmark of the LSH index against brute-force cosine.
+
+    python app/ann_benchmark.py --domain music             # features from Fuseki
+    python app/ann_benchmark.py --synthetic 200000         # generated music-like catalogue
+
+For every (tables, bits, probes) setting it reports recall@k against the
+exact top-k, the mean number of re-ranked candidates and p50 / p95 query
+latency, next to the brute-force latency, so ANN_TABLES / ANN_BITS /
+ANN_PROBES can be picked for a catalogue size.
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from ann import LshIndex
+from recommender import FeatureRecommender
+from shared.sparql_client import SparqlClient
+from similarity import load_features
+
+SETTINGS = [(16, 8, 0), (16, 8, 1), (32, 8, 0), (32, 8, 1), (32, 10, 1), (64, 6, 0), (64, 8, 1), (96, 8, 1)]
+
+
+def synthetic_catalogue(n, seed=0):
+    """Music-like features: skewed genres / countries, decades, shared members and awards"""
+    rnd = random.Random(seed)
+    genres = [f"genre {i}" for i in range(max(n // 200, 20))]
+    countries = [f"country {i}" for i in range(60)]
+    names, features = {}, {}
+    for i in range(n):
+        doc_id = f"urn:bench:{i}"
+        names[doc_id] = f"band {i}"
+        pairs = {("genre", rnd.choice(genres[:max(1, int(len(genres) * rnd.random() ** 2))])),
+                 ("country", countries[min(int(rnd.expovariate(0.15)), len(countries) - 1)]),
+                 ("decade", f"{rnd.randrange(1950, 2030, 10)}s")}
+        for _ in range(rnd.randrange(0, 5)):
+            pairs.add(("member", f"member {rnd.randrange(n * 2)}"))
+        if rnd.random() < 0.3:
+            pairs.add(("award", f"award {rnd.randrange(max(n // 50, 10))}"))
+        features[doc_id] = pairs
+    return names, features
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2)
+
+
+def top_scores(a, scores, rows, k):
+    """The k best positive scores, the seed itself excluded"""
+    picked = []
+    for j in np.argsort(-scores, kind="stable"):
+        if scores[j] <= 0 or len(picked) >= k:
+            break
+        if (rows[j] if rows is not None else j) != a:
+            picked.append(float(scores[j]))
+    return picked
+
+
+def recall(found, exact):
+    """Share of the exact top-k matched by an equally good answer (ties count as hits)"""
+    if not exact:
+        return None
+    return min(1.0, sum(s >= exact[-1] - 1e-9 for s in found) / len(exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domain", default="music")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N entities instead of reading Fuseki")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        names, features = synthetic_catalogue(args.synthetic)
+    else:
+        fuseki = SparqlClient(f"http://{os.getenv('FUSEKI_HOST', 'localhost')}:3030/bir/query", timeout=300)
+        names, features = load_features(fuseki, args.domain)
+
+    rec = FeatureRecommender(None, None, args.domain)
+    model, build_ms = timed(lambda: rec._encode(names, features))
+    matrix = model["matrix"]
+    rows = matrix.shape[0]
+    print(f"{rows} entities x {matrix.shape[1]} features, model + default LSH built in {build_ms:.0f} ms")
+
+    seeds = random.Random(1).sample(range(rows), min(args.queries, rows))
+    exact, exact_ms = {}, []
+    for a in seeds:
+        scores, ms = timed(lambda: (matrix[a] @ matrix.T).toarray().ravel())
+        exact[a] = top_scores(a, scores, None, args.k)
+        exact_ms.append(ms)
+    print(f"brute force: p50 {percentile(exact_ms, 50)} ms, p95 {percentile(exact_ms, 95)} ms\n")
+
+    print(f"{'tables':>6} {'bits':>4} {'probes':>6} {'build ms':>9} {'recall@' + str(args.k):>10} "
+          f"{'candidates':>10} {'p50 ms':>7} {'p95 ms':>7}")
+    for tables, bits, probes in SETTINGS:
+        lsh, lsh_build_ms = timed(lambda: LshIndex.build(matrix, tables=tables, bits=bits, probes=probes))
+        recalls, latencies, sizes = [], [], []
+        for a in seeds:
+            def query():
+                cand = lsh.candidates(a)
+                return cand, (matrix[cand] @ matrix[a].T).toarray().ravel()
+            (cand, scores), ms = timed(query)
+            hit = recall(top_scores(a, scores, cand, args.k), exact[a])
+            if hit is not None:
+                recalls.append(hit)
+            latencies.append(ms)
+            sizes.append(len(cand))
+        print(f"{tables:>6} {bits:>4} {probes:>6} {lsh_build_ms:>9.0f} {np.mean(recalls):>10.3f} "
+              f"{np.mean(sizes):>10.0f} {percentile(latencies, 50):>7} {percentile(latencies, 95):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 from flask import Flask, jsonify, request
-from SPARQLWrapper import SPARQLWrapper, JSON
 from flask_cors import CORS
 import os
+import sys
+import threading
+import time
+import redis
 import requests
+from shared import redis_index
+from shared.columnar import ColumnarCatalogue
+from shared.sparql_client import SparqlClient
+from shared.utils import is_missing, normalize
+from recommender import FeatureRecommender
+from similarity import DOMAINS, refresh_similarity
 
 app = Flask(__name__)
 CORS(app)
@@ -11,46 +20,105 @@ FUSEKI_HOST = os.getenv('FUSEKI_HOST', 'localhost')
 FUSEKI_ENDPOINT = f"http://{FUSEKI_HOST}:3030/bir/query"
 FUSEKI_QUERY_URL = FUSEKI_ENDPOINT
 
-sparql = SPARQLWrapper(FUSEKI_ENDPOINT)
-sparql.setReturnFormat(JSON)
+cache = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
+
+# Client SPARQL comun (autentificare admin, conexiuni reutilizate, rezultate cache-uite per versiune ETL)
+fuseki = SparqlClient(FUSEKI_QUERY_URL, cache, namespace="sparql:recommendation")
+
+RECOMMEND_LIMIT = 5
+RECOMMEND_BATCH_MAX = int(os.getenv("RECOMMEND_BATCH_MAX", "100"))
+
+# Catalog columnar (coduri NumPy), reîncărcat din <domain>:all doar când se schimbă etl:version
+columns = ColumnarCatalogue(cache)
+
+# Un model TF-IDF în memorie per domeniu (recommender.py), reconstruit incremental la fiecare versiune ETL
+recommenders = {domain: FeatureRecommender(cache, fuseki, domain) for domain in DOMAINS}
+
+
+def model_pipeline(interval):
+    """Background: refresh the recommenders, then the precomputed neighbours from the same features"""
+    while True:
+        for domain, rec in recommenders.items():
+            try:
+                rec.refresh()
+                if rec.ready():
+                    refresh_similarity(cache, fuseki, domain, loaded=rec.snapshot())
+            except Exception as e:
+                print(f"❌ [RECOMMENDER] {domain} refresh failed: {e}", file=sys.stderr)
+        time.sleep(interval)
+
+
+def find_similar(domain, name):
+    """Cosine neighbours from the in-memory model, else the precomputed lists; None if neither knows name"""
+    rec = recommenders[domain]
+    if rec.ready():
+        neighbours = rec.recommend([name], k=RECOMMEND_LIMIT)[name]
+        if neighbours is not None:
+            return neighbours
+    return precomputed_neighbours(domain, name)
+
+
+def find_target(domain, name):
+    """Catalogue object by name: columnar table once loaded, else the Redis index"""
+    table = columns.get(domain)
+    if table is not None:
+        row = table.find(name)
+        return table.row(row) if row is not None else None
+    return redis_index.find_by_name(cache, domain, name)
+
+
+def columnar_similar(domain, name, groups, exact=True):
+    """[(catalogue object, matched fields)] from the columnar table, None until it is loaded"""
+    table = columns.get(domain)
+    if table is None:
+        return None
+    row = table.find(name)
+    if row is None or (exact and normalize(table.names[row]) != normalize(name)):
+        return []
+    return [(table.row(match), group) for match, group in table.similar(row, groups, limit=RECOMMEND_LIMIT)]
+
+
+def precomputed_neighbours(domain, name):
+    """Neighbours built offline by similarity.py, None if the entity or the index is missing"""
+    try:
+        target = find_target(domain, name)
+        if not target or normalize(target.get('name')) != normalize(name):
+            return None
+        neighbours = redis_index.get_neighbours(cache, domain, target['id'])
+        return neighbours[:RECOMMEND_LIMIT] if neighbours is not None else None
+    except Exception as e:
+        print(f"⚠️ [SIMILARITY] {domain} lookup failed: {e}", file=sys.stderr)
+        return None
 
-# --- FIX AUTENTIFICARE ---
-sparql.setCredentials("admin", "admin")
-# -------------------------
 
 @app.route('/recommend', methods=['GET'])
 def recommend():
     band_name = request.args.get('band_name', '')
-    
-    # Logică simplă: Găsește trupe din același gen și aceeași țară
-    query = f"""
-    PREFIX schema: <http://schema.org/>
-    SELECT ?similarName
-    WHERE {{
-      ?target a schema:MusicGroup ;
-              schema:name "{band_name}" ;
-              schema:genre ?genre ;
-              schema:location ?country .
-              
-      ?similar a schema:MusicGroup ;
-               schema:name ?similarName ;
-               schema:genre ?genre ;
-               schema:location ?country .
-               
-      FILTER (?similarName != "{band_name}")
-    }}
-    LIMIT 5
-    """
+
+    # 0. FAST PATH: similaritate cosinus pe gen, țară, deceniu, membri, premii
+    neighbours = find_similar("music", band_name)
+    if neighbours is not None:
+        return jsonify([{"name": n["name"], "score": n["score"], "reasons": n["reasons"]} for n in neighbours])
+
+    # Fallback: logică simplă: Găsește trupe din același gen și aceeași țară
+    try:
+        matches = columnar_similar("music", band_name, (("genre", "country"),))
+        if matches is not None:
+            return jsonify([{"name": doc["name"]} for doc, _ in matches])
+    except Exception as e:
+        print(f"⚠️ [COLUMNAR] music lookup failed: {e}", file=sys.stderr)
+
+    # Catalogul columnar nu e încă încărcat: aceeași regulă pe indexul Redis (shared/redis_index.py)
     try:
-        sparql.setQuery(query)
-        results = sparql.query().convert()
-        
-        recs = []
-        for r in results["results"]["bindings"]:
-            recs.append({"name": r["similarName"]["value"]})
-        return jsonify(recs)
+        target = redis_index.find_by_name(cache, "music", band_name)
+        if not target or normalize(target.get('name')) != normalize(band_name) or is_missing(target.get('country')):
+            return jsonify([])
+        country = normalize(target.get('country'))
+        candidates = redis_index.similar_by_facets(cache, "music", target, ("genre",), limit=RECOMMEND_LIMIT * 4)
+        return jsonify([{"name": doc["name"]} for doc, _ in candidates
+                        if normalize(doc.get('country')) == country][:RECOMMEND_LIMIT])
     except Exception as e:
-        print(f"Eroare Fuseki Recs: {e}")
+        print(f"⚠️ [REDIS-INDEX] music lookup failed: {e}", file=sys.stderr)
         return jsonify([])
 
 
@@ -58,32 +126,25 @@ def recommend():
 
 @app.route('/recommend/art', methods=['GET'])
 def recommend_art():
-    """Recommend similar artworks based on same creator"""
+    """Recommend similar artworks (cosine over creator / movement / material, else same creator)"""
     artwork_name = request.args.get('artwork_name')
     if not artwork_name:
         return jsonify([])
 
-    # Query simplu - caută în Redis cache
-    try:
-        # Găsește artwork-ul în Redis prin cache lookup
-        import redis
-        cache = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, decode_responses=True)
-
-        # Citește toate artwork-urile din cache
-        all_artworks_raw = cache.lrange("art:all", 0, -1)
-        if not all_artworks_raw:
-            return jsonify([])
-
-        import json
-        all_artworks = [json.loads(a) for a in all_artworks_raw]
+    neighbours = find_similar("art", artwork_name)
+    if neighbours is not None:
+        return jsonify([{"name": n["name"], "reason": "; ".join(n["reasons"]), "score": n["score"]}
+                        for n in neighbours])
 
-        # Găsește artwork-ul țintă
-        target = None
-        for art in all_artworks:
-            if artwork_name.lower() in art.get('name', '').lower():
-                target = art
-                break
+    # Găsește artworks similare (același creator) în catalogul columnar, fără a descărca art:all
+    try:
+        matches = columnar_similar("art", artwork_name, (("creator",),), exact=False)
+        if matches is not None:
+            return jsonify([{"name": doc["name"], "reason": f"Same creator: {doc['creator']}"}
+                            for doc, _ in matches])
 
+        # Catalogul nu e încă încărcat: indexul Redis (shared/redis_index.py)
+        target = redis_index.find_by_name(cache, "art", artwork_name)
         if not target:
             return jsonify([])
 
@@ -91,12 +152,11 @@ def recommend_art():
         target_creator = target.get('creator', 'Unknown')
         similar = [
             {
-                "name": art.get('name'),
+                "name": doc.get('name'),
                 "reason": f"Same creator: {target_creator}"
             }
-            for art in all_artworks
-            if art.get('creator') == target_creator and art.get('name') != target.get('name')
-        ][:5]
+            for doc, _ in redis_index.similar_by_facets(cache, "art", target, ("creator",), limit=RECOMMEND_LIMIT)
+        ]
 
         return jsonify(similar)
 
@@ -105,5 +165,41 @@ def recommend_art():
         return jsonify([])
 
 
+@app.route('/recommend/batch', methods=['GET'])
+def recommend_batch():
+    """Many seeds in one call: /recommend/batch?domain=music&name=A&name=B&limit=5"""
+    domain = request.args.get('domain', 'music')
+    seeds = list(dict.fromkeys(n for n in request.args.getlist('name') if n.strip()))
+    if domain not in recommenders:
+        return jsonify({"error": f"Unknown domain: {domain}"}), 400
+    if len(seeds) > RECOMMEND_BATCH_MAX:
+        return jsonify({"error": f"At most {RECOMMEND_BATCH_MAX} names per batch"}), 400
+
+    rec = recommenders[domain]
+    if not rec.ready():
+        return jsonify({"error": "Recommender is still loading"}), 503
+
+    limit = min(max(request.args.get('limit', RECOMMEND_LIMIT, type=int), 1), 50)
+    # exact=1 forțează brute force, exact=0 forțează indexul LSH (implicit: brute force, LSH doar peste ANN_MIN_ENTITIES)
+    exact = request.args.get('exact')
+    exact = None if exact is None else exact.lower() in ("1", "true", "yes")
+    return jsonify({"version": rec.version, "results": rec.recommend(seeds, k=limit, exact=exact)})
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok", "recommenders": {d: rec.report() for d, rec in recommenders.items()},
+                    "columnar": columns.report(), "sparql": fuseki.report()})
+
+
 if __name__ == '__main__':
+    # Pornire rapidă: ultimul model salvat (mmap), apoi doar diferențele publicate de ETL între timp
+    for rec in recommenders.values():
+        rec.restore()
+    # Ultimul catalog bun de pe disc (mmap, milisecunde), apoi reîmprospătare din Redis în fundal
+    columns.load_files()
+    threading.Thread(target=columns.refresh, daemon=True).start()
+    # Modelele și vecinii precalculați se reconstruiesc la fiecare versiune ETL publicată
+    threading.Thread(target=model_pipeline, args=(int(os.getenv("RECOMMENDER_WATCH_SECONDS", "30")),),
+                     daemon=True).start()
     app.run(host='0.0.0.0', port=8003)
\ No newline at end of file
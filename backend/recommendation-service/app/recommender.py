@@ -0,0 +1,222 @@
+"""
+In-memory vector recommender (scikit-learn sparse TF-IDF + cosine).
+
+The (feature, value) pairs of every entity (similarity.load_features: genre,
+country, decade, members, awards / creator, movement, material) are one-hot
+encoded into a CSR matrix, re-weighted with TF-IDF (a shared band member or a
+rare award says more than a shared country) and by the per-feature weights,
+then L2-normalized, so cosine similarity is a sparse dot product. Any number
+of seeds is answered with one (seeds x entities) product and a row-wise
+argpartition.
+
+Refresh is incremental: when etl:version moves, only entities whose
+triples fingerprint in <domain>:rdf:fp changed are re-read from Fuseki, removed ones are
+dropped and everything else is reused before the matrix is re-encoded.
+
+Every model also gets an LSH index (ann.py) and is saved to ANN_DIR, so a
+restarted service memory-maps the last model instead of re-reading Fuseki.
+Queries are exact (brute force) by default. Setting ANN_MIN_ENTITIES routes
+catalogues of that many rows or more through the index (candidates re-ranked
+with the exact cosine). See ann.py for the measured recall before enabling it.
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.preprocessing import normalize as l2_normalize
+
+from ann import LshIndex, load_model, save_model
+from shared.utils import get_data_version, normalize
+from similarity import feature_weights, load_features, reasons
+
+SEED_CHUNK = 32
+ANN_DIR = os.getenv("ANN_DIR", "/app/cache/ann")
+ANN_MIN_ENTITIES = int(os.getenv("ANN_MIN_ENTITIES", "0"))  # 0: exact search unless a request asks for LSH
+
+
+class FeatureRecommender:
+    def __init__(self, cache, fuseki, domain):
+        self.cache = cache
+        self.fuseki = fuseki
+        self.domain = domain
+        self.weights = feature_weights(domain)
+        self.names = {}
+        self.features = {}
+        self.fps = {}
+        self.version = None
+        self.model = None
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def ready(self):
+        return self.model is not None
+
+    def restore(self):
+        """Load the last saved model (memory-mapped); the next refresh only catches up on ETL changes"""
+        saved = load_model(ANN_DIR, self.domain) if ANN_DIR else None
+        if not saved:
+            return False
+        start = time.time()
+        with self._lock:
+            indices, indptr = saved["matrix"].indices, saved["matrix"].indptr
+            vocab, names = saved["vocab"], saved["names"]
+            features = {doc_id: set() for doc_id in names}
+            for row, doc_id in enumerate(saved["ids"]):
+                features[doc_id] = {vocab[c] for c in indices[indptr[row]:indptr[row + 1]]}
+
+            self.model = self._assemble(saved["matrix"], saved["ids"], names, features, vocab, saved["lsh"])
+            self.names, self.features, self.fps, self.version = names, features, saved["fps"], saved["version"]
+            self._set_stats("restored from disk", start)
+        return True
+
+    def snapshot(self):
+        """(version, names, features) the current model was built from"""
+        with self._lock:
+            return self.version, self.names, self.features
+
+    def refresh(self, force=False):
+        """Re-encode the model if the ETL published a new version; True if it was rebuilt"""
+        version = get_data_version(self.cache)
+        if not force and version == self.version:
+            return False
+
+        with self._lock:
+            if not force and version == self.version:
+                return False
+            start = time.time()
+            # Triples fingerprints (what Fuseki holds: members, awards...), the object ones if never loaded
+            fps = self.cache.hgetall(f"{self.domain}:rdf:fp") or self.cache.hgetall(f"{self.domain}:fp")
+
+            if force or not self.names or not fps:
+                names, features = load_features(self.fuseki, self.domain)
+                mode = "full"
+            else:
+                changed = [doc_id for doc_id, fp in fps.items() if self.fps.get(doc_id) != fp]
+                removed = [doc_id for doc_id in self.fps if doc_id not in fps]
+                names, features = dict(self.names), dict(self.features)
+                for doc_id in removed + changed:
+                    names.pop(doc_id, None)
+                    features.pop(doc_id, None)
+                if changed:
+                    changed_names, changed_features = load_features(self.fuseki, self.domain, ids=changed)
+                    names.update(changed_names)
+                    features.update(changed_features)
+                mode = f"incremental: {len(changed)} changed, {len(removed)} removed"
+
+            if not names:
+                print(f"⚠️ [RECOMMENDER] {self.domain}: no entities loaded, keeping the previous model",
+                      file=sys.stderr)
+                return False
+
+            # The model carries its own names / features, so readers swap to it in one step
+            self.model = self._encode(names, features)
+            self.names, self.features, self.fps, self.version = names, features, fps, version
+            self._set_stats(mode, start)
+
+        if ANN_DIR:
+            try:
+                save_model(ANN_DIR, self.domain, version, self.model, fps)
+            except Exception as e:
+                print(f"⚠️ [RECOMMENDER] {self.domain}: could not save the model: {e}", file=sys.stderr)
+        return True
+
+    def _set_stats(self, mode, start):
+        self.stats = {"version": self.version, "entities": len(self.model["ids"]),
+                      "features": self.model["matrix"].shape[1], "mode": mode,
+                      "build_seconds": round(time.time() - start, 2), "loaded_at": time.time()}
+        print(f"✅ [RECOMMENDER] {self.domain}: {self.stats['entities']} entities x "
+              f"{self.stats['features']} features ({mode}) in {self.stats['build_seconds']}s",
+              file=sys.stderr)
+
+    def _encode(self, names, features):
+        ids = [doc_id for doc_id in names if features.get(doc_id)]
+        vocab = {}
+        rows, cols = [], []
+        for row, doc_id in enumerate(ids):
+            for pair in features[doc_id]:
+                rows.append(row)
+                cols.append(vocab.setdefault(pair, len(vocab)))
+
+        onehot = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(ids), len(vocab)))
+        tfidf = TfidfTransformer(norm=None).fit_transform(onehot)
+        w = np.array([self.weights[feature] for feature, _ in vocab])
+        matrix = l2_normalize(tfidf.multiply(w.reshape(1, -1)).tocsr())
+        lsh = LshIndex.build(matrix) if len(ids) > 1 and vocab else None
+        return self._assemble(matrix, ids, names, features, list(vocab), lsh)
+
+    def _assemble(self, matrix, ids, names, features, vocab, lsh):
+        by_name = {}
+        for row, doc_id in enumerate(ids):
+            by_name.setdefault(normalize(names[doc_id]), row)
+        return {"matrix": matrix, "ids": ids, "names": names, "features": features, "vocab": vocab,
+                "lsh": lsh, "by_name": by_name, "name_keys": [normalize(names[doc_id]) for doc_id in ids]}
+
+    def use_ann(self, model=None):
+        model = model or self.model
+        return (ANN_MIN_ENTITIES > 0 and model is not None and model["lsh"] is not None
+                and len(model["ids"]) >= ANN_MIN_ENTITIES)
+
+    def recommend(self, seeds, k=5, exact=None):
+        """
+        {seed name: [{"id", "name", "score", "reasons"}] or None if unknown}, all seeds at once.
+        exact=None uses LSH only when ANN_MIN_ENTITIES enables it for this size; True / False forces one.
+        """
+        model = self.model
+        results = {seed: None for seed in seeds}
+        if model is None:
+            return results
+
+        found = [(seed, model["by_name"][normalize(seed)]) for seed in results
+                 if normalize(seed) in model["by_name"]]
+        matrix = model["matrix"]
+        use_ann = self.use_ann(model) if exact is None else (not exact and model["lsh"] is not None)
+
+        if use_ann:
+            for seed, a in found:
+                cand = model["lsh"].candidates(a)
+                scores = (matrix[cand] @ matrix[a].T).toarray().ravel()
+                results[seed] = self._top(model, a, scores, k, cand)
+            return results
+
+        for i in range(0, len(found), SEED_CHUNK):
+            chunk = found[i:i + SEED_CHUNK]
+            scores = (matrix[[row for _, row in chunk]] @ matrix.T).toarray()
+            for (seed, a), row_scores in zip(chunk, scores):
+                results[seed] = self._top(model, a, row_scores, k)
+        return results
+
+    def _top(self, model, a, scores, k, rows=None):
+        """Best k of scores; rows maps score positions to matrix rows (all rows when None)"""
+        ids, names, features, name_keys = model["ids"], model["names"], model["features"], model["name_keys"]
+        if not len(scores):
+            return []
+        # Over-fetch a little: the seed and same-name duplicates get skipped
+        top = min(len(scores), k * 4)
+        order = np.argpartition(-scores, top - 1)[:top] if top < len(scores) else np.arange(len(scores))
+        order = order[np.argsort(-scores[order], kind="stable")]
+
+        seen = {name_keys[a]}
+        picked = []
+        for j in order:
+            b = rows[j] if rows is not None else j
+            if scores[j] <= 0 or len(picked) >= k:
+                break
+            if name_keys[b] in seen:
+                continue
+            seen.add(name_keys[b])
+            picked.append({
+                "id": ids[b],
+                "name": names[ids[b]],
+                "score": round(float(scores[j]), 4),
+                "reasons": reasons(features[ids[a]] & features[ids[b]], self.weights)
+            })
+        return picked
+
+    def report(self):
+        model = self.model
+        ann = dict(model["lsh"].report(), active=self.use_ann(model)) if model and model["lsh"] else None
+        return dict(self.stats, ready=self.ready(), ann=ann)
@@ -0,0 +1,241 @@
+"""
+Precomputed neighbour lists (weighted Jaccard) for music and art.
+
+Offline job: every entity becomes a set of (feature, value) pairs read from
+Fuseki, one query per property, so multi-valued properties (band members,
+awards, materials) are kept whole instead of being multiplied out into rows.
+Each feature carries a weight and neighbours are ranked by weighted Jaccard
+
+    J(a, b) = w(A & B) / w(A | B)
+
+computed block by block with a sparse matrix product, so only pairs sharing
+at least one feature value are ever scored. The top-K lists, with the shared
+features as reasons, are written to one Redis hash per domain, swapped in
+atomically and stamped with the ETL data version they were built from;
+/analytics/similar and /recommend answer with a single HGET
+(redis_index.get_neighbours).
+
+recommendation-service rebuilds a domain whenever etl:version moves, from the
+features its in-memory recommender already holds; it can also be run by hand:
+    python app/similarity.py [music] [art]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+from shared import redis_index
+from shared.sparql_client import SparqlClient
+from shared.utils import get_data_version, is_missing, normalize
+
+SCHEMA = "http://schema.org/"
+
+# feature -> (predicate, weight)
+DOMAINS = {
+    "music": {
+        "type": SCHEMA + "MusicGroup",
+        "features": {
+            "genre": (SCHEMA + "genre", 3.0),
+            "country": (SCHEMA + "location", 1.0),
+            "decade": ("http://dbpedia.org/ontology/activeYearsStartYear", 1.0),
+            "member": (SCHEMA + "member", 4.0),
+            "award": (SCHEMA + "award", 2.0)
+        }
+    },
+    "art": {
+        "type": SCHEMA + "VisualArtwork",
+        "features": {
+            "creator": (SCHEMA + "creator", 4.0),
+            "movement": (SCHEMA + "artMovement", 2.0),
+            "material": (SCHEMA + "material", 1.0)
+        }
+    }
+}
+
+REASON_LABELS = {
+    "genre": "Same genre",
+    "country": "Same country",
+    "decade": "Same decade",
+    "member": "Shared member",
+    "award": "Shared award",
+    "creator": "Same creator",
+    "movement": "Same movement",
+    "material": "Same material"
+}
+
+TOP_K = int(os.getenv("SIMILARITY_TOP_K", "10"))
+MAX_REASONS = 3
+BLOCK_ROWS = 512
+
+
+def feature_value(feature, raw):
+    if is_missing(raw):
+        return None
+    if feature == "decade":
+        try:
+            return f"{int(str(raw)[:4]) // 10 * 10}s"
+        except ValueError:
+            return None
+    return raw.strip()
+
+
+def load_features(fuseki, domain, ids=None, chunk_size=200):
+    """
+    Returns ({id: name}, {id: {(feature, value), ...}}) for every named entity
+    of the domain, or only for `ids` (fetched in VALUES chunks) when given.
+    fuseki is a shared SparqlClient; these loads bypass its result cache.
+    """
+    if ids is not None:
+        names, features = {}, {}
+        ids = list(ids)
+        for i in range(0, len(ids), chunk_size):
+            values = " ".join(f"<{doc_id}>" for doc_id in ids[i:i + chunk_size])
+            chunk_names, chunk_features = _load_features(fuseki, domain, f"VALUES ?s {{ {values} }}")
+            names.update(chunk_names)
+            features.update(chunk_features)
+        return names, features
+    return _load_features(fuseki, domain)
+
+
+def _load_features(fuseki, domain, restrict=""):
+    cfg = DOMAINS[domain]
+    names = {}
+    query = f"SELECT ?s ?o WHERE {{ {restrict} ?s a <{cfg['type']}> ; <{SCHEMA}name> ?o }}"
+    for r in fuseki.select(query, cache=False, timeout=300):
+        names.setdefault(r["s"]["value"], r["o"]["value"])
+
+    features = {doc_id: set() for doc_id in names}
+    for feature, (predicate, _) in cfg["features"].items():
+        query = f"SELECT ?s ?o WHERE {{ {restrict} ?s a <{cfg['type']}> ; <{predicate}> ?o }}"
+        for r in fuseki.select(query, cache=False, timeout=300):
+            pairs = features.get(r["s"]["value"])
+            value = feature_value(feature, r["o"]["value"])
+            if pairs is not None and value:
+                pairs.add((feature, value))
+    return names, features
+
+
+def feature_weights(domain):
+    return {feature: weight for feature, (_, weight) in DOMAINS[domain]["features"].items()}
+
+
+def build_neighbours(names, features, weights, k=TOP_K, block_rows=BLOCK_ROWS):
+    """{id: [{"id", "name", "score", "reasons"}, ...]} with the k best neighbours of every entity"""
+    ids = [doc_id for doc_id in names if features.get(doc_id)]
+    if not ids:
+        return {}
+
+    vocab = {}
+    rows, cols = [], []
+    for row, doc_id in enumerate(ids):
+        for pair in features[doc_id]:
+            rows.append(row)
+            cols.append(vocab.setdefault(pair, len(vocab)))
+
+    w = np.array([weights[feature] for feature, _ in vocab], dtype=np.float64)
+    x = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(ids), len(vocab)))
+    xw = x.multiply(w.reshape(1, -1)).tocsr()
+    xt = x.T.tocsr()
+    mass = np.asarray(xw.sum(axis=1)).ravel()
+    name_keys = [normalize(names[doc_id]) for doc_id in ids]
+
+    neighbours = {}
+    for start in range(0, len(ids), block_rows):
+        # inter[i, j] = weight of the features shared by entity start+i and entity j
+        inter = (xw[start:start + block_rows] @ xt).tocsr()
+        for i in range(inter.shape[0]):
+            a = start + i
+            lo, hi = inter.indptr[i], inter.indptr[i + 1]
+            cand, shared = inter.indices[lo:hi], inter.data[lo:hi]
+            scores = shared / (mass[a] + mass[cand] - shared)
+
+            # Over-fetch a little: self and same-name duplicates get skipped below
+            top = min(len(scores), k * 4)
+            order = np.argpartition(-scores, top - 1)[:top] if top < len(scores) else np.arange(len(scores))
+            order = order[np.argsort(-scores[order], kind="stable")]
+
+            seen = {name_keys[a]}
+            picked = []
+            for j in order:
+                b = cand[j]
+                if name_keys[b] in seen:
+                    continue
+                seen.add(name_keys[b])
+                picked.append({
+                    "id": ids[b],
+                    "name": names[ids[b]],
+                    "score": round(float(scores[j]), 4),
+                    "reasons": reasons(features[ids[a]] & features[ids[b]], weights)
+                })
+                if len(picked) >= k:
+                    break
+            neighbours[ids[a]] = picked
+    return neighbours
+
+
+def reasons(shared, weights):
+    """Shared feature values, heaviest first, as human-readable reasons"""
+    ranked = sorted(shared, key=lambda pair: (-weights[pair[0]], pair))
+    return [f"{REASON_LABELS[feature]}: {value}" for feature, value in ranked[:MAX_REASONS]]
+
+
+def publish_neighbours(cache, domain, neighbours, version):
+    """Write into a staging hash, then swap it in together with its version stamp"""
+    key = redis_index.neighbours_key(domain)
+    staging = f"{key}:staging"
+    cache.delete(staging)
+    items = list(neighbours.items())
+    for i in range(0, len(items), 1000):
+        cache.hset(staging, mapping={doc_id: json.dumps(lst) for doc_id, lst in items[i:i + 1000]})
+
+    pipe = cache.pipeline(transaction=True)
+    if items:
+        pipe.rename(staging, key)
+    else:
+        pipe.delete(key)
+    pipe.set(f"{key}:version", version)
+    pipe.execute()
+
+
+def refresh_similarity(cache, fuseki, domain, force=False, k=TOP_K, loaded=None):
+    """
+    Rebuild a domain's neighbour lists unless they already match the current ETL
+    version. loaded=(version, names, features) reuses features already fetched
+    (e.g. by the in-memory recommender) instead of querying Fuseki again.
+    """
+    key = redis_index.neighbours_key(domain)
+    version = loaded[0] if loaded else get_data_version(cache)
+    if not force and cache.get(f"{key}:version") == str(version):
+        return None
+    # One builder at a time across replicas
+    if not cache.set(f"{key}:lock", "1", nx=True, ex=1800):
+        return None
+
+    try:
+        start = time.time()
+        names, features = loaded[1:] if loaded else load_features(fuseki, domain)
+        neighbours = build_neighbours(names, features, feature_weights(domain), k=k)
+        if not neighbours and cache.exists(key):
+            # Fuseki empty or unreachable mid-way: keep serving the previous lists
+            print(f"⚠️ [SIMILARITY] {domain}: no entities loaded, keeping the previous index", file=sys.stderr)
+            return None
+        publish_neighbours(cache, domain, neighbours, version)
+        stats = {"domain": domain, "version": version, "entities": len(neighbours),
+                 "seconds": round(time.time() - start, 1)}
+        print(f"✅ [SIMILARITY] {domain}: top-{k} neighbours for {stats['entities']} entities "
+              f"(version {version}) in {stats['seconds']}s", file=sys.stderr)
+        return stats
+    finally:
+        cache.delete(f"{key}:lock")
+
+
+if __name__ == "__main__":
+    import redis
+
+    redis_client = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=6379, decode_responses=True)
+    client = SparqlClient(f"http://{os.getenv('FUSEKI_HOST', 'localhost')}:3030/bir/query", timeout=300)
+    for name in sys.argv[1:] or list(DOMAINS):
+        refresh_similarity(redis_client, client, name, force=True)
@@ -0,0 +1,202 @@
+"""
+Materialized aggregates (rollups) of the music and art catalogues.
+
+Every ETL publish recomputes the count of entities per value of a few
+dimensions and writes them to Redis, so the /stats endpoints read sorted
+sets instead of running GROUP BY queries over the whole graph. Music also
+gets a small cube (one count per genre x country x decade combination), from
+which the filtered music stats are rolled up without touching Fuseki.
+
+Keys (per domain):
+    <domain>:agg              hash: version, total, built_at
+    <domain>:agg:<dimension>  sorted set value -> number of entities
+    <domain>:agg:cube         hash "genre\\x1fcountry\\x1fdecade" -> number of entities
+
+New aggregates are written to :staging keys and swapped in with RENAME inside
+one MULTI, like the catalogue itself (shared/delta.py). Placeholder values
+(Unknown, N/A) are not counted in the rollups; in the cube they are "".
+"""
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+from shared.models import DOMAINS
+from shared.utils import get_data_version, is_missing
+
+# dimension -> catalogue field (declared per domain in shared/models.py)
+ROLLUPS = {name: domain.rollups for name, domain in DOMAINS.items()}
+
+# Dimensions crossed in the cube of a domain (filtered stats)
+CUBES = {name: domain.cube for name, domain in DOMAINS.items() if domain.cube}
+
+CUBE_SEPARATOR = "\x1f"
+YEAR_RE = re.compile(r"^\s*(-?\d{1,4})")
+
+
+def meta_key(domain):
+    return f"{domain}:agg"
+
+
+def rollup_key(domain, dimension):
+    return f"{domain}:agg:{dimension}"
+
+
+def cube_key(domain):
+    return f"{domain}:agg:cube"
+
+
+def decade_of(value):
+    """'1965' / '1503-01-01T00:00:00Z' -> '1960s' / '1500s', None without a year"""
+    match = YEAR_RE.match(str(value or ""))
+    if not match:
+        return None
+    return f"{int(match.group(1)) // 10 * 10}s"
+
+
+def dimension_value(dimension, raw):
+    if is_missing(raw):
+        return None
+    if dimension == "decade":
+        return decade_of(raw)
+    return str(raw).strip()
+
+
+def compute(domain, docs):
+    """{"total", "rollups": {dimension: Counter}, "cube": Counter of value tuples} for catalogue objects"""
+    fields = ROLLUPS[domain]
+    cube_dims = CUBES.get(domain, ())
+    rollups = {dimension: Counter() for dimension in fields}
+    cube = Counter()
+    total = 0
+    for doc in docs:
+        total += 1
+        values = {dimension: dimension_value(dimension, doc.get(field)) for dimension, field in fields.items()}
+        for dimension, value in values.items():
+            if value:
+                rollups[dimension][value] += 1
+        if cube_dims:
+            cube[tuple(values[d] or "" for d in cube_dims)] += 1
+    return {"total": total, "rollups": rollups, "cube": cube}
+
+
+def publish(cache, domain, result, version, chunk_size=1000):
+    """Stage every rollup (and the cube), then swap them all in with the metadata in one MULTI"""
+    staged = []
+    pipe = cache.pipeline(transaction=False)
+    for dimension, counts in result["rollups"].items():
+        key = rollup_key(domain, dimension)
+        pipe.delete(f"{key}:staging")
+        items = list(counts.items())
+        for i in range(0, len(items), chunk_size):
+            pipe.zadd(f"{key}:staging", dict(items[i:i + chunk_size]))
+        staged.append((key, bool(items)))
+    if domain in CUBES:
+        key = cube_key(domain)
+        pipe.delete(f"{key}:staging")
+        items = [(CUBE_SEPARATOR.join(cell), count) for cell, count in result.get("cube", {}).items()]
+        for i in range(0, len(items), chunk_size):
+            pipe.hset(f"{key}:staging", mapping=dict(items[i:i + chunk_size]))
+        staged.append((key, bool(items)))
+    pipe.execute()
+
+    pipe = cache.pipeline(transaction=True)
+    for key, filled in staged:
+        if filled:
+            pipe.rename(f"{key}:staging", key)
+        else:
+            pipe.delete(key)
+    pipe.hset(meta_key(domain), mapping={"version": version, "total": result["total"],
+                                         "built_at": int(time.time())})
+    pipe.execute()
+
+
+def materialize(cache, domain, force=False):
+    """
+    Recompute a domain's aggregates from the published <domain>:all list,
+    unless they were already built for the current ETL version.
+    """
+    version = get_data_version(cache)
+    if not force and cache.hget(meta_key(domain), "version") == str(version):
+        return None
+
+    start = time.time()
+    docs = (json.loads(d) for d in cache.lrange(f"{domain}:all", 0, -1))
+    result = compute(domain, docs)
+    if not result["total"]:
+        return None
+    publish(cache, domain, result, version)
+    stats = {"domain": domain, "version": version, "total": result["total"],
+             "seconds": round(time.time() - start, 2)}
+    print(f"📊 [AGGREGATES] {domain}: {result['total']} entities rolled up (version {version}) "
+          f"in {stats['seconds']}s", file=sys.stderr)
+    return stats
+
+
+def meta(cache, domain):
+    """Metadata of the materialized aggregates, None if the ETL has not built them yet"""
+    info = cache.hgetall(meta_key(domain))
+    if not info:
+        return None
+    return {"version": int(info.get("version", 0)), "total": int(info.get("total", 0)),
+            "built_at": int(info.get("built_at", 0))}
+
+
+def top(cache, domain, dimension, limit=10):
+    """[(value, count)] most frequent first (every value with limit=None)"""
+    end = -1 if limit is None else limit - 1
+    return [(value, int(count)) for value, count in
+            cache.zrevrange(rollup_key(domain, dimension), 0, end, withscores=True)]
+
+
+def summary(cache, domain, limit=10):
+    """
+    {"total", "version", "<dimension>s": [{"label", "value"}]} for every rollup
+    of the domain, None if the aggregates were not materialized yet.
+    """
+    info = meta(cache, domain)
+    if info is None:
+        return None
+    pipe = cache.pipeline(transaction=False)
+    for dimension in ROLLUPS[domain]:
+        pipe.zrevrange(rollup_key(domain, dimension), 0, limit - 1, withscores=True)
+    result = {"total": info["total"], "version": info["version"]}
+    for dimension, rows in zip(ROLLUPS[domain], pipe.execute()):
+        result[plural(dimension)] = [{"label": value, "value": int(count)} for value, count in rows]
+    return result
+
+
+def plural(dimension):
+    return dimension[:-1] + "ies" if dimension.endswith("y") else dimension + "s"
+
+
+def values(cache, domain, dimension):
+    """Every value of a dimension, most frequent first"""
+    return cache.zrevrange(rollup_key(domain, dimension), 0, -1)
+
+
+def cube(cache, domain):
+    """[(value tuple, count)] of the domain's cube"""
+    return [(tuple(cell.split(CUBE_SEPARATOR)), int(count))
+            for cell, count in cache.hgetall(cube_key(domain)).items()]
+
+
+def rollup_cube(cells, dims, filters=None):
+    """
+    Roll cube cells up under filters ({dimension: value}, exact match):
+    {"total": n, <dimension>: Counter} for every dimension of the cube.
+    """
+    filters = {d: v for d, v in (filters or {}).items() if v}
+    positions = [(dims.index(d), v) for d, v in filters.items()]
+    counts = {dimension: Counter() for dimension in dims}
+    total = 0
+    for cell, count in cells:
+        if any(cell[i] != v for i, v in positions):
+            continue
+        total += count
+        for i, dimension in enumerate(dims):
+            if cell[i]:
+                counts[dimension][cell[i]] += count
+    counts["total"] = total
+    return counts
@@ -0,0 +1,532 @@
+"""
+Columnar, dictionary-encoded copy of the music and art catalogues.
+
+Services that answer lookups / similarity / filters from the whole catalogue
+keep one CatalogueTable per domain instead of re-parsing `<domain>:all` into
+a list of dicts per request:
+
+- categorical fields (genre, country, creator, movement, ...) are int32 code
+  arrays; values are interned exactly, so row() gives back the stored object.
+  Filters, counts and similarity compare canonical codes: every spelling of
+  a normalized value maps to the code of its first spelling (0 = missing /
+  Unknown), so a filter is still one vectorized comparison
+- ids, names and the remaining free-text fields are StringColumns: one UTF-8
+  heap plus an offsets array, decoded only for the rows a response returns
+- normalized names are kept once more in sorted order (with their row ids)
+  for exact / prefix lookups by binary search
+
+Every part is a flat NumPy array, so a table is also published as one binary
+snapshot (`<domain>:snapshot`): a JSON schema header (domain, version, row
+count, fields, dtype / offset / length of every array) followed by the
+8-byte aligned array bytes, zlib-compressed. The ETL writes it after each
+publish (publish_snapshot); services fetch it with one GET and every column
+is a np.frombuffer view of the decompressed body, with no per-row parsing.
+
+The same snapshot, uncompressed, is also kept as a local file per domain
+(<CATALOGUE_DIR>/<domain>.bircat, on the ./data/cache volume). It is opened
+with mmap, so a restarting service serves lookups and similarity from the
+last good catalogue within milliseconds, before Redis or Fuseki answer, and
+the pages are shared by every process of the host that maps the file.
+
+ColumnarCatalogue holds the tables of one process and reloads a domain when
+its <domain>:version moves: from the snapshot when it matches that version,
+else by parsing <domain>:all.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from bisect import bisect_left
+
+import numpy as np
+import redis
+
+from shared.delta import fingerprint, sync_snapshot
+from shared.models import DOMAINS
+from shared.utils import get_domain_version, is_missing, normalize
+
+# domain -> (dictionary-encoded fields, plain string fields), from shared/models.py
+COLUMNS = {name: (domain.categories, domain.strings) for name, domain in DOMAINS.items()}
+
+MISSING_LABEL = "Unknown"
+LOAD_CHUNK = 5000
+
+SNAPSHOT_MAGIC = b"BIRCAT\x00\x01"
+SNAPSHOT_ALIGN = 8
+
+CATALOGUE_DIR = os.getenv("CATALOGUE_DIR", "/app/cache/catalogue")
+
+
+class StringColumn:
+    """Strings stored as one UTF-8 heap; item i is heap[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    @classmethod
+    def build(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.heap[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def nbytes(self):
+        return self.offsets.nbytes + self.heap.nbytes
+
+
+class CatalogueTable:
+    def __init__(self, domain, version, ids, names, keys, key_rows, name_groups, codes, vocab, strings):
+        self.domain = domain
+        self.version = version
+        self.ids = ids                  # StringColumn
+        self.names = names              # StringColumn
+        self.keys = keys                # StringColumn of normalized names, sorted
+        self.key_rows = key_rows        # int32 row of every sorted key
+        self.name_groups = name_groups  # int32 id of the normalized name of every row
+        self.codes = codes              # {field: int32 codes}
+        self.vocab = vocab              # {field: StringColumn code -> value}
+        self.strings = strings          # {field: StringColumn}
+        self._lookup = {}               # {field: {normalized value: canonical code}}, built on first use
+        self._canon = {}                # {field: int32 code -> canonical code}, built on first use
+
+    @classmethod
+    def from_docs(cls, domain, docs, version=0):
+        categories, plain = COLUMNS[domain]
+        ids, names = [], []
+        interned = {field: {MISSING_LABEL: 0} for field in categories}
+        vocab = {field: [MISSING_LABEL] for field in categories}
+        codes = {field: [] for field in categories}
+        strings = {field: [] for field in plain}
+
+        for doc in docs:
+            ids.append(str(doc.get("id", "")))
+            names.append(str(doc.get("name") or ""))
+            for field in categories:
+                value = doc.get(field)
+                value = MISSING_LABEL if value is None else str(value)
+                code = interned[field].get(value)
+                if code is None:
+                    code = interned[field][value] = len(vocab[field])
+                    vocab[field].append(value)
+                codes[field].append(code)
+            for field in plain:
+                strings[field].append(str(doc.get(field) or ""))
+
+        normalized = [normalize(n) for n in names]
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        groups = np.zeros(len(normalized), dtype=np.int32)
+        group = -1
+        for position, row in enumerate(order):
+            if position == 0 or normalized[row] != normalized[order[position - 1]]:
+                group += 1
+            groups[row] = group
+
+        return cls(domain, version, StringColumn.build(ids), StringColumn.build(names),
+                   StringColumn.build([normalized[row] for row in order]), np.array(order, dtype=np.int32), groups,
+                   {field: np.array(values, dtype=np.int32) for field, values in codes.items()},
+                   {field: StringColumn.build(values) for field, values in vocab.items()},
+                   {field: StringColumn.build(values) for field, values in strings.items()})
+
+    @classmethod
+    def from_arrays(cls, domain, version, arrays):
+        """Rebuild a table from the named arrays of arrays() (views are kept as they are)"""
+        categories, plain = COLUMNS[domain]
+
+        def column(name):
+            return StringColumn(arrays[f"{name}.offsets"], arrays[f"{name}.heap"])
+
+        return cls(domain, version, column("ids"), column("names"), column("keys"), arrays["key_rows"],
+                   arrays["name_groups"], {f: arrays[f"codes.{f}"] for f in categories},
+                   {f: column(f"vocab.{f}") for f in categories}, {f: column(f"strings.{f}") for f in plain})
+
+    def arrays(self):
+        """[(name, array)] of every array of the table"""
+        columns = [("ids", self.ids), ("names", self.names), ("keys", self.keys)]
+        columns += [(f"vocab.{f}", c) for f, c in self.vocab.items()]
+        columns += [(f"strings.{f}", c) for f, c in self.strings.items()]
+        result = [("key_rows", self.key_rows), ("name_groups", self.name_groups)]
+        result += [(f"codes.{f}", codes) for f, codes in self.codes.items()]
+        for name, column in columns:
+            result += [(f"{name}.offsets", column.offsets), (f"{name}.heap", column.heap)]
+        return result
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        arrays = [self.key_rows, self.name_groups] + list(self.codes.values())
+        columns = [self.ids, self.names, self.keys] + list(self.vocab.values()) + list(self.strings.values())
+        return sum(a.nbytes for a in arrays) + sum(c.nbytes() for c in columns)
+
+    def row(self, i):
+        """The catalogue object of row i"""
+        obj = {"id": self.ids[i], "name": self.names[i]}
+        for field, codes in self.codes.items():
+            obj[field] = self.vocab[field][codes[i]]
+        for field, column in self.strings.items():
+            obj[field] = column[i]
+        return obj
+
+    def rows(self, indices):
+        return [self.row(int(i)) for i in indices]
+
+    def docs(self):
+        """Every catalogue object, in row order"""
+        return (self.row(i) for i in range(len(self)))
+
+    def find(self, name):
+        """Row of an exact (normalized) name match, else of the first name with that prefix; None if neither"""
+        key = normalize(name)
+        if not key or not len(self):
+            return None
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position].startswith(key):
+            return int(self.key_rows[position])
+        return None
+
+    def canonical(self, field):
+        """Array code -> code of the first spelling of the same normalized value (0 for missing values)"""
+        canon = self._canon.get(field)
+        if canon is None:
+            vocab = self.vocab[field]
+            lookup = {}
+            canon = np.zeros(len(vocab), dtype=np.int32)
+            for c in range(1, len(vocab)):
+                value = vocab[c]
+                if not is_missing(value):
+                    canon[c] = lookup.setdefault(normalize(value), c)
+            self._lookup[field] = lookup
+            self._canon[field] = canon
+        return canon
+
+    def code(self, field, value):
+        """Canonical code of a value (normalized match), None if no row carries it"""
+        self.canonical(field)
+        return self._lookup[field].get(normalize(value))
+
+    def select(self, **filters):
+        """Row ids matching every field=value filter (vectorized)"""
+        mask = np.ones(len(self), dtype=bool)
+        for field, value in filters.items():
+            code = self.code(field, value)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.canonical(field)[self.codes[field]] == code
+        return np.flatnonzero(mask)
+
+    def counts(self, field, rows=None, limit=None):
+        """[(value, count)] of a field over rows (all by default), most frequent first, missing excluded"""
+        codes = self.codes[field] if rows is None else self.codes[field][rows]
+        codes = self.canonical(field)[codes]
+        counts = np.bincount(codes, minlength=len(self.vocab[field]))
+        counts[0] = 0
+        order = np.argsort(-counts, kind="stable")
+        order = order[counts[order] > 0][:limit]
+        return [(self.vocab[field][c], int(counts[c])) for c in order]
+
+    def similar(self, row, groups, limit=5):
+        """
+        Rows sharing with row every field of a group, groups tried in order
+        (e.g. (("creator",), ("movement",))). Names are distinct: the target's and
+        every matched name are skipped afterwards. Returns (row, group) pairs so
+        callers can explain the match.
+        """
+        seen = np.zeros(len(self), dtype=bool)
+        seen[self.name_groups == self.name_groups[row]] = True
+        matches = []
+        for group in groups:
+            mask = ~seen
+            for field in group:
+                canon = self.canonical(field)
+                code = canon[self.codes[field][row]]
+                if code == 0:
+                    break
+                mask &= canon[self.codes[field]] == code
+            else:
+                for match in np.flatnonzero(mask):
+                    if seen[match]:
+                        continue
+                    seen[self.name_groups == self.name_groups[match]] = True
+                    matches.append((int(match), group))
+                    if len(matches) >= limit:
+                        return matches
+        return matches
+
+
+def snapshot_key(domain):
+    return f"{domain}:snapshot"
+
+
+def encode_snapshot(table, compress=True):
+    """MAGIC | header length (uint32) | JSON header | body (arrays, 8-byte aligned, zlib unless compress=False)"""
+    entries, chunks, offset = [], [], 0
+    for name, array in table.arrays():
+        data = np.ascontiguousarray(array).tobytes()
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape),
+                        "offset": offset, "nbytes": len(data)})
+        padding = -len(data) % SNAPSHOT_ALIGN
+        chunks.append(data + b"\x00" * padding)
+        offset += len(data) + padding
+    body = b"".join(chunks)
+    header = json.dumps({"domain": table.domain, "version": table.version, "rows": len(table),
+                         "columns": COLUMNS[table.domain], "compression": "zlib" if compress else None,
+                         "arrays": entries}).encode("utf-8")
+    return SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header + (zlib.compress(body, 1) if compress else body)
+
+
+def read_header(buffer):
+    """(header dict, body start) of a snapshot"""
+    if bytes(buffer[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+        raise ValueError("not a catalogue snapshot")
+    start = len(SNAPSHOT_MAGIC) + 4
+    (length,) = struct.unpack("<I", bytes(buffer[len(SNAPSHOT_MAGIC):start]))
+    return json.loads(bytes(buffer[start:start + length]).decode("utf-8")), start + length
+
+
+def decode_snapshot(buffer):
+    """CatalogueTable whose arrays are read-only views of the (decompressed) snapshot body"""
+    header, start = read_header(buffer)
+    if [list(part) for part in COLUMNS[header["domain"]]] != header["columns"]:
+        raise ValueError(f"snapshot columns {header['columns']} do not match this version of the code")
+    body = zlib.decompress(buffer[start:]) if header["compression"] == "zlib" else memoryview(buffer)[start:]
+    arrays = {e["name"]: np.frombuffer(body, dtype=np.dtype(e["dtype"]), offset=e["offset"],
+                                       count=e["nbytes"] // np.dtype(e["dtype"]).itemsize).reshape(e["shape"])
+              for e in header["arrays"]}
+    return CatalogueTable.from_arrays(header["domain"], header["version"], arrays)
+
+
+def binary_client(cache):
+    """A client on the same Redis as cache that returns bytes (services use decode_responses=True)"""
+    return redis.Redis(**dict(cache.connection_pool.connection_kwargs, decode_responses=False))
+
+
+def publish_snapshot(cache, domain, force=False, raw_cache=None, directory=None):
+    """
+    ETL side: build the table from the published <domain>:all and store its
+    snapshot, unless the snapshot already matches the domain's version.
+    With a directory the local catalogue file is (re)written as well.
+    """
+    version = get_domain_version(cache, domain)
+    published = cache.get(f"{snapshot_key(domain)}:version") == str(version)
+    on_disk = directory is None or file_version(domain, directory) == version
+    if not force and published and on_disk:
+        return None
+
+    start = time.time()
+    table = CatalogueTable.from_docs(domain, iter_docs(cache, domain), version=version)
+    if not len(table):
+        return None
+    blob = encode_snapshot(table)
+    if force or not published:
+        pipe = (raw_cache or binary_client(cache)).pipeline(transaction=True)
+        pipe.set(snapshot_key(domain), blob)
+        pipe.set(f"{snapshot_key(domain)}:version", version)
+        pipe.execute()
+    if directory is not None:
+        save_file(table, directory)
+    stats = {"domain": domain, "version": version, "rows": len(table), "bytes": len(blob),
+             "raw_bytes": table.nbytes(), "seconds": round(time.time() - start, 2)}
+    print(f"🧱 [COLUMNAR] {domain} snapshot published: {len(table)} rows, {len(blob) // 1024} KiB "
+          f"(version {version}) in {stats['seconds']}s", file=sys.stderr)
+    return stats
+
+
+def load_snapshot(raw_cache, domain, version):
+    """Table from <domain>:snapshot if it was built from `version`, else None"""
+    key = snapshot_key(domain)
+    stamp = raw_cache.get(f"{key}:version")
+    if stamp is None or int(stamp) != version:
+        return None
+    blob = raw_cache.get(key)
+    if blob is None:
+        return None
+    table = decode_snapshot(blob)
+    return table if table.version == version else None
+
+
+def file_path(domain, directory=CATALOGUE_DIR):
+    return os.path.join(directory, f"{domain}.bircat")
+
+
+def save_file(table, directory=CATALOGUE_DIR):
+    """Write the table as an uncompressed snapshot; tmp file + rename, so readers never map a partial file"""
+    os.makedirs(directory, exist_ok=True)
+    path = file_path(table.domain, directory)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode_snapshot(table, compress=False))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def _map_file(domain, directory):
+    try:
+        with open(file_path(domain, directory), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):  # ValueError: empty file
+        return None
+
+
+def file_version(domain, directory=CATALOGUE_DIR):
+    """Version of the domain's local catalogue file, None without a readable one"""
+    mapped = _map_file(domain, directory)
+    if mapped is None:
+        return None
+    try:
+        return read_header(mapped)[0]["version"]
+    except ValueError:
+        return None
+    finally:
+        mapped.close()
+
+
+def load_file(domain, directory=CATALOGUE_DIR):
+    """
+    Table of the domain's local catalogue file, None without one. Every array
+    is a view of the read-only mapping: nothing is parsed or copied, pages are
+    read on first access. A later save_file replaces the file, never the
+    mapped pages.
+    """
+    mapped = _map_file(domain, directory)
+    return None if mapped is None else decode_snapshot(mapped)
+
+
+def restore_from_file(cache, domain, directory=CATALOGUE_DIR, min_rows=1):
+    """
+    Republish <domain>:all from the local catalogue file (same staging +
+    RENAME path as a sync), so an emptied Redis is refilled without a full
+    SPARQL scan. Returns the sync stats, None without a usable file.
+    """
+    try:
+        table = load_file(domain, directory)
+    except Exception as e:
+        print(f"⚠️ [COLUMNAR] {domain} catalogue file unusable: {e}", file=sys.stderr)
+        return None
+    if table is None or len(table) < min_rows:
+        return None
+    start = time.time()
+    changes, _, _ = sync_snapshot(cache, domain, [{"obj": obj, "fp": fingerprint(obj)} for obj in table.docs()])
+    print(f"🧱 [COLUMNAR] {domain}:all restored from {file_path(domain, directory)} ({len(table)} rows, "
+          f"file version {table.version}) in {round(time.time() - start, 2)}s: {changes}", file=sys.stderr)
+    return changes
+
+
+def iter_docs(cache, domain):
+    """Catalogue objects of <domain>:all, fetched in chunks"""
+    key = f"{domain}:all"
+    for start in range(0, cache.llen(key), LOAD_CHUNK):
+        for raw in cache.lrange(key, start, start + LOAD_CHUNK - 1):
+            yield json.loads(raw)
+
+
+class ColumnarCatalogue:
+    """
+    The process' CatalogueTables: mapped from the local catalogue files at
+    startup (load_files), then reloaded from Redis when a domain's version
+    changes; every table loaded from Redis is written back to its file.
+    """
+
+    def __init__(self, cache, domains=tuple(COLUMNS), check_seconds=5.0, raw_cache=None, directory=CATALOGUE_DIR):
+        self.cache = cache
+        self.raw_cache = raw_cache
+        self.domains = domains
+        self.check_seconds = check_seconds
+        self.directory = directory
+        self.tables = {}
+        self.stats = {"loads": 0, "snapshot_loads": 0, "file_loads": 0, "last_load_ms": 0.0}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, domain):
+        """Current table of a domain (None until loaded); a reload never blocks readers of an older table"""
+        if time.time() - self._checked >= self.check_seconds:
+            if self._lock.acquire(blocking=domain not in self.tables):
+                try:
+                    self._refresh()
+                finally:
+                    self._lock.release()
+        return self.tables.get(domain)
+
+    def load_files(self):
+        """Serve the last good catalogue right away: map the local file of every domain not loaded yet"""
+        if self.directory is None:
+            return
+        for domain in self.domains:
+            if domain in self.tables:
+                continue
+            start = time.time()
+            try:
+                table = load_file(domain, self.directory)
+            except Exception as e:
+                print(f"⚠️ [COLUMNAR] {domain} catalogue file unusable: {e}", file=sys.stderr)
+                continue
+            if table is not None and len(table):
+                self._install(table, "file", start)
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        self._checked = time.time()
+        for domain in self.domains:
+            table = self.tables.get(domain)
+            try:
+                version = get_domain_version(self.cache, domain)
+                if table is not None and table.version == version:
+                    continue
+                start = time.time()
+                table, source = self._snapshot(domain, version), "snapshot"
+                if table is None:
+                    table, source = CatalogueTable.from_docs(domain, iter_docs(self.cache, domain), version), "list"
+            except Exception as e:
+                # Redis down / still empty: the table already held (e.g. from the file) keeps serving
+                print(f"⚠️ [COLUMNAR] {domain} load failed: {e}", file=sys.stderr)
+                continue
+            if len(table):
+                self._install(table, source, start)
+                self._save(table)
+
+    def _install(self, table, source, start):
+        self.tables[table.domain] = table
+        self.stats["loads"] += 1
+        self.stats["snapshot_loads"] += source == "snapshot"
+        self.stats["file_loads"] += source == "file"
+        self.stats["last_load_ms"] = round((time.time() - start) * 1000, 1)
+        print(f"🧱 [COLUMNAR] {table.domain}: {len(table)} rows, {table.nbytes() // 1024} KiB "
+              f"(version {table.version}, from {source}) in {self.stats['last_load_ms']} ms", file=sys.stderr)
+
+    def _save(self, table):
+        if self.directory is None or file_version(table.domain, self.directory) == table.version:
+            return
+        try:
+            save_file(table, self.directory)
+        except OSError as e:
+            print(f"⚠️ [COLUMNAR] {table.domain} catalogue file not written: {e}", file=sys.stderr)
+
+    def _snapshot(self, domain, version):
+        try:
+            if self.raw_cache is None:
+                self.raw_cache = binary_client(self.cache)
+            return load_snapshot(self.raw_cache, domain, version)
+        except Exception as e:
+            print(f"⚠️ [COLUMNAR] {domain} snapshot unusable, parsing {domain}:all: {e}", file=sys.stderr)
+            return None
+
+    def report(self):
+        return dict(self.stats, directory=self.directory,
+                    tables={d: {"rows": len(t), "version": t.version, "bytes": t.nbytes()}
+                            for d, t in self.tables.items()})
@@ -0,0 +1,203 @@
+"""
+Delta-aware publishing of a catalogue into Redis.
+
+Every entity gets two fingerprints:
+- `fp`, a hash of its catalogue object. Every writer of `<domain>:fp`
+  (sparql-service ETL, Spark art ETL, art-service sync, columnar restore)
+  computes the same value for the same entity; it drives the Redis index.
+- `rdf_fp`, a hash of all its RDF triples (multi-valued members, awards,
+  materials included). Only the loaders that write Fuseki (sparql-service
+  and Spark ETLs) have them; `<domain>:rdf:fp` is what Fuseki holds, and
+  drives the Fuseki delta and the recommender's incremental refresh.
+A run stages the full `<domain>:all` list and fingerprint hash next to the
+live ones, plus the objects of new / changed entities whose Redis index
+entries must be rewritten. Publishing applies that index delta and swaps
+staging over live with RENAME inside one MULTI, so readers always see
+either the previous or the new snapshot (list and index), never an empty
+or half-indexed one; an aborted run leaves the live keys untouched. Tokens
+and keys left empty by the unindexed entities are pruned right after.
+
+Keys (per domain):
+    <domain>:all / <domain>:all:staging    catalogue list (JSON per entity)
+    <domain>:fp  / <domain>:fp:staging     hash id -> fingerprint of the published / staged snapshot
+    <domain>:rdf:fp / <domain>:rdf:fp:staging  hash id -> triples fingerprint loaded into Fuseki / being loaded
+    <domain>:idx:staging                   hash id -> JSON object of the entities to (re)index on publish
+    <domain>:version                       etl:version of the last publish of this domain
+"""
+import hashlib
+import json
+
+from shared import redis_index
+from shared.utils import DATA_VERSION_KEY, domain_version_key
+
+
+def fingerprint(obj):
+    """Stable hash of an entity's catalogue object"""
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+
+def triples_fingerprint(triples):
+    """Stable hash of an entity's RDF triples (order-independent)"""
+    return hashlib.sha1("\n".join(sorted(triples)).encode("utf-8")).hexdigest()[:20]
+
+
+class RedisDelta:
+    def __init__(self, cache, domain, resume_staged=None, fuseki_empty=False):
+        """
+        resume_staged: number of list items already staged by an interrupted run,
+        or None for a fresh run (staging keys are reset).
+        fuseki_empty: Fuseki lost its data (or never had it), so every entity is new for the
+        Fuseki delta whatever the fingerprints say; the Redis index delta is unaffected.
+        """
+        self.cache = cache
+        self.domain = domain
+        self.live_key = f"{domain}:all"
+        self.staging_key = f"{domain}:all:staging"
+        self.fp_key = f"{domain}:fp"
+        self.fp_staging_key = f"{domain}:fp:staging"
+        self.index_staging_key = f"{domain}:idx:staging"
+        self.rdf_fp_key = f"{domain}:rdf:fp"
+        self.rdf_fp_staging_key = f"{domain}:rdf:fp:staging"
+        self.fuseki_empty = fuseki_empty
+        self.stats = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+        # Without a previous fingerprint snapshot every entity is "new":
+        # publish replaces any index left by older, non-incremental loads
+        self.incremental = bool(cache.exists(self.fp_key))
+
+        if resume_staged:
+            cache.ltrim(self.staging_key, 0, resume_staged - 1)
+        else:
+            cache.delete(self.staging_key, self.fp_staging_key, self.index_staging_key, self.rdf_fp_staging_key)
+
+    def staged(self):
+        return self.cache.llen(self.staging_key)
+
+    def stage(self, entities):
+        """
+        Stage a batch of {"obj": ..., "fp": ...[, "rdf_fp": ...]} entities. Every entity
+        goes to the staging list; objects whose fp changed are also staged for indexing.
+        Returns (new_ids, changed_ids) for the Fuseki load: compared on rdf_fp when the
+        entities carry one, else on fp (changed ones must lose their old triples first).
+        """
+        if not entities:
+            return [], []
+
+        ids = [e["obj"]["id"] for e in entities]
+        pipe = self.cache.pipeline(transaction=False)
+        pipe.hmget(self.fp_key, ids)
+        pipe.hmget(self.rdf_fp_key, ids)
+        old_fps, old_rdf_fps = pipe.execute()
+
+        new_ids, changed_ids = [], []
+        pipe = self.cache.pipeline()
+        for entity, old_fp, old_rdf_fp in zip(entities, old_fps, old_rdf_fps):
+            obj = entity["obj"]
+            if old_fp is None:
+                self.stats["new"] += 1
+            elif old_fp != entity["fp"]:
+                self.stats["changed"] += 1
+            else:
+                self.stats["unchanged"] += 1
+
+            if "rdf_fp" in entity:
+                old, fp = old_rdf_fp, entity["rdf_fp"]
+                if old is None and old_fp is not None:
+                    old = ""  # published before its triples were fingerprinted: replace its Fuseki triples
+                pipe.hset(self.rdf_fp_staging_key, obj["id"], fp)
+            else:
+                old, fp = old_fp, entity["fp"]
+            if old is None or self.fuseki_empty:
+                new_ids.append(obj["id"])
+            elif old != fp:
+                changed_ids.append(obj["id"])
+
+            pipe.rpush(self.staging_key, json.dumps(obj))
+            pipe.hset(self.fp_staging_key, obj["id"], entity["fp"])
+            if old_fp != entity["fp"]:
+                pipe.hset(self.index_staging_key, obj["id"], json.dumps(obj))
+        pipe.execute()
+        return new_ids, changed_ids
+
+    def removed_ids(self, batch_size=500):
+        """Ids of the published snapshot that the staged snapshot no longer contains"""
+        removed = []
+        batch = []
+        for doc_id, _ in self.cache.hscan_iter(self.fp_key, count=batch_size):
+            batch.append(doc_id)
+            if len(batch) >= batch_size:
+                removed.extend(self._missing(batch))
+                batch = []
+        if batch:
+            removed.extend(self._missing(batch))
+        return removed
+
+    def _missing(self, ids):
+        pipe = self.cache.pipeline(transaction=False)
+        for doc_id in ids:
+            pipe.hexists(self.fp_staging_key, doc_id)
+        return [doc_id for doc_id, present in zip(ids, pipe.execute()) if not present]
+
+    def staged_objects(self, batch_size=500):
+        """{id: object} of the entities staged for indexing"""
+        return {doc_id: json.loads(raw)
+                for doc_id, raw in self.cache.hscan_iter(self.index_staging_key, count=batch_size)}
+
+    def publish(self, removed=()):
+        """
+        Atomically swap the staged snapshot in: one MULTI unindexes the old version
+        of changed / removed entities, indexes the staged ones and renames staging over live.
+        """
+        removed = list(removed)
+        self.stats["removed"] = len(removed)
+
+        if not self.cache.exists(self.staging_key):
+            self.cache.delete(self.index_staging_key)
+            return dict(self.stats, published=False)
+
+        staged = self.staged_objects()
+        rdf_staged = self.cache.exists(self.rdf_fp_staging_key)
+        unindexed_tokens, unindexed_keys = set(), set()
+        pipe = self.cache.pipeline()
+        if self.incremental:
+            for old in redis_index.get_docs(self.cache, self.domain, list(staged) + removed):
+                tokens, keys = redis_index.unindex_entity(pipe, self.domain, old)
+                unindexed_tokens.update(tokens)
+                unindexed_keys.update(keys)
+        else:
+            for keys in redis_index.index_keys(self.cache, self.domain):
+                pipe.delete(*keys)
+        for obj in staged.values():
+            redis_index.index_entity(pipe, self.domain, obj)
+        pipe.delete(self.index_staging_key)
+        pipe.rename(self.staging_key, self.live_key)
+        pipe.rename(self.fp_staging_key, self.fp_key)
+        if rdf_staged:
+            # Writers without triples (syncs from Fuseki, file restores) leave Fuseki's fingerprints alone
+            pipe.rename(self.rdf_fp_staging_key, self.rdf_fp_key)
+        pipe.incr(DATA_VERSION_KEY)
+        version = pipe.execute()[-1]
+        # Tokens / keys that lost their last entity (not re-added by the staged objects)
+        self.stats["pruned_tokens"] = redis_index.prune_index(self.cache, self.domain, unindexed_tokens,
+                                                              unindexed_keys)
+        # Lets per-domain derived data (columnar snapshot) tell whether this domain changed
+        self.cache.set(domain_version_key(self.domain), version)
+        return dict(self.stats, published=True, version=version)
+
+
+def sync_snapshot(cache, domain, entities, batch_size=1000):
+    """
+    Stage and publish a complete snapshot held in memory.
+    Returns (stats, dirty_ids, stale_ids): dirty = new or changed entities,
+    stale = changed or removed ones (their old triples must go).
+    """
+    delta = RedisDelta(cache, domain)
+    dirty, stale = set(), set()
+    for i in range(0, len(entities), batch_size):
+        new_ids, changed_ids = delta.stage(entities[i:i + batch_size])
+        dirty.update(new_ids)
+        dirty.update(changed_ids)
+        stale.update(changed_ids)
+    removed = delta.removed_ids()
+    stale.update(removed)
+    return delta.publish(removed), dirty, stale
@@ -0,0 +1,191 @@
+"""
+Concurrent bulk loader for Fuseki SPARQL updates.
+
+Triples are buffered into INSERT DATA batches and sent by a small thread
+pool over one pooled requests.Session. The producer blocks when too many
+batches are in flight (backpressure), failed batches are retried with
+exponential backoff, and the batch size adapts to Fuseki's response time.
+"""
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class FusekiBulkLoader:
+    def __init__(self, update_url, auth=("admin", "admin"), workers=4, batch_size=500,
+                 min_batch=100, max_batch=5000, target_seconds=2.0, retries=4,
+                 backoff=0.5, timeout=120, tag="FUSEKI", verbose=True):
+        self.update_url = update_url
+        self.auth = auth
+        self.workers = workers
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_seconds = target_seconds
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.tag = tag
+        self.verbose = verbose
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fuseki-loader")
+        # At most 2 batches waiting per worker; add() blocks beyond that
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._futures = set()
+        self._started = time.time()
+        self.stats = {"batches": 0, "triples": 0, "failed_batches": 0, "failed_triples": 0, "retries": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, triples):
+        """Queue triple lines (`<s> <p> <o> .`), sending full batches as they fill up"""
+        for line in triples:
+            if line and line.strip():
+                self._buffer.append(line)
+                if len(self._buffer) >= self.batch_size:
+                    self._submit()
+
+    def flush(self, wait_for_completion=True):
+        """Send the partial batch; optionally block until everything in flight is done"""
+        if self._buffer:
+            self._submit()
+        if wait_for_completion:
+            with self._lock:
+                pending = list(self._futures)
+            wait(pending)
+
+    def close(self):
+        """Flush, wait for in-flight batches and return the load report"""
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        return self.report()
+
+    def report(self):
+        elapsed = time.time() - self._started
+        report = dict(self.stats)
+        report["seconds"] = round(elapsed, 2)
+        report["triples_per_sec"] = round(self.stats["triples"] / elapsed, 1) if elapsed > 0 else 0
+        report["final_batch_size"] = self.batch_size
+        return report
+
+    def _submit(self):
+        batch, self._buffer = self._buffer, []
+        self._slots.acquire()
+        future = self._executor.submit(self._send, batch)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            self._futures.discard(future)
+
+    def _send(self, batch):
+        update_query = f"INSERT DATA {{ {' '.join(batch)} }}"
+        retried = 0
+        for attempt in range(self.retries + 1):
+            start = time.time()
+            error = None
+            try:
+                resp = self.session.post(self.update_url, data={"update": update_query},
+                                         auth=self.auth, timeout=self.timeout)
+                if resp.status_code in (200, 204):
+                    self._record(len(batch), time.time() - start)
+                    return True
+                error = f"HTTP {resp.status_code}"
+                if resp.status_code not in RETRYABLE_STATUS:
+                    error += " (not retryable)"
+                    break
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt < self.retries:
+                with self._lock:
+                    self.stats["retries"] += 1
+                retried += 1
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                print(f"⚠️ [{self.tag}] Batch of {len(batch)} failed ({error}), retry {attempt + 1} in {delay:.1f}s",
+                      file=sys.stderr)
+                time.sleep(delay)
+
+        with self._lock:
+            self.stats["failed_batches"] += 1
+            self.stats["failed_triples"] += len(batch)
+        reason = f"{error}, after {retried} retries" if retried else error
+        print(f"❌ [{self.tag}] Dropping batch of {len(batch)} triples: {reason}", file=sys.stderr)
+        return False
+
+    def _record(self, size, elapsed):
+        """Update counters and adapt the batch size to the observed latency"""
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["triples"] += size
+            if elapsed < self.target_seconds / 2:
+                self.batch_size = min(self.max_batch, int(self.batch_size * 1.5))
+            elif elapsed > self.target_seconds:
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+            batch_no, next_size = self.stats["batches"], self.batch_size
+
+        if self.verbose:
+            rate = size / elapsed if elapsed > 0 else 0
+            print(f"[{self.tag}] batch #{batch_no}: {size} triples in {elapsed:.2f}s "
+                  f"({rate:.0f} triples/s), next batch {next_size}", file=sys.stderr)
+
+
+def count_subjects(query_url, rdf_type, auth=("admin", "admin"), timeout=10):
+    """Number of subjects of an RDF type in Fuseki, None if Fuseki cannot be queried"""
+    query = f"SELECT (COUNT(*) AS ?count) WHERE {{ ?s a <{rdf_type}> }}"
+    try:
+        resp = requests.get(query_url, params={"query": query}, auth=auth, timeout=timeout,
+                            headers={"Accept": "application/sparql-results+json"})
+        resp.raise_for_status()
+        return int(resp.json()["results"]["bindings"][0]["count"]["value"])
+    except (requests.RequestException, ValueError, KeyError, IndexError):
+        return None
+
+
+def delete_subjects(update_url, subjects, auth=("admin", "admin"), chunk_size=200, session=None, tag="FUSEKI"):
+    """
+    Remove every triple of the given subjects (DELETE WHERE per subject,
+    several operations per request). Runs synchronously so it can be
+    ordered before the inserts of the same subjects.
+    """
+    session = session or requests.Session()
+    subjects = list(subjects)
+    failed = 0
+    for i in range(0, len(subjects), chunk_size):
+        chunk = subjects[i:i + chunk_size]
+        update_query = " ;\n".join(f"DELETE WHERE {{ <{s}> ?p ?o }}" for s in chunk)
+        for attempt in range(3):
+            try:
+                resp = session.post(update_url, data={"update": update_query}, auth=auth, timeout=120)
+                if resp.status_code in (200, 204):
+                    break
+                error = f"HTTP {resp.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            time.sleep(2 ** attempt)
+        else:
+            failed += len(chunk)
+            print(f"❌ [{tag}] Could not delete {len(chunk)} subjects: {error}", file=sys.stderr)
+    return failed
@@ -0,0 +1,173 @@
+"""
+Declarative definitions of the catalogue domains (music, art).
+
+A Domain states once what the generic engines need to know about it:
+- where its entities come from: the Wikidata query file (shared/queries/),
+  the entity variable of that query and the RDF type the entities get in Fuseki
+- its fields: Wikidata variable -> catalogue field -> RDF predicate
+- which fields are searched, suggested, faceted in the Redis index,
+  dictionary-encoded in the columnar table and rolled up for /stats
+
+The ETL (sparql-service, Spark art ETL, art-service sync), the search and
+typeahead indexes, the Redis index, the aggregates and the columnar tables
+are all driven by DOMAINS, so a new domain (films, literature, ...) is one
+more entry here plus its query file.
+"""
+import os
+
+from shared.utils import is_missing
+
+SCHEMA = "http://schema.org/"
+DBO = "http://dbpedia.org/ontology/"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+
+QUERY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries")
+
+
+def literal(value, datatype=None):
+    """N-Triples literal of a field value (escaped, typed when a datatype is given)"""
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ').replace('\r', ' ').strip()
+    return f'"{text}"^^<{datatype}>' if datatype else f'"{text}"'
+
+
+class Field:
+    def __init__(self, name, source, predicate, datatype=None, default="Unknown", stored=True):
+        self.name = name            # key in the catalogue object (<domain>:all)
+        self.source = source        # variable of the Wikidata query
+        self.predicate = predicate
+        self.datatype = datatype
+        self.default = default      # placeholder stored when Wikidata has no value
+        self.stored = stored        # False: multi-valued (one Wikidata row per value), only written to RDF
+
+
+class Domain:
+    def __init__(self, name, label, rdf_type, id_var, query, fields, search, suggest, facets, categories,
+                 rollups, cube=(), icon="🚀"):
+        self.name = name
+        self.label = label                  # plural used in logs ("bands")
+        self.rdf_type = rdf_type
+        self.id_var = id_var                # entity variable of the Wikidata query
+        self.query = query                  # file in shared/queries/
+        self.fields = tuple(fields)
+        self.search = tuple(search)         # tokenized by the search indexes
+        self.suggest = tuple(suggest)       # (field, suggestion type) offered by the typeahead
+        self.facets = tuple(facets)         # Redis facet sets (similarity lookups)
+        self.categories = tuple(categories)  # dictionary-encoded columns of the columnar table
+        self.rollups = dict(rollups)        # /stats dimension -> field
+        self.cube = tuple(cube)             # dimensions crossed for filtered stats
+        self.tag = f"{name.upper()}-ETL"
+        self.icon = icon
+
+    @property
+    def stored(self):
+        """Fields kept in the catalogue object, in object order"""
+        return tuple(f for f in self.fields if f.stored)
+
+    @property
+    def strings(self):
+        """Stored fields that the columnar table keeps as plain strings"""
+        return tuple(f.name for f in self.stored if f.name != "name" and f.name not in self.categories)
+
+    def read_query(self):
+        with open(os.path.join(QUERY_DIR, self.query), "r") as f:
+            return f.read()
+
+    @property
+    def order_by(self):
+        """Total order of the query rows for paging: the entity first, then every other projected variable"""
+        return " ".join(f"?{var}" for var in (self.id_var,) + tuple(f.source for f in self.fields))
+
+    def to_object(self, row):
+        """Catalogue object of a Wikidata row"""
+        obj = {"id": row[self.id_var]["value"]}
+        for field in self.stored:
+            obj[field.name] = row.get(field.source, {}).get("value", field.default)
+        return obj
+
+    def to_triples(self, row):
+        """RDF triples of a Wikidata row (multi-valued fields included)"""
+        return self._triples(row[self.id_var]["value"],
+                             ((f, row.get(f.source, {}).get("value")) for f in self.fields))
+
+    def to_entity(self, rows):
+        """
+        (catalogue object, RDF triples) of the Wikidata rows of one entity: one row per
+        member / award / material..., the object comes from the first row (query order)
+        """
+        triples = []
+        seen = set()
+        for row in rows:
+            for line in self.to_triples(row):
+                if line not in seen:
+                    seen.add(line)
+                    triples.append(line)
+        return self.to_object(rows[0]), triples
+
+    def object_triples(self, obj):
+        """RDF triples of a catalogue object"""
+        return self._triples(obj["id"], ((f, obj.get(f.name)) for f in self.stored))
+
+    def _triples(self, subject, values):
+        s = f"<{subject}>"
+        triples = [f"{s} <{RDF_TYPE}> <{self.rdf_type}> ."]
+        for field, value in values:
+            if not is_missing(value):
+                triples.append(f"{s} <{field.predicate}> {literal(value, field.datatype)} .")
+        return triples
+
+    def fuseki_query(self):
+        """SELECT of every catalogue object from Fuseki (one variable per stored field)"""
+        s = f"?{self.id_var}"
+        optional = "\n".join(f"    OPTIONAL {{ {s} <{f.predicate}> ?{f.name} }}" for f in self.stored)
+        return (f"SELECT {s} {' '.join('?' + f.name for f in self.stored)}\n"
+                f"WHERE {{\n    {s} a <{self.rdf_type}> .\n{optional}\n}}")
+
+    def from_fuseki(self, binding):
+        """Catalogue object of a fuseki_query() row"""
+        obj = {"id": binding.get(self.id_var, {}).get("value", "")}
+        for field in self.stored:
+            obj[field.name] = binding.get(field.name, {}).get("value", field.default)
+        return obj
+
+
+DOMAINS = {
+    "music": Domain(
+        "music", label="bands", rdf_type=SCHEMA + "MusicGroup", id_var="band", query="preload.sparql",
+        fields=[
+            Field("name", "bandLabel", SCHEMA + "name"),
+            Field("genre", "genreLabel", SCHEMA + "genre"),
+            Field("country", "countryLabel", SCHEMA + "location"),
+            Field("year", "startYear", DBO + "activeYearsStartYear", datatype=XSD_INTEGER, default="N/A"),
+            Field("member", "memberLabel", SCHEMA + "member", stored=False),
+            Field("award", "awardLabel", SCHEMA + "award", stored=False)
+        ],
+        search=("name", "genre"),
+        suggest=(("name", "band"), ("genre", "genre")),
+        facets=("genre", "country"),
+        categories=("genre", "country"),
+        rollups={"genre": "genre", "country": "country", "decade": "year"},
+        cube=("genre", "country", "decade"),
+        icon="🚀"
+    ),
+    "art": Domain(
+        "art", label="artworks", rdf_type=SCHEMA + "VisualArtwork", id_var="artwork", query="art_preload.sparql",
+        fields=[
+            Field("name", "artworkLabel", SCHEMA + "name"),
+            Field("type", "typeLabel", SCHEMA + "artform"),
+            Field("creator", "creatorLabel", SCHEMA + "creator"),
+            Field("movement", "movementLabel", SCHEMA + "artMovement"),
+            Field("country", "countryLabel", SCHEMA + "locationCreated"),
+            Field("date", "date", SCHEMA + "dateCreated", default="N/A"),
+            Field("material", "materialLabel", SCHEMA + "material"),
+            Field("location", "locationLabel", SCHEMA + "contentLocation")
+        ],
+        search=("name", "creator", "movement", "type"),
+        suggest=(("name", "artwork"), ("creator", "creator"), ("movement", "movement")),
+        facets=("creator", "movement", "country", "type"),
+        categories=("creator", "movement", "type", "country", "material"),
+        rollups={"movement": "movement", "country": "country", "creator": "creator", "decade": "date",
+                 "type": "type", "material": "material"},
+        icon="🎨"
+    )
+}
@@ -0,0 +1,259 @@
+"""
+Redis-native secondary index for the music and art catalogues.
+
+Written by the ETL loaders next to the `<domain>:all` list, so readers can
+answer search / lookup / similarity with a few Redis commands instead of
+downloading the whole list.
+
+Key layout (per domain):
+    <domain>:doc:<id>                 hash with the catalogue object
+    <domain>:tok:<token>              set of ids whose searchable fields contain token
+    <domain>:facet:<field>:<value>    set of ids sharing a facet value (creator, genre, ...)
+    <domain>:vocab                    sorted set (score 0) of live tokens, for prefix expansion
+    <domain>:names                    sorted set (score 0) of "<lower name>\\x00<id>", for autocomplete
+    <domain>:idx:keys                 set of every per-token / per-facet / per-doc key, used by clear_index
+    <domain>:sim                      hash id -> JSON top-K neighbour list, built by
+                                      recommendation-service/app/similarity.py
+    <domain>:sim:version              etl:version the neighbour lists were built from
+"""
+import json
+import uuid
+from itertools import islice
+
+from shared.models import DOMAINS
+from shared.utils import normalize, tokenize, is_missing
+
+SEARCH_FIELDS = {name: domain.search for name, domain in DOMAINS.items()}
+
+FACET_FIELDS = {name: domain.facets for name, domain in DOMAINS.items()}
+
+SEP = "\x00"
+MAX_PREFIX_EXPANSION = 200
+
+
+def doc_key(domain, doc_id):
+    return f"{domain}:doc:{doc_id}"
+
+
+def token_key(domain, token):
+    return f"{domain}:tok:{token}"
+
+
+def facet_key(domain, field, value):
+    return f"{domain}:facet:{field}:{normalize(value)}"
+
+
+def neighbours_key(domain):
+    return f"{domain}:sim"
+
+
+def _lex_range(prefix):
+    """ZRANGEBYLEX bounds matching every member that starts with prefix"""
+    raw = prefix.encode("utf-8")
+    return b"[" + raw, b"[" + raw + b"\xff"
+
+
+def index_entity(pipe, domain, obj):
+    """Queue the index writes for one catalogue object on a Redis pipeline"""
+    doc_id = obj["id"]
+    key = doc_key(domain, doc_id)
+    pipe.hset(key, mapping={k: "" if v is None else str(v) for k, v in obj.items()})
+    keys = [key]
+
+    tokens = set()
+    for field in SEARCH_FIELDS[domain]:
+        tokens.update(tokenize(obj.get(field)))
+    for tok in tokens:
+        pipe.sadd(token_key(domain, tok), doc_id)
+        keys.append(token_key(domain, tok))
+    if tokens:
+        pipe.zadd(f"{domain}:vocab", {tok: 0 for tok in tokens})
+
+    for field in FACET_FIELDS[domain]:
+        value = obj.get(field)
+        if not is_missing(value):
+            pipe.sadd(facet_key(domain, field, value), doc_id)
+            keys.append(facet_key(domain, field, value))
+
+    name = normalize(obj.get("name"))
+    if name:
+        pipe.zadd(f"{domain}:names", {f"{name}{SEP}{doc_id}": 0})
+
+    pipe.sadd(f"{domain}:idx:keys", *keys)
+
+
+def unindex_entity(pipe, domain, obj):
+    """
+    Queue the removal of an object previously written by index_entity.
+    Returns (tokens, keys) it was removed from, for prune_index once the pipeline ran.
+    """
+    doc_id = obj["id"]
+    keys = [doc_key(domain, doc_id)]
+    tokens = set()
+    for field in SEARCH_FIELDS[domain]:
+        tokens.update(tokenize(obj.get(field)))
+    for tok in tokens:
+        pipe.srem(token_key(domain, tok), doc_id)
+        keys.append(token_key(domain, tok))
+
+    for field in FACET_FIELDS[domain]:
+        value = obj.get(field)
+        if not is_missing(value):
+            pipe.srem(facet_key(domain, field, value), doc_id)
+            keys.append(facet_key(domain, field, value))
+
+    name = normalize(obj.get("name"))
+    if name:
+        pipe.zrem(f"{domain}:names", f"{name}{SEP}{doc_id}")
+    pipe.delete(doc_key(domain, doc_id))
+    return tokens, keys
+
+
+def prune_index(cache, domain, tokens, keys, chunk_size=500):
+    """
+    Forget the index keys that unindex_entity emptied (Redis drops empty sets and
+    hashes): their tokens leave <domain>:vocab, so prefix expansion only sees live
+    tokens, and the keys leave <domain>:idx:keys. Returns the number of dead tokens.
+    """
+    keys = sorted(set(keys))
+    dead = []
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i + chunk_size]
+        pipe = cache.pipeline(transaction=False)
+        for key in chunk:
+            pipe.exists(key)
+        dead.extend(key for key, alive in zip(chunk, pipe.execute()) if not alive)
+
+    dead_keys = set(dead)
+    dead_tokens = [tok for tok in sorted(set(tokens)) if token_key(domain, tok) in dead_keys]
+    pipe = cache.pipeline()
+    for i in range(0, len(dead_tokens), chunk_size):
+        pipe.zrem(f"{domain}:vocab", *dead_tokens[i:i + chunk_size])
+    for i in range(0, len(dead), chunk_size):
+        pipe.srem(f"{domain}:idx:keys", *dead[i:i + chunk_size])
+    pipe.execute()
+    return len(dead_tokens)
+
+
+def index_keys(cache, domain, chunk_size=500):
+    """Every index key of a domain, in chunks (the <domain>:all list is not part of it)"""
+    tracked = f"{domain}:idx:keys"
+    batch = []
+    for key in cache.sscan_iter(tracked, count=chunk_size):
+        batch.append(key)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    yield batch + [tracked, f"{domain}:vocab", f"{domain}:names"]
+
+
+def clear_index(cache, domain, chunk_size=500):
+    """Delete every index key of a domain (the <domain>:all list is left alone)"""
+    for keys in list(index_keys(cache, domain, chunk_size)):
+        cache.delete(*keys)
+
+
+def has_index(cache, domain):
+    return bool(cache.exists(f"{domain}:idx:keys"))
+
+
+def get_docs(cache, domain, ids):
+    """Fetch catalogue objects by id in one round trip, preserving order"""
+    if not ids:
+        return []
+    pipe = cache.pipeline(transaction=False)
+    for doc_id in ids:
+        pipe.hgetall(doc_key(domain, doc_id))
+    return [doc for doc in pipe.execute() if doc]
+
+
+def expand_prefix(cache, domain, prefix, limit=MAX_PREFIX_EXPANSION):
+    """Vocabulary tokens starting with prefix"""
+    low, high = _lex_range(prefix)
+    return cache.zrangebylex(f"{domain}:vocab", low, high, start=0, num=limit)
+
+
+def search(cache, domain, q, limit=50):
+    """
+    Token search: every complete query token must match exactly, the last
+    one is treated as a prefix (so partially typed words still match).
+    """
+    tokens = tokenize(q)
+    if not tokens:
+        return []
+
+    full, last = tokens[:-1], tokens[-1]
+    prefix_tokens = expand_prefix(cache, domain, last)
+    if not prefix_tokens:
+        return []
+
+    tmp = f"{domain}:tmp:{uuid.uuid4().hex}"
+    pipe = cache.pipeline(transaction=False)
+    pipe.sunionstore(tmp, [token_key(domain, t) for t in prefix_tokens])
+    pipe.expire(tmp, 10)
+    pipe.sinter([tmp] + [token_key(domain, t) for t in full])
+    pipe.delete(tmp)
+    ids = pipe.execute()[2]
+
+    return get_docs(cache, domain, sorted(ids)[:limit])
+
+
+def find_by_name(cache, domain, name):
+    """Exact (case-insensitive) name match, falling back to the first name with that prefix"""
+    name = normalize(name)
+    if not name:
+        return None
+
+    for prefix in (name + SEP, name):
+        low, high = _lex_range(prefix)
+        members = cache.zrangebylex(f"{domain}:names", low, high, start=0, num=1)
+        if members:
+            doc_id = members[0].split(SEP, 1)[1]
+            docs = get_docs(cache, domain, [doc_id])
+            return docs[0] if docs else None
+    return None
+
+
+def complete_names(cache, domain, prefix, limit=10):
+    """Names (original spelling) starting with prefix, in lexicographic order"""
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    low, high = _lex_range(prefix)
+    members = cache.zrangebylex(f"{domain}:names", low, high, start=0, num=limit * 2)
+    names = []
+    for doc in get_docs(cache, domain, [m.split(SEP, 1)[1] for m in members]):
+        if doc.get("name") and doc["name"] not in names:
+            names.append(doc["name"])
+    return names[:limit]
+
+
+def similar_by_facets(cache, domain, target, facets, limit=5):
+    """
+    Entities sharing a facet value with target, checked in facet order.
+    Returns (doc, facet) pairs so callers can explain the match.
+    """
+    seen = {target["id"]}
+    target_name = normalize(target.get("name"))
+    matches = []
+
+    for field in facets:
+        value = target.get(field)
+        if is_missing(value):
+            continue
+        key = facet_key(domain, field, value)
+        ids = [i for i in islice(cache.sscan_iter(key, count=limit * 4), limit * 4) if i not in seen]
+        for doc in get_docs(cache, domain, ids):
+            if normalize(doc.get("name")) == target_name:
+                continue
+            seen.add(doc["id"])
+            matches.append((doc, field))
+            if len(matches) >= limit:
+                return matches
+    return matches
+
+
+def get_neighbours(cache, domain, doc_id):
+    """Precomputed neighbours of an entity ([{id, name, score, reasons}]), None if not built"""
+    raw = cache.hget(neighbours_key(domain), doc_id)
+    return json.loads(raw) if raw is not None else None
@@ -0,0 +1,134 @@
+"""
+Redis-backed cache for computed JSON results.
+
+Keys embed the ETL data version (`etl:version`), so every published ETL run
+invalidates older entries without scanning or deleting anything; they simply
+stop being read and expire through their TTL.
+
+Concurrent identical requests are collapsed (single-flight): inside a process
+the first caller computes while the others wait on an Event, and across
+processes / replicas a short Redis lock (SET NX EX) elects the computing
+caller while the rest poll for its result.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+
+from shared.utils import get_data_version
+
+
+class ResultCache:
+    def __init__(self, cache, namespace, ttl=3600, lock_ttl=60, wait_timeout=60, poll_interval=0.1):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "errors": 0}
+
+    def key(self, parts, version=None):
+        if version is None:
+            version = get_data_version(self.cache) if self.cache else 0
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+        return f"{self.namespace}:v{version}:{digest}"
+
+    def get(self, key):
+        if not self.cache:
+            return None
+        try:
+            raw = self.cache.get(key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            self._count("errors")
+            print(f"⚠️ [CACHE] {self.namespace} read failed: {e}", file=sys.stderr)
+            return None
+
+    def set(self, key, value):
+        if not self.cache:
+            return
+        try:
+            self.cache.set(key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            self._count("errors")
+            print(f"⚠️ [CACHE] {self.namespace} write failed: {e}", file=sys.stderr)
+
+    def get_or_compute(self, parts, compute):
+        """Returns (value, status) with status "hit", "shared" (waited for another caller) or "miss" """
+        key = self.key(parts)
+        value = self.get(key)
+        if value is not None:
+            self._count("hits")
+            return value, "hit"
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(self.wait_timeout)
+            value = self.get(key)
+            if value is not None:
+                self._count("shared")
+                return value, "shared"
+            # The leader failed or timed out: compute on our own
+            self._count("misses")
+            return compute(), "miss"
+
+        try:
+            return self._compute_once(key, compute)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _compute_once(self, key, compute):
+        """Cross-process single-flight through a short Redis lock"""
+        lock_key = f"{key}:lock"
+        have_lock = True
+        if self.cache:
+            try:
+                have_lock = bool(self.cache.set(lock_key, "1", nx=True, ex=self.lock_ttl))
+            except Exception:
+                have_lock = True
+
+        if not have_lock:
+            deadline = time.time() + self.wait_timeout
+            while time.time() < deadline:
+                value = self.get(key)
+                if value is not None:
+                    self._count("shared")
+                    return value, "shared"
+                try:
+                    if not self.cache.exists(lock_key):
+                        break
+                except Exception:
+                    break
+                time.sleep(self.poll_interval)
+
+        self._count("misses")
+        try:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+            return value, "miss"
+        finally:
+            if have_lock and self.cache:
+                try:
+                    self.cache.delete(lock_key)
+                except Exception:
+                    pass
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, ttl=self.ttl)
@@ -0,0 +1,99 @@
+"""
+Shared SPARQL client for the services that read Fuseki.
+
+- one pooled requests.Session per client (keep-alive, retries on 502/503/504)
+- query text is normalized (comments dropped, whitespace collapsed outside
+  string literals), so formatting differences still share a cache entry
+- SELECT bindings are cached in Redis through ResultCache: keys embed the ETL
+  data version (etl:version), so a published ETL run invalidates them, and
+  identical concurrent queries are collapsed into one Fuseki call
+- every normalized query gets timing stats (calls, cache hits, Fuseki time),
+  exposed by report() for the services' /health endpoints
+"""
+import hashlib
+import re
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from shared.result_cache import ResultCache
+
+MAX_TRACKED_QUERIES = 500
+
+# String literals and IRIs (kept verbatim) | runs of whitespace and comments (collapsed to one space)
+_QUERY_PARTS = re.compile(r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>\s]*>)'
+                          r'|((?:\s|#[^\n]*)+)')
+
+
+def normalize_query(query):
+    """Canonical text of a SPARQL query (literals and IRIs untouched)"""
+    return _QUERY_PARTS.sub(lambda m: m.group(1) or " ", query).strip()
+
+
+class SparqlClient:
+    def __init__(self, query_url, cache=None, auth=("admin", "admin"), timeout=60, ttl=3600,
+                 namespace="sparql", pool_size=10, slow_ms=1000):
+        self.query_url = query_url
+        self.auth = auth
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self.results = ResultCache(cache, namespace, ttl=ttl, lock_ttl=timeout, wait_timeout=timeout)
+
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET", "POST"]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def select(self, query, cache=True, timeout=None):
+        """Result bindings of a SELECT query; cache=False always goes to Fuseki (large one-off loads)"""
+        query = normalize_query(query)
+        start = time.time()
+        if cache and self.results.cache:
+            bindings, status = self.results.get_or_compute(["select", query], lambda: self._execute(query, timeout))
+        else:
+            bindings, status = self._execute(query, timeout), "uncached"
+        self._record(query, status, (time.time() - start) * 1000)
+        return bindings
+
+    def _execute(self, query, timeout=None):
+        resp = self.session.post(self.query_url, data={"query": query}, auth=self.auth,
+                                 headers={"Accept": "application/sparql-results+json"},
+                                 timeout=timeout or self.timeout)
+        resp.raise_for_status()
+        return resp.json()["results"]["bindings"]
+
+    def _record(self, query, status, ms):
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            if digest not in self._stats and len(self._stats) >= MAX_TRACKED_QUERIES:
+                # Parameterized queries can be endless: forget the one that cost Fuseki the least
+                del self._stats[min(self._stats, key=lambda d: self._stats[d]["fuseki_ms"])]
+            entry = self._stats.setdefault(digest, {"query": query[:160], "calls": 0, "cache_hits": 0,
+                                                    "fuseki_calls": 0, "fuseki_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            if status in ("hit", "shared"):
+                entry["cache_hits"] += 1
+            else:
+                entry["fuseki_calls"] += 1
+                entry["fuseki_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+        if status not in ("hit", "shared") and ms >= self.slow_ms:
+            print(f"🐢 [SPARQL] {ms:.0f} ms ({status}): {query[:120]}", file=sys.stderr)
+
+    def report(self, top=10):
+        """Cache counters plus the queries that spent the most time in Fuseki"""
+        with self._lock:
+            queries = sorted(self._stats.values(), key=lambda e: e["fuseki_ms"], reverse=True)[:top]
+            queries = [dict(e, fuseki_ms=round(e["fuseki_ms"], 1), max_ms=round(e["max_ms"], 1),
+                            avg_fuseki_ms=round(e["fuseki_ms"] / e["fuseki_calls"], 1) if e["fuseki_calls"] else 0.0)
+                       for e in queries]
+        return {"cache": self.results.report(), "queries": queries}
@@ -0,0 +1,41 @@
+"""CatalogueTable keeps the stored objects as they are; restores are no-ops for unchanged data"""
+import fakeredis
+
+from shared import columnar
+from shared.delta import fingerprint, sync_snapshot
+
+DOCS = [
+    {"id": "a1", "name": "Starry  Night", "type": "painting", "creator": "van gogh", "movement": "Rock ",
+     "country": "Unknown", "date": "1889", "material": "oil paint", "location": "N/A"},
+    {"id": "a2", "name": "Irises", "type": "painting", "creator": "Van Gogh", "movement": "rock",
+     "country": "Netherlands", "date": "N/A", "material": "Unknown", "location": "Saint-Rémy"},
+    {"id": "a3", "name": "Guernica", "type": "Painting", "creator": "Pablo Picasso", "movement": "Cubism",
+     "country": "Spain", "date": "1937", "material": "oil paint", "location": "Madrid"},
+]
+
+
+def test_rows_round_trip_exactly():
+    table = columnar.CatalogueTable.from_docs("art", DOCS)
+    assert list(table.docs()) == DOCS
+
+
+def test_lookups_still_match_every_spelling():
+    table = columnar.CatalogueTable.from_docs("art", DOCS)
+    assert list(table.select(creator="VAN GOGH")) == [0, 1]
+    assert dict(table.counts("movement")) == {"Rock ": 2, "Cubism": 1}
+    assert [row for row, _ in table.similar(0, (("creator",),))] == [1]
+    assert table.counts("country") == [("Netherlands", 1), ("Spain", 1)]
+
+
+def test_snapshot_round_trip_keeps_objects():
+    table = columnar.decode_snapshot(columnar.encode_snapshot(columnar.CatalogueTable.from_docs("art", DOCS)))
+    assert list(table.docs()) == DOCS
+
+
+def test_restore_from_file_changes_nothing(tmp_path):
+    cache = fakeredis.FakeRedis(decode_responses=True)
+    sync_snapshot(cache, "art", [{"obj": doc, "fp": fingerprint(doc)} for doc in DOCS])
+    columnar.save_file(columnar.CatalogueTable.from_docs("art", DOCS, version=1), str(tmp_path))
+
+    changes = columnar.restore_from_file(cache, "art", directory=str(tmp_path))
+    assert (changes["new"], changes["changed"], changes["unchanged"]) == (0, 0, 3)
@@ -0,0 +1,155 @@
+"""RedisDelta against an in-memory Redis: the index only changes on publish"""
+import fakeredis
+import pytest
+
+from shared import redis_index
+from shared.delta import RedisDelta, fingerprint, sync_snapshot, triples_fingerprint
+
+
+def band(doc_id, name, genre="rock", country="Romania"):
+    return {"id": doc_id, "name": name, "genre": genre, "country": country, "year": "1990"}
+
+
+def entities(*objs):
+    return [{"obj": obj, "fp": fingerprint(obj)} for obj in objs]
+
+
+def names(cache):
+    return sorted(doc["name"] for doc in redis_index.search(cache, "music", "band"))
+
+
+@pytest.fixture
+def cache():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_first_publish_indexes_staged_entities(cache):
+    delta = RedisDelta(cache, "music")
+    delta.stage(entities(band("q1", "Alpha Band"), band("q2", "Beta Band")))
+    assert names(cache) == []
+
+    changes = delta.publish(delta.removed_ids())
+    assert changes["published"] and changes["new"] == 2
+    assert names(cache) == ["Alpha Band", "Beta Band"]
+    assert not cache.exists("music:idx:staging")
+
+
+def test_stage_does_not_touch_live_index(cache):
+    sync_snapshot(cache, "music", entities(band("q1", "Alpha Band"), band("q2", "Beta Band")))
+
+    delta = RedisDelta(cache, "music")
+    new_ids, changed_ids = delta.stage(entities(band("q1", "Alpha Band", genre="jazz"), band("q3", "Gamma Band")))
+    assert (new_ids, changed_ids) == (["q3"], ["q1"])
+
+    assert names(cache) == ["Alpha Band", "Beta Band"]
+    assert redis_index.get_docs(cache, "music", ["q1"])[0]["genre"] == "rock"
+    assert redis_index.get_docs(cache, "music", ["q3"]) == []
+
+
+def test_aborted_run_leaves_no_index_behind(cache):
+    sync_snapshot(cache, "music", entities(band("q1", "Alpha Band")))
+
+    # Run interrupted after staging: q2 must never become searchable
+    RedisDelta(cache, "music").stage(entities(band("q1", "Alpha Band"), band("q2", "Beta Band")))
+
+    # The next fresh run no longer sees q2 at all
+    delta = RedisDelta(cache, "music")
+    delta.stage(entities(band("q1", "Alpha Band")))
+    changes = delta.publish(delta.removed_ids())
+
+    assert changes["new"] == 0 and changes["unchanged"] == 1
+    assert names(cache) == ["Alpha Band"]
+    assert not cache.exists(redis_index.doc_key("music", "q2"))
+    assert not cache.sismember(redis_index.facet_key("music", "genre", "rock"), "q2")
+
+
+def test_publish_applies_changes_and_removals(cache):
+    sync_snapshot(cache, "music", entities(band("q1", "Alpha Band"), band("q2", "Beta Band")))
+
+    delta = RedisDelta(cache, "music")
+    delta.stage(entities(band("q1", "Alpha Band", genre="jazz"), band("q3", "Gamma Band")))
+    removed = delta.removed_ids()
+    assert removed == ["q2"]
+    changes = delta.publish(removed)
+
+    assert (changes["new"], changes["changed"], changes["removed"]) == (1, 1, 1)
+    assert names(cache) == ["Alpha Band", "Gamma Band"]
+    assert redis_index.search(cache, "music", "jazz")[0]["id"] == "q1"
+    assert not cache.sismember(redis_index.facet_key("music", "genre", "rock"), "q1")
+    assert cache.llen("music:all") == 2
+
+
+def test_first_publish_replaces_index_of_older_loads(cache):
+    pipe = cache.pipeline()
+    redis_index.index_entity(pipe, "music", band("q9", "Legacy Band"))
+    pipe.execute()
+
+    delta = RedisDelta(cache, "music")
+    delta.stage(entities(band("q1", "Alpha Band")))
+    assert names(cache) == ["Legacy Band"]
+
+    delta.publish(delta.removed_ids())
+    assert names(cache) == ["Alpha Band"]
+
+
+def with_triples(obj, *members):
+    triples = [f"<{obj['id']}> <http://schema.org/name> \"{obj['name']}\" ."]
+    triples += [f"<{obj['id']}> <http://schema.org/member> \"{m}\" ." for m in members]
+    return {"obj": obj, "fp": fingerprint(obj), "rdf_fp": triples_fingerprint(triples)}
+
+
+def test_member_change_is_a_fuseki_change_only(cache):
+    delta = RedisDelta(cache, "music")
+    delta.stage([with_triples(band("q1", "Alpha Band"), "Ann")])
+    delta.publish()
+
+    delta = RedisDelta(cache, "music")
+    new_ids, changed_ids = delta.stage([with_triples(band("q1", "Alpha Band"), "Ann", "Bob")])
+    changes = delta.publish()
+
+    assert (new_ids, changed_ids) == ([], ["q1"])
+    assert changes["unchanged"] == 1
+    assert cache.hget("music:rdf:fp", "q1") == with_triples(band("q1", "Alpha Band"), "Ann", "Bob")["rdf_fp"]
+
+
+def test_sync_without_triples_keeps_fuseki_fingerprints(cache):
+    delta = RedisDelta(cache, "music")
+    delta.stage([with_triples(band("q1", "Alpha Band"), "Ann")])
+    delta.publish()
+    rdf_fps = cache.hgetall("music:rdf:fp")
+
+    changes, dirty, _ = sync_snapshot(cache, "music", entities(band("q1", "Alpha Band")))
+    assert changes["unchanged"] == 1 and not dirty
+    assert cache.hgetall("music:rdf:fp") == rdf_fps
+
+
+def test_entities_published_without_triples_are_replaced_in_fuseki(cache):
+    sync_snapshot(cache, "music", entities(band("q1", "Alpha Band")))
+
+    delta = RedisDelta(cache, "music")
+    assert delta.stage([with_triples(band("q1", "Alpha Band"), "Ann")]) == ([], ["q1"])
+
+
+def test_empty_fuseki_gets_every_entity_again(cache):
+    sync_snapshot(cache, "music", [with_triples(band("q1", "Alpha Band"), "Ann")])
+
+    delta = RedisDelta(cache, "music", fuseki_empty=True)
+    new_ids, changed_ids = delta.stage([with_triples(band("q1", "Alpha Band"), "Ann")])
+    changes = delta.publish()
+
+    assert (new_ids, changed_ids) == (["q1"], [])
+    assert changes["unchanged"] == 1 and not cache.exists("music:idx:staging")
+
+
+def test_publish_prunes_dead_tokens_and_keys(cache):
+    sync_snapshot(cache, "music", entities(band("q1", "Alpha Band", genre="zydeco"), band("q2", "Beta Band")))
+
+    changes, _, _ = sync_snapshot(cache, "music", entities(band("q2", "Beta Band")))
+
+    assert changes["pruned_tokens"] == 2
+    assert redis_index.expand_prefix(cache, "music", "") == ["band", "beta", "rock"]
+    tracked = cache.smembers("music:idx:keys")
+    assert redis_index.doc_key("music", "q1") not in tracked
+    assert redis_index.token_key("music", "zydeco") not in tracked
+    assert redis_index.facet_key("music", "genre", "zydeco") not in tracked
+    assert redis_index.token_key("music", "band") in tracked
@@ -0,0 +1,52 @@
+"""
+Small helpers shared by all BiR services.
+"""
+import re
+
+# Incremented every time an ETL run publishes new data (see shared/delta.py)
+DATA_VERSION_KEY = "etl:version"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Placeholder values written by the ETL when Wikidata has no label
+MISSING_VALUES = {"", "unknown", "n/a"}
+
+
+def normalize(text):
+    """Lowercase, whitespace-collapsed form of a field value"""
+    if not text:
+        return ""
+    return " ".join(str(text).lower().split())
+
+
+def tokenize(text):
+    """Lowercase word tokens of a field value"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def is_missing(value):
+    """True for empty values and the ETL placeholders (Unknown, N/A)"""
+    return normalize(value) in MISSING_VALUES
+
+
+def get_data_version(cache):
+    """Current ETL data version (0 if nothing was published yet or Redis is down)"""
+    try:
+        return int(cache.get(DATA_VERSION_KEY) or 0)
+    except Exception:
+        return 0
+
+
+def domain_version_key(domain):
+    return f"{domain}:version"
+
+
+def get_domain_version(cache, domain):
+    """etl:version of the last publish of <domain>:all (the global version for data published before it was kept)"""
+    try:
+        value = cache.get(domain_version_key(domain))
+    except Exception:
+        return 0
+    return int(value) if value is not None else get_data_version(cache)
@@ -0,0 +1,181 @@
+"""
+Paginated, resumable extraction from the Wikidata SPARQL endpoint.
+
+A query is executed in ORDER BY + LIMIT/OFFSET windows and handed to the
+caller one page at a time, so memory stays bounded by the page size. After
+the caller has processed a page the cursor is saved to a Checkpoint (Redis
+and/or a JSON file), and an interrupted run picks up from the last page.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from SPARQLWrapper import SPARQLWrapper, JSON
+
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+DEFAULT_PAGE_SIZE = int(os.getenv("ETL_PAGE_SIZE", "500"))
+# Overrides the LIMIT written in the query files (e.g. ETL_MAX_ROWS=200000)
+ENV_MAX_ROWS = os.getenv("ETL_MAX_ROWS")
+
+LIMIT_RE = re.compile(r"\s*LIMIT\s+(\d+)\s*$", re.IGNORECASE)
+
+
+def split_limit(query):
+    """Strip a trailing LIMIT clause, returning (query, limit or None)"""
+    match = LIMIT_RE.search(query)
+    if not match:
+        return query.rstrip(), None
+    return query[:match.start()].rstrip(), int(match.group(1))
+
+
+class Checkpoint:
+    """Cursor persisted in Redis (key etl:checkpoint:<name>) and/or a JSON file"""
+
+    def __init__(self, name, cache=None, directory=None):
+        self.name = name
+        self.cache = cache
+        self.key = f"etl:checkpoint:{name}"
+        self.path = os.path.join(directory, f"{name}.checkpoint.json") if directory else None
+
+    def load(self):
+        raw = None
+        if self.cache:
+            try:
+                raw = self.cache.get(self.key)
+            except Exception as e:
+                print(f"[CHECKPOINT] Redis read failed for {self.name}: {e}", file=sys.stderr)
+        if raw is None and self.path and os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                raw = f.read()
+        return json.loads(raw) if raw else {}
+
+    def save(self, state):
+        raw = json.dumps(state)
+        if self.cache:
+            try:
+                self.cache.set(self.key, raw)
+            except Exception as e:
+                print(f"[CHECKPOINT] Redis write failed for {self.name}: {e}", file=sys.stderr)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(raw)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.cache:
+            try:
+                self.cache.delete(self.key)
+            except Exception:
+                pass
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class WikidataPager:
+    """
+    Iterate over a SPARQL query in OFFSET windows.
+
+    `order_by` must give a total order of the rows (the entity variable first,
+    then every other projected variable): rows tied on the sort key can swap
+    between requests, so windows would overlap or skip rows. The trailing LIMIT of the query, if any, becomes the
+    total row cap unless max_rows is given. Callers can keep their own cursor
+    data in `state`; it is persisted together with the offset.
+    """
+
+    def __init__(self, query, order_by, page_size=None, max_rows=None, checkpoint=None,
+                 user_agent="BiR-StudentProject/1.0", retries=3, retry_delay=5):
+        self.base_query, limit = split_limit(query)
+        self.order_by = order_by
+        self.page_size = page_size or DEFAULT_PAGE_SIZE
+        if max_rows is None and ENV_MAX_ROWS:
+            max_rows = int(ENV_MAX_ROWS)
+        self.max_rows = max_rows if max_rows is not None else limit
+        self.checkpoint = checkpoint
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.fingerprint = hashlib.sha1(f"{self.base_query}|{order_by}".encode("utf-8")).hexdigest()
+
+        self.client = SPARQLWrapper(WIKIDATA_ENDPOINT)
+        self.client.setReturnFormat(JSON)
+        self.client.addCustomHttpHeader("User-Agent", user_agent)
+
+        saved = checkpoint.load() if checkpoint else {}
+        if saved.get("query") == self.fingerprint:
+            self.state = saved
+        else:
+            self.state = {"query": self.fingerprint, "offset": 0}
+        self.resumed = self.state["offset"] > 0
+        self.rows = self.state["offset"]
+
+    def reset(self):
+        """Forget the saved cursor and start from the first page"""
+        self.state = {"query": self.fingerprint, "offset": 0}
+        self.resumed = False
+        self.rows = 0
+        if self.checkpoint:
+            self.checkpoint.clear()
+
+    def page_query(self, offset, size):
+        return f"{self.base_query}\nORDER BY {self.order_by}\nLIMIT {size}\nOFFSET {offset}"
+
+    def _fetch(self, offset, size):
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.client.setQuery(self.page_query(offset, size))
+                return self.client.query().convert()["results"]["bindings"]
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                wait = self.retry_delay * 2 ** (attempt - 1)
+                print(f"[WIKIDATA] Page at offset {offset} failed ({e}), retry in {wait}s", file=sys.stderr)
+                time.sleep(wait)
+
+    def fetch(self):
+        """
+        Yield (offset after the page, bindings) without touching the checkpoint:
+        a pipelined caller prefetches pages and commit()s each one once it is loaded.
+        """
+        offset = self.state["offset"]
+        if self.resumed:
+            print(f"[WIKIDATA] Resuming from offset {offset}", file=sys.stderr)
+
+        while self.max_rows is None or offset < self.max_rows:
+            size = self.page_size if self.max_rows is None else min(self.page_size, self.max_rows - offset)
+            bindings = self._fetch(offset, size)
+            if not bindings:
+                break
+
+            offset += len(bindings)
+            yield offset, bindings
+
+            if len(bindings) < size:
+                break
+
+    def commit(self, offset):
+        """Every row before offset is processed: save the cursor together with the caller's state"""
+        self.rows = offset
+        self.state["offset"] = offset
+        if self.checkpoint:
+            self.checkpoint.save(self.state)
+
+    def pages(self):
+        """Yield lists of bindings; the checkpoint advances once the caller asks for the next page"""
+        for offset, bindings in self.fetch():
+            yield bindings
+            self.commit(offset)
+
+    def bindings(self):
+        """Flat stream of bindings across pages"""
+        for page in self.pages():
+            for item in page:
+                yield item
+
+    def finish(self):
+        """Drop the checkpoint once the caller has published the extracted data"""
+        if self.checkpoint:
+            self.checkpoint.clear()
@@ -7,10 +7,25 @@ import sys
 import json
 import requests
 import redis
+from collections import Counter
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, lower, trim, regexp_replace, count, lit
-from pyspark.sql.types import StructType, StructField, StringType
-from SPARQLWrapper import SPARQLWrapper, JSON
+from pyspark.sql import Window
+from pyspark.sql.functions import (col, lower, trim, regexp_extract, count, lit, when, concat, floor, explode, array,
+                                   struct, monotonically_increasing_id, row_number)
+from pyspark.sql.types import StructType, StructField, StringType, ArrayType
+from shared import aggregates, columnar
+from shared.aggregates import ROLLUPS
+from shared.wikidata import WikidataPager, Checkpoint
+from shared.fuseki_loader import FusekiBulkLoader, delete_subjects
+from shared.delta import RedisDelta, fingerprint, sync_snapshot, triples_fingerprint
+from shared.models import DOMAINS
+from shared.rdf_dump import NTriplesDumpLoader
+from shared.utils import MISSING_VALUES, get_data_version
+
+# Fields, predicates, Wikidata query and Fuseki type of the art domain
+ART = DOMAINS["art"]
+# Columns of the staging file / DataFrame: id + the stored catalogue fields (+ "triples", the entity's RDF)
+ART_COLUMNS = ["id"] + [f.name for f in ART.stored]
 
 
 class SparkArtETL:
@@ -20,6 +35,15 @@ class SparkArtETL:
         self.fuseki_host = os.getenv("FUSEKI_HOST", "fuseki")
         self.fuseki_update_url = f"http://{self.fuseki_host}:3030/bir/update"
         self.fuseki_query_url = f"http://{self.fuseki_host}:3030/bir/query"
+        self.fuseki_data_url = f"http://{self.fuseki_host}:3030/bir/data?default"
+        self.staging_dir = os.getenv("ETL_STAGING_DIR", "/tmp/bir-etl")
+        # Filled by load_to_redis (staging): artworks to (re)insert / whose old triples must be deleted,
+        # published by publish_redis once Fuseki is loaded
+        self.delta = None
+        self.fuseki_empty = False   # set by run(): Fuseki needs every artwork, not just the Redis delta
+        self.dirty_ids = None
+        self.stale_ids = set()
+        self.removed_ids = []
 
         # Initialize Spark
         self.spark = SparkSession.builder \
@@ -45,7 +69,7 @@ class SparkArtETL:
 
         fuseki_has_data = False
         try:
-            query = "SELECT (COUNT(*) AS ?count) WHERE { ?s a <http://schema.org/VisualArtwork> }"
+            query = f"SELECT (COUNT(*) AS ?count) WHERE {{ ?s a <{ART.rdf_type}> }}"
             resp = requests.get(self.fuseki_query_url, params={'query': query},
                                headers={'Accept': 'application/sparql-results+json'})
             if resp.status_code == 200:
@@ -57,106 +81,85 @@ class SparkArtETL:
         return redis_has_data, fuseki_has_data
 
     def extract_from_wikidata(self):
-        """Extract artworks from Wikidata using SPARQL"""
-        print("[SPARK-ETL] Extracting data from Wikidata...", file=sys.stderr)
-
-        query = """
-        PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-        PREFIX wd: <http://www.wikidata.org/entity/>
-        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-
-        SELECT DISTINCT ?artwork ?artworkLabel ?typeLabel ?creatorLabel
-                        ?movementLabel ?countryLabel ?date ?materialLabel ?locationLabel
-        WHERE {
-          VALUES ?type { wd:Q3305213 wd:Q860861 wd:Q93184 wd:Q11060274 }
-          ?artwork wdt:P31 ?type .
-          ?artwork rdfs:label ?artworkLabel . FILTER(LANG(?artworkLabel) = "en")
-          ?type rdfs:label ?typeLabel . FILTER(LANG(?typeLabel) = "en")
-
-          OPTIONAL {
-            ?artwork wdt:P170 ?creator .
-            ?creator rdfs:label ?creatorLabel . FILTER(LANG(?creatorLabel) = "en")
-          }
-          OPTIONAL {
-            ?artwork wdt:P135 ?movement .
-            ?movement rdfs:label ?movementLabel . FILTER(LANG(?movementLabel) = "en")
-          }
-          OPTIONAL {
-            ?artwork wdt:P495 ?country .
-            ?country rdfs:label ?countryLabel . FILTER(LANG(?countryLabel) = "en")
-          }
-          OPTIONAL { ?artwork wdt:P571 ?date . }
-          OPTIONAL {
-            ?artwork wdt:P186 ?material .
-            ?material rdfs:label ?materialLabel . FILTER(LANG(?materialLabel) = "en")
-          }
-          OPTIONAL {
-            ?artwork wdt:P276 ?location .
-            ?location rdfs:label ?locationLabel . FILTER(LANG(?locationLabel) = "en")
-          }
-        }
-        LIMIT 3000
         """
+        Extract artworks from Wikidata page by page into a JSON-lines staging file,
+        one line per artwork: its object and triples exactly as the sparql-service builds
+        them (ART.to_entity over the artwork's rows). An interrupted extraction resumes
+        from the checkpoint stored next to the file.
+        """
+        print("[SPARK-ETL] Extracting data from Wikidata...", file=sys.stderr)
 
-        wikidata = SPARQLWrapper("https://query.wikidata.org/sparql")
-        wikidata.setReturnFormat(JSON)
-        wikidata.addCustomHttpHeader("User-Agent", "BiR-SparkETL-StudentProject/1.0")
-        wikidata.setQuery(query)
-
-        results = wikidata.query().convert()
-        bindings = results["results"]["bindings"]
-        print(f"[SPARK-ETL] Extracted {len(bindings)} raw records from Wikidata", file=sys.stderr)
-
-        return bindings
-
-    def transform_with_spark(self, raw_data):
+        # Same query file as the sparql-service art ETL (shared/queries/)
+        query = ART.read_query()
+
+        pager = WikidataPager(query, order_by=ART.order_by,
+                              checkpoint=Checkpoint("spark-art", directory=self.staging_dir),
+                              user_agent="BiR-SparkETL-StudentProject/1.0")
+
+        raw_path = os.path.join(self.staging_dir, "art_raw.jsonl")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        # Fresh run -> start a new file; resumed run -> cut the page that was half written
+        if pager.resumed and not os.path.exists(raw_path):
+            pager.reset()
+        if pager.resumed:
+            with open(raw_path, "r+") as f:
+                f.truncate(pager.state.get("bytes", 0))
+        elif os.path.exists(raw_path):
+            os.remove(raw_path)
+
+        def write_entity(out, rows):
+            obj, triples = ART.to_entity(rows)
+            out.write(json.dumps(dict(obj, triples=triples)) + "\n")
+
+        # Rows come sorted by artwork; the last artwork of a page may continue on the next one
+        pending = pager.state.get("pending", [])
+        with open(raw_path, "a") as out:
+            for page in pager.pages():
+                for item in page:
+                    artwork_id = item.get(ART.id_var, {}).get("value")
+                    if not artwork_id:
+                        continue
+                    if pending and pending[0][ART.id_var]["value"] != artwork_id:
+                        write_entity(out, pending)
+                        pending = []
+                    pending.append(item)
+                out.flush()
+                pager.state["bytes"] = out.tell()
+                pager.state["pending"] = pending
+                print(f"[SPARK-ETL] Extracted {pager.rows + len(page)} raw records so far", file=sys.stderr)
+            if pending:
+                write_entity(out, pending)
+
+        print(f"[SPARK-ETL] Extracted {pager.rows} raw records from Wikidata", file=sys.stderr)
+        return raw_path, pager
+
+    def transform_with_spark(self, raw_path):
         """Transform data using Spark DataFrame operations"""
         print("[SPARK-ETL] Transforming data with Spark...", file=sys.stderr)
 
-        # Convert to list of dicts for Spark
-        rows = []
-        for item in raw_data:
-            rows.append({
-                "artwork": item.get("artwork", {}).get("value", ""),
-                "name": item.get("artworkLabel", {}).get("value", "Unknown"),
-                "type": item.get("typeLabel", {}).get("value", "Unknown"),
-                "creator": item.get("creatorLabel", {}).get("value", "Unknown"),
-                "movement": item.get("movementLabel", {}).get("value", "Unknown"),
-                "country": item.get("countryLabel", {}).get("value", "Unknown"),
-                "date": item.get("date", {}).get("value", "N/A"),
-                "material": item.get("materialLabel", {}).get("value", "Unknown"),
-                "location": item.get("locationLabel", {}).get("value", "Unknown")
-            })
-
-        # Create Spark DataFrame
-        schema = StructType([
-            StructField("artwork", StringType(), True),
-            StructField("name", StringType(), True),
-            StructField("type", StringType(), True),
-            StructField("creator", StringType(), True),
-            StructField("movement", StringType(), True),
-            StructField("country", StringType(), True),
-            StructField("date", StringType(), True),
-            StructField("material", StringType(), True),
-            StructField("location", StringType(), True)
-        ])
-
-        df = self.spark.createDataFrame(rows, schema)
+        # Create Spark DataFrame (one string column per catalogue field, plus the triples)
+        schema = StructType([StructField(name, StringType(), True) for name in ART_COLUMNS] +
+                            [StructField("triples", ArrayType(StringType()), True)])
+
+        # Spark reads the staging file directly, the driver never holds the raw rows
+        df = self.spark.read.schema(schema).json(raw_path)
         print(f"[SPARK-ETL] Created DataFrame with {df.count()} rows", file=sys.stderr)
 
         # SPARK TRANSFORMATIONS
-        # 1. Remove duplicates
-        df = df.dropDuplicates(["artwork"])
+        # Values are kept as extracted (ART.to_object): the Redis objects and their fingerprints
+        # must match the sparql-service and art-service ones; RDF literals are escaped by models.literal
+        # 1. Filter out rows without valid artwork URI
+        df = df.filter(col("id").isNotNull() & (col("id") != ""))
+
+        # 2. Remove duplicates (an artwork split across a resumed extraction): keep its first line
+        first = Window.partitionBy("id").orderBy("line")
+        df = df.withColumn("line", monotonically_increasing_id()) \
+            .withColumn("rank", row_number().over(first)) \
+            .filter(col("rank") == 1).drop("line", "rank")
         print(f"[SPARK-ETL] After deduplication: {df.count()} rows", file=sys.stderr)
 
-        # 2. Clean text fields
-        df = df.withColumn("name", trim(regexp_replace(col("name"), r'[\"\n\r]', ' ')))
-        df = df.withColumn("creator", trim(regexp_replace(col("creator"), r'[\"\n\r]', ' ')))
-
-        # 3. Filter out rows without valid artwork URI
-        df = df.filter(col("artwork").isNotNull() & (col("artwork") != ""))
-
-        # 4. Add lowercase columns for search
+        # 3. Add lowercase columns for search
         df = df.withColumn("name_lower", lower(col("name")))
         df = df.withColumn("movement_lower", lower(col("movement")))
 
@@ -164,138 +167,120 @@ class SparkArtETL:
         return df
 
     def compute_stats(self, df):
-        """Pre-compute aggregations using Spark"""
+        """Pre-compute the art rollups (shared/aggregates.py) in one Spark aggregation"""
         print("[SPARK-ETL] Computing statistics with Spark...", file=sys.stderr)
 
-        # Top movements
-        movements_df = df.groupBy("movement") \
+        # Same decade as aggregates.decade_of: leading (signed) year of the date, floored to 10
+        year = regexp_extract(col("date"), r"^\s*(-?\d{1,4})", 1)
+        decade = when(year != "", concat((floor(year.cast("int") / 10) * 10).cast("string"), lit("s")))
+        columns = {dimension: decade if dimension == "decade" else trim(col(field))
+                   for dimension, field in ROLLUPS["art"].items()}
+
+        # One (dimension, value) row per artwork and dimension -> a single groupBy for all rollups
+        pairs = df.select(explode(array(*[struct(lit(d).alias("dimension"), c.alias("value"))
+                                          for d, c in columns.items()])).alias("p")).select("p.*")
+        counts = pairs.filter(col("value").isNotNull() & ~lower(col("value")).isin(list(MISSING_VALUES))) \
+            .groupBy("dimension", "value") \
             .agg(count("*").alias("count")) \
-            .orderBy(col("count").desc()) \
-            .limit(10)
+            .collect()
 
-        # Top countries
-        countries_df = df.groupBy("country") \
-            .agg(count("*").alias("count")) \
-            .orderBy(col("count").desc()) \
-            .limit(10)
+        rollups = {dimension: Counter() for dimension in columns}
+        for r in counts:
+            rollups[r["dimension"]][r["value"]] = r["count"]
 
-        # Top creators
-        creators_df = df.groupBy("creator") \
-            .agg(count("*").alias("count")) \
-            .orderBy(col("count").desc()) \
-            .limit(10)
-
-        movements = [{"label": r["movement"], "value": r["count"]} for r in movements_df.collect()]
-        countries = [{"label": r["country"], "value": r["count"]} for r in countries_df.collect()]
-        creators = [{"label": r["creator"], "value": r["count"]} for r in creators_df.collect()]
-
-        print(f"[SPARK-ETL] Stats computed: {len(movements)} movements, {len(countries)} countries", file=sys.stderr)
-        return {"movements": movements, "countries": countries, "creators": creators}
+        print(f"[SPARK-ETL] Stats computed: {len(rollups['movement'])} movements, "
+              f"{len(rollups['country'])} countries, {len(rollups['creator'])} creators", file=sys.stderr)
+        return {"total": df.count(), "rollups": rollups, "cube": Counter()}
 
-    def load_to_redis(self, df):
-        """Load transformed data to Redis"""
-        print("[SPARK-ETL] Loading to Redis...", file=sys.stderr)
+    def load_to_redis(self, df, batch_size=1000):
+        """Stage the transformed data in Redis (published by publish_redis after the Fuseki load)"""
+        print("[SPARK-ETL] Staging in Redis...", file=sys.stderr)
 
         if not self.cache:
             print("[SPARK-ETL] Redis not available", file=sys.stderr)
             return False
 
         # Collect data (for small datasets this is OK)
-        rows = df.select("artwork", "name", "type", "creator", "movement",
-                         "country", "date", "material", "location").collect()
+        rows = df.select(*ART_COLUMNS, "triples").collect()
 
-        # Clear old data first
-        self.cache.delete("art:all")
-
-        pipeline = self.cache.pipeline()
+        # Stage the new snapshot next to art:all; only new/changed artworks are reindexed on publish
+        entities = []
         for row in rows:
-            obj = {
-                "id": row["artwork"],
-                "name": row["name"],
-                "type": row["type"],
-                "creator": row["creator"],
-                "movement": row["movement"],
-                "country": row["country"],
-                "date": row["date"],
-                "material": row["material"],
-                "location": row["location"]
-            }
-            pipeline.rpush("art:all", json.dumps(obj))
-
-        pipeline.execute()
-        print(f"[SPARK-ETL] Loaded {len(rows)} artworks to Redis (art:all)", file=sys.stderr)
+            obj = {name: row[name] for name in ART_COLUMNS}
+            entities.append({"obj": obj, "fp": fingerprint(obj), "rdf_fp": triples_fingerprint(row["triples"] or [])})
+
+        self.delta = RedisDelta(self.cache, "art", fuseki_empty=self.fuseki_empty)
+        self.dirty_ids, self.stale_ids = set(), set()
+        for i in range(0, len(entities), batch_size):
+            new_ids, changed_ids = self.delta.stage(entities[i:i + batch_size])
+            self.dirty_ids.update(new_ids)
+            self.dirty_ids.update(changed_ids)
+            self.stale_ids.update(changed_ids)
+        self.removed_ids = self.delta.removed_ids()
+        self.stale_ids.update(self.removed_ids)
+        print(f"[SPARK-ETL] Staged {len(rows)} artworks in Redis (art:all:staging): {len(self.dirty_ids)} to load, "
+              f"{len(self.removed_ids)} removed", file=sys.stderr)
+        return True
+
+    def publish_redis(self):
+        """Swap the staged snapshot in (bumps etl:version): readers keyed on it now find Fuseki loaded"""
+        if not self.delta:
+            return False
+        changes = self.delta.publish(self.removed_ids)
+        print(f"[SPARK-ETL] Published {self.cache.llen('art:all')} artworks to Redis (art:all): {changes}",
+              file=sys.stderr)
         return True
 
     def load_to_fuseki(self, df):
         """Load RDF triples to Fuseki"""
         print("[SPARK-ETL] Loading to Fuseki...", file=sys.stderr)
 
-        rows = df.select("artwork", "name", "type", "creator", "movement",
-                         "country", "date", "material", "location").collect()
+        rows = df.select("id", "triples").collect()
 
-        def clean(text):
-            if text is None:
-                return "Unknown"
-            return text.replace('"', '\\"').replace('\n', ' ').replace('\r', '')
+        # FUSEKI_LOAD_MODE=file|dump -> full gzip N-Triples; update -> only new/changed artworks
+        mode = os.getenv("FUSEKI_LOAD_MODE", "update")
+        dirty = self.dirty_ids if mode == "update" else None
 
-        # Build RDF triples
+        # RDF triples built at extraction (ART.to_entity: every material..., placeholders are not written)
         triples = []
         for row in rows:
-            s = f"<{row['artwork']}>"
-            triples.append(f'{s} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://schema.org/VisualArtwork> .')
-            triples.append(f'{s} <http://schema.org/name> "{clean(row["name"])}" .')
-            triples.append(f'{s} <http://schema.org/artform> "{clean(row["type"])}" .')
-            triples.append(f'{s} <http://schema.org/creator> "{clean(row["creator"])}" .')
-            triples.append(f'{s} <http://schema.org/artMovement> "{clean(row["movement"])}" .')
-            triples.append(f'{s} <http://schema.org/locationCreated> "{clean(row["country"])}" .')
-            if row["date"] and row["date"] != "N/A":
-                triples.append(f'{s} <http://schema.org/dateCreated> "{row["date"]}" .')
-            triples.append(f'{s} <http://schema.org/material> "{clean(row["material"])}" .')
-            triples.append(f'{s} <http://schema.org/contentLocation> "{clean(row["location"])}" .')
-
-        # Batch insert to Fuseki
-        chunk_size = 500
-        fuseki_auth = ('admin', 'admin')
-
-        for i in range(0, len(triples), chunk_size):
-            chunk = triples[i:i+chunk_size]
-            update_query = f"INSERT DATA {{ {' '.join(chunk)} }}"
-            try:
-                resp = requests.post(self.fuseki_update_url, data={'update': update_query}, auth=fuseki_auth)
-                if resp.status_code != 200:
-                    print(f"[SPARK-ETL] Fuseki batch {i//chunk_size} failed: {resp.status_code}", file=sys.stderr)
-            except Exception as e:
-                print(f"[SPARK-ETL] Fuseki error: {e}", file=sys.stderr)
-
-        print(f"[SPARK-ETL] Loaded {len(rows)} artworks to Fuseki", file=sys.stderr)
-        return True
+            if dirty is not None and row["id"] not in dirty:
+                continue
+            triples.extend(row["triples"] or [])
+
+        # Old triples of changed/removed artworks go first (dump mode never touches Fuseki)
+        if self.stale_ids and mode != "dump":
+            delete_subjects(self.fuseki_update_url, self.stale_ids, tag="SPARK-ETL")
+
+        if mode in ("file", "dump"):
+            sink = NTriplesDumpLoader(os.path.join(self.staging_dir, "art.nt.gz"),
+                                      data_url=self.fuseki_data_url if mode == "file" else None,
+                                      tag="SPARK-ETL")
+        else:
+            # Concurrent batch insert to Fuseki (pooled session, retries, adaptive batch size)
+            workers = int(os.getenv("FUSEKI_WORKERS", "4"))
+            sink = FusekiBulkLoader(self.fuseki_update_url, auth=('admin', 'admin'),
+                                    workers=workers, tag="SPARK-ETL")
+
+        sink.add(triples)
+        report = sink.close()
+
+        print(f"[SPARK-ETL] Loaded {len(rows)} artworks to Fuseki: {report}", file=sys.stderr)
+        return report.get("failed_batches", 0) == 0 and report.get("uploaded", True)
 
     def cache_stats(self, stats):
-        """Cache pre-computed stats in Redis"""
+        """Publish the pre-computed rollups (art:agg:*), stamped with the version publish_redis published"""
         if not self.cache:
             return
 
-        self.cache.set("art:stats", json.dumps(stats))
-        print("[SPARK-ETL] Stats cached in Redis (art:stats)", file=sys.stderr)
+        aggregates.publish(self.cache, "art", stats, get_data_version(self.cache))
+        print(f"[SPARK-ETL] Stats materialized in Redis (art:agg, {stats['total']} artworks)", file=sys.stderr)
 
     def sync_redis_from_fuseki(self):
         """Sync Redis cache from Fuseki (no Wikidata download needed)"""
         print("[SPARK-ETL] Syncing Redis from Fuseki...", file=sys.stderr)
 
-        query = """
-        SELECT ?artwork ?name ?type ?creator ?movement ?country ?date ?material ?location
-        WHERE {
-            ?artwork a <http://schema.org/VisualArtwork> .
-            OPTIONAL { ?artwork <http://schema.org/name> ?name }
-            OPTIONAL { ?artwork <http://schema.org/artform> ?type }
-            OPTIONAL { ?artwork <http://schema.org/creator> ?creator }
-            OPTIONAL { ?artwork <http://schema.org/artMovement> ?movement }
-            OPTIONAL { ?artwork <http://schema.org/locationCreated> ?country }
-            OPTIONAL { ?artwork <http://schema.org/dateCreated> ?date }
-            OPTIONAL { ?artwork <http://schema.org/material> ?material }
-            OPTIONAL { ?artwork <http://schema.org/contentLocation> ?location }
-        }
-        """
+        query = ART.fuseki_query()
 
         try:
             resp = requests.get(self.fuseki_query_url, params={'query': query},
@@ -310,31 +295,21 @@ class SparkArtETL:
             if not self.cache:
                 return False
 
-            # Clear old data first
-            self.cache.delete("art:all")
-
-            pipeline = self.cache.pipeline()
+            # New snapshot goes through staging + RENAME, art:all stays readable meanwhile
+            entities = []
             seen = set()
 
             for item in bindings:
-                artwork_id = item.get("artwork", {}).get("value", "")
+                obj = ART.from_fuseki(item)
+                artwork_id = obj["id"]
                 if artwork_id and artwork_id not in seen:
-                    obj = {
-                        "id": artwork_id,
-                        "name": item.get("name", {}).get("value", "Unknown"),
-                        "type": item.get("type", {}).get("value", "Unknown"),
-                        "creator": item.get("creator", {}).get("value", "Unknown"),
-                        "movement": item.get("movement", {}).get("value", "Unknown"),
-                        "country": item.get("country", {}).get("value", "Unknown"),
-                        "date": item.get("date", {}).get("value", "N/A"),
-                        "material": item.get("material", {}).get("value", "Unknown"),
-                        "location": item.get("location", {}).get("value", "Unknown")
-                    }
-                    pipeline.rpush("art:all", json.dumps(obj))
+                    entities.append({"obj": obj, "fp": fingerprint(obj)})
                     seen.add(artwork_id)
 
-            pipeline.execute()
-            print(f"[SPARK-ETL] Redis synced with {len(seen)} artworks from Fuseki.", file=sys.stderr)
+            changes, _, _ = sync_snapshot(self.cache, "art", entities)
+            print(f"[SPARK-ETL] Redis synced with {len(seen)} artworks from Fuseki: {changes}", file=sys.stderr)
+            aggregates.materialize(self.cache, "art")
+            columnar.publish_snapshot(self.cache, "art", directory=columnar.CATALOGUE_DIR)
             return True
         except Exception as e:
             print(f"[SPARK-ETL] Sync error: {e}", file=sys.stderr)
@@ -353,33 +328,51 @@ class SparkArtETL:
         # Case 1: Both have data -> Skip ETL entirely
         if redis_ok and fuseki_ok:
             print("[SPARK-ETL] Data exists in both Redis & Fuseki. Skipping ETL.", file=sys.stderr)
+            # No-op when the aggregates / snapshot already match the published data, else rebuilt from art:all
+            if self.cache:
+                aggregates.materialize(self.cache, "art")
+                columnar.publish_snapshot(self.cache, "art", directory=columnar.CATALOGUE_DIR)
             self.spark.stop()
             return
 
-        # Case 2: Fuseki has data but Redis empty -> Just sync Redis (no Wikidata needed)
+        # Case 2: Fuseki has data but Redis empty -> Just sync Redis (no Wikidata needed),
+        # from the local catalogue file (last good snapshot) when there is one, else with a full SPARQL scan
         if fuseki_ok and not redis_ok:
-            print("[SPARK-ETL] Fuseki has data, Redis empty. Syncing Redis from Fuseki...", file=sys.stderr)
-            self.sync_redis_from_fuseki()
+            if self.cache and columnar.restore_from_file(self.cache, "art", min_rows=101):
+                print("[SPARK-ETL] Fuseki has data, Redis empty. Restored Redis from the catalogue file.",
+                      file=sys.stderr)
+                aggregates.materialize(self.cache, "art")
+                columnar.publish_snapshot(self.cache, "art", directory=columnar.CATALOGUE_DIR)
+            else:
+                print("[SPARK-ETL] Fuseki has data, Redis empty. Syncing Redis from Fuseki...", file=sys.stderr)
+                self.sync_redis_from_fuseki()
             self.spark.stop()
             return
 
-        # Case 3: Neither has data OR only Redis has data -> Full ETL from Wikidata
+        # Case 3: Neither has data OR only Redis has data -> Full ETL from Wikidata,
+        # inserting every artwork into Fuseki (the Redis fingerprints describe data Fuseki no longer has)
         print("[SPARK-ETL] Starting full ETL from Wikidata...", file=sys.stderr)
+        self.fuseki_empty = not fuseki_ok
 
         try:
             # EXTRACT
-            raw_data = self.extract_from_wikidata()
+            raw_path, pager = self.extract_from_wikidata()
 
             # TRANSFORM with Spark
-            df = self.transform_with_spark(raw_data)
+            df = self.transform_with_spark(raw_path)
 
             # Compute stats
             stats = self.compute_stats(df)
 
-            # LOAD
+            # LOAD: stage in Redis, load Fuseki, then publish (new etl:version only once Fuseki has the data)
             self.load_to_redis(df)
             self.load_to_fuseki(df)
+            self.publish_redis()
             self.cache_stats(stats)
+            if self.cache:
+                # Binary columnar snapshot of art:all: services load it with one GET
+                columnar.publish_snapshot(self.cache, "art", directory=columnar.CATALOGUE_DIR)
+            pager.finish()
 
             print("[SPARK-ETL] ========================================", file=sys.stderr)
             print("[SPARK-ETL] ETL Pipeline completed successfully!", file=sys.stderr)
@@ -0,0 +1,183 @@
+"""
+Stage orchestration for the sparql-service ETL.
+
+One domain run is a small DAG:
+
+    extract -> transform -> redis -> fuseki -> publish -> {search, stats, snapshot}
+
+The first four stages are a Pipeline: one thread per stage, connected by
+bounded queues, so page n+1 is downloaded from Wikidata while page n is
+transformed, staged in Redis and loaded into Fuseki, and a slow stage holds
+back the ones before it instead of buffering the whole extract. Fuseki comes
+after Redis because its DELETE/INSERT needs the changed ids found by the
+Redis staging. The independent steps after publishing run through
+run_parallel, and run_domains runs the domains themselves concurrently.
+
+Every stage reports its busy time (seconds), the time it spent blocked on
+its queues (waiting) and the items it handled; the ETL returns them per run.
+"""
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+POLL_SECONDS = 0.5
+
+
+class Pipeline:
+    """Linear chain of stages, one thread each, connected by bounded queues"""
+
+    def __init__(self, name, queue_size=4):
+        self.name = name
+        self.queue_size = queue_size
+        self.source_name = None
+        self.source_items = None
+        self.stages = []  # (name, fn(item) -> item or None, end() -> item or None)
+        self.timings = {}
+        self._stop = threading.Event()
+        self._errors = []
+
+    def source(self, name, iterable):
+        self.source_name = name
+        self.source_items = iterable
+        return self
+
+    def stage(self, name, fn, end=None):
+        """fn(item) returns the item for the next stage (None drops it); end() may emit one last item"""
+        self.stages.append((name, fn, end))
+        return self
+
+    def run(self):
+        """Run every stage to completion; the first stage error stops the others and is re-raised"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0],), name=f"{self.name}-{self.source_name}")]
+        for i, (name, fn, end) in enumerate(self.stages):
+            out = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(target=self._run_stage, args=(name, fn, end, queues[i], out),
+                                            name=f"{self.name}-{name}"))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+        return self.timings
+
+    def _timing(self, name):
+        return self.timings.setdefault(name, {"items": 0, "seconds": 0.0, "waiting": 0.0})
+
+    def _put(self, out, item, timing):
+        start = time.time()
+        while not self._stop.is_set():
+            try:
+                out.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        timing["waiting"] += time.time() - start
+
+    def _get(self, inbox, timing):
+        start = time.time()
+        while not self._stop.is_set():
+            try:
+                item = inbox.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _END
+        timing["waiting"] += time.time() - start
+        return item
+
+    def _fail(self, name, error):
+        print(f"❌ [{self.name}] stage {name} failed: {error}", file=sys.stderr)
+        self._errors.append(error)
+        self._stop.set()
+
+    def _run_source(self, out):
+        timing = self._timing(self.source_name)
+        items = iter(self.source_items)
+        try:
+            while not self._stop.is_set():
+                start = time.time()
+                item = next(items, _END)
+                timing["seconds"] += time.time() - start
+                if item is _END:
+                    break
+                timing["items"] += 1
+                self._put(out, item, timing)
+        except Exception as e:
+            self._fail(self.source_name, e)
+        finally:
+            self._put(out, _END, timing)
+
+    def _run_stage(self, name, fn, end, inbox, out):
+        timing = self._timing(name)
+        try:
+            while True:
+                item = self._get(inbox, timing)
+                start = time.time()
+                if item is _END:
+                    result = end() if end and not self._stop.is_set() else None
+                else:
+                    result = fn(item)
+                timing["seconds"] += time.time() - start
+                if item is not _END:
+                    timing["items"] += 1
+                if out is not None and result is not None:
+                    self._put(out, result, timing)
+                if item is _END:
+                    break
+        except Exception as e:
+            self._fail(name, e)
+        finally:
+            if out is not None:
+                self._put(out, _END, timing)
+
+
+def run_parallel(steps, tag="ETL"):
+    """
+    Run independent steps ({name: fn}) on a thread pool; a failing step is
+    logged and reported, not raised. Returns {name: {"seconds"[, "error"]}}.
+    """
+    def timed(name, fn):
+        start = time.time()
+        timing = {}
+        try:
+            fn()
+        except Exception as e:
+            print(f"⚠️ [{tag}] {name} failed: {e}", file=sys.stderr)
+            timing["error"] = str(e)
+        timing["seconds"] = round(time.time() - start, 2)
+        return timing
+
+    with ThreadPoolExecutor(max_workers=max(len(steps), 1), thread_name_prefix=f"{tag.lower()}-step") as pool:
+        futures = {name: pool.submit(timed, name, fn) for name, fn in steps.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def run_domains(runs):
+    """Run the per-domain ETLs ({domain: fn}) concurrently; {domain: result of fn}"""
+    with ThreadPoolExecutor(max_workers=max(len(runs), 1), thread_name_prefix="etl-domain") as pool:
+        futures = {domain: pool.submit(fn) for domain, fn in runs.items()}
+        return {domain: future.result() for domain, future in futures.items()}
+
+
+def rounded(timings):
+    return {name: {key: round(value, 2) if isinstance(value, float) else value for key, value in timing.items()}
+            for name, timing in timings.items()}
+
+
+def format_timings(timings):
+    """One log line: stage busy seconds (items, seconds blocked on the queues)"""
+    parts = []
+    for name, timing in timings.items():
+        part = f"{name} {timing['seconds']:.2f}s"
+        if "items" in timing:
+            part += f" ({timing['items']} items, waited {timing['waiting']:.2f}s)"
+        if "error" in timing:
+            part += " (failed)"
+        parts.append(part)
+    return ", ".join(parts)
@@ -1,14 +1,21 @@
 from flask import Flask, jsonify, request
-from SPARQLWrapper import SPARQLWrapper, JSON
 from flask_cors import CORS
 from flasgger import Swagger
 import os
 import sys
 import json
 import redis
-import requests
 import threading
 import time
+import etl_pipeline
+from search_index import SearchIndex
+from suggest_index import SuggestIndex, SUGGEST_FIELDS, MAX_LIMIT as SUGGEST_MAX_LIMIT
+from shared import aggregates, columnar, redis_index
+from shared.models import DOMAINS
+from shared.wikidata import WikidataPager, Checkpoint
+from shared.fuseki_loader import FusekiBulkLoader, count_subjects, delete_subjects
+from shared.delta import RedisDelta, fingerprint, triples_fingerprint
+from shared.rdf_dump import NTriplesDumpLoader, upload_ntriples
 
 app = Flask(__name__)
 CORS(app)
@@ -25,6 +32,14 @@ REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 FUSEKI_HOST = os.getenv('FUSEKI_HOST', 'localhost')
 FUSEKI_UPDATE_URL = f"http://{FUSEKI_HOST}:3030/bir/update"
 FUSEKI_QUERY_URL = f"http://{FUSEKI_HOST}:3030/bir/query"
+FUSEKI_DATA_URL = f"http://{FUSEKI_HOST}:3030/bir/data?default"
+CHECKPOINT_DIR = os.getenv('ETL_CHECKPOINT_DIR', '/app/cache/etl')
+FUSEKI_WORKERS = int(os.getenv('FUSEKI_WORKERS', '4'))
+# update = INSERT DATA batches, file = N-Triples dump + Graph Store upload, dump = doar fișierul (tdbloader offline)
+FUSEKI_LOAD_MODE = os.getenv('FUSEKI_LOAD_MODE', 'update')
+DUMP_DIR = os.getenv('ETL_DUMP_DIR', '/app/cache/dumps')
+# Pagini în așteptare între două etape ETL (extract -> transform -> redis -> fuseki)
+ETL_QUEUE_SIZE = int(os.getenv('ETL_QUEUE_SIZE', '4'))
 
 # Conexiune Redis
 try:
@@ -35,331 +50,299 @@ except:
     print("⚠️ Redis not available", file=sys.stderr)
     cache = None
 
-wikidata = SPARQLWrapper("https://query.wikidata.org/sparql")
-wikidata.setReturnFormat(JSON)
-wikidata.addCustomHttpHeader("User-Agent", "BiR-StudentProject/1.0")
-
-# --- DATA TRANSFORMATION ---
-def clean(text):
-    """Clean text for RDF insertion"""
-    if not text: return ""
-    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ').replace('\r', ' ').strip()
-
-
-def transform_to_rdf(item):
-    """Transform music data to RDF triples"""
-    try:
-        s = f"<{item['band']['value']}>"
-        triples = []
-
-        # 1. Type
-        triples.append(f'{s} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://schema.org/MusicGroup> .')
-
-        # 2. Name
-        if 'bandLabel' in item:
-            triples.append(f'{s} <http://schema.org/name> "{clean(item["bandLabel"]["value"])}" .')
-
-        # 3. Genre
-        if 'genreLabel' in item:
-            triples.append(f'{s} <http://schema.org/genre> "{clean(item["genreLabel"]["value"])}" .')
-
-        # 4. Location
-        if 'countryLabel' in item:
-            triples.append(f'{s} <http://schema.org/location> "{clean(item["countryLabel"]["value"])}" .')
-
-        # 5. Start Year
-        if 'startYear' in item:
-            triples.append(f'{s} <http://dbpedia.org/ontology/activeYearsStartYear> {item["startYear"]["value"]} .')
-
-        # 6. Membru (Raw Data - un rând per membru)
-        if 'memberLabel' in item:
-            triples.append(f'{s} <http://schema.org/member> "{clean(item["memberLabel"]["value"])}" .')
-
-        # 7. Premiu (Raw Data - un rând per premiu)
-        if 'awardLabel' in item:
-            triples.append(f'{s} <http://schema.org/award> "{clean(item["awardLabel"]["value"])}" .')
-
-        return "\n".join(triples)
-    except Exception as e:
-        return ""
-
-
-def transform_art_to_rdf(item):
-    """Transform art data to RDF triples"""
-    try:
-        artwork_uri = item.get("artwork", {}).get("value", "")
-        if not artwork_uri:
-            return ""
-
-        s = f"<{artwork_uri}>"
-        triples = []
-
-        # 1. Type
-        triples.append(f'{s} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://schema.org/VisualArtwork> .')
-
-        # 2. Name
-        if 'artworkLabel' in item:
-            triples.append(f'{s} <http://schema.org/name> "{clean(item["artworkLabel"]["value"])}" .')
-
-        # 3. Art Type/Form
-        if 'typeLabel' in item:
-            triples.append(f'{s} <http://schema.org/artform> "{clean(item["typeLabel"]["value"])}" .')
-
-        # 4. Creator
-        if 'creatorLabel' in item:
-            triples.append(f'{s} <http://schema.org/creator> "{clean(item["creatorLabel"]["value"])}" .')
-
-        # 5. Art Movement
-        if 'movementLabel' in item:
-            triples.append(f'{s} <http://schema.org/artMovement> "{clean(item["movementLabel"]["value"])}" .')
-
-        # 6. Country/Location Created
-        if 'countryLabel' in item:
-            triples.append(f'{s} <http://schema.org/locationCreated> "{clean(item["countryLabel"]["value"])}" .')
-
-        # 7. Date Created
-        if 'date' in item:
-            date_val = item['date']['value']
-            if date_val and date_val != "N/A":
-                triples.append(f'{s} <http://schema.org/dateCreated> "{date_val}" .')
-
-        # 8. Material
-        if 'materialLabel' in item:
-            triples.append(f'{s} <http://schema.org/material> "{clean(item["materialLabel"]["value"])}" .')
-
-        # 9. Current Location
-        if 'locationLabel' in item:
-            triples.append(f'{s} <http://schema.org/contentLocation> "{clean(item["locationLabel"]["value"])}" .')
-
-        return "\n".join(triples)
-    except Exception as e:
-        return ""
-
-# --- ETL LOGIC ---
-def run_music_etl():
-    """ETL Pipeline for Music Domain"""
-    print("🚀 [MUSIC-ETL] Starting Music Pipeline...", file=sys.stderr)
-
-    # Verificam cache-ul
-    if cache and cache.exists("music:all"):
-        count = cache.llen("music:all")
-        if count > 100:
-            print(f"⚡ [MUSIC-ETL] Data found in Redis ({count} items). Skipping download.", file=sys.stderr)
-            return {"status": "skipped", "message": "Music data already in cache"}
-
-    try:
-        # 1. CITIM QUERY-UL
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        query_path = os.path.join(base_dir, "queries/preload.sparql")
-        
-        with open(query_path, "r") as f:
-            query = f.read()
-        
-        print("-> Downloading from Wikidata (Limit defined in query)...", file=sys.stderr)
-        wikidata.setQuery(query)
-        
-        # AICI SE POATE BLOCA DACĂ LIMITA E PREA MARE (timeout 60s)
-        results = wikidata.query().convert()
-        bindings = results["results"]["bindings"]
-        print(f"📦 [ETL] Extracted {len(bindings)} items (Raw rows).", file=sys.stderr)
-
-        # 2. PROCESARE PENTRU REDIS SI FUSEKI
-        redis_pipeline = cache.pipeline() if cache else None
-        rdf_batch = []
-        seen_bands = set()
-        years_count = sum(1 for item in bindings if 'startYear' in item)
-        print(f"   -> Items with startYear: {years_count}/{len(bindings)}", file=sys.stderr)
-
-        for idx, item in enumerate(bindings):
-            # RDF pt Fuseki (Adăugăm TOT, inclusiv duplicatele pt membri/premii)
-            rdf = transform_to_rdf(item)
-            if rdf: rdf_batch.append(rdf)
-
-            # Debug: Print first RDF item
-            if idx == 0 and rdf:
-                print(f"   -> Sample RDF (first item):\n{rdf[:500]}", file=sys.stderr)
-            
-            # JSON pt Redis (Aici păstrăm lista curată, UNICĂ, doar ID-ul trupei pt Search)
-            band_id = item["band"]["value"]
-            if band_id not in seen_bands:
-                simple_obj = {
-                    "id": band_id,
-                    "name": item.get("bandLabel", {}).get("value", "Unknown"),
-                    "genre": item.get("genreLabel", {}).get("value", "Unknown"),
-                    "country": item.get("countryLabel", {}).get("value", "Unknown"),
-                    "year": item.get("startYear", {}).get("value", "N/A")
-                }
-                if redis_pipeline: redis_pipeline.rpush("music:all", json.dumps(simple_obj))
-                seen_bands.add(band_id)
-
-        # 3. INCARCARE IN REDIS
-        if redis_pipeline:
-            cache.delete("music:all") 
-            redis_pipeline.execute()
-            print(f"✅ [ETL] Redis Loaded with {len(seen_bands)} unique bands.", file=sys.stderr)
-
-        # 4. INCARCARE IN FUSEKI
-        print("🔹 Starting Fuseki upload...", file=sys.stderr)
-        
-        chunk_size = 500
-        fuseki_auth = ('admin', 'admin') 
-
-        for i in range(0, len(rdf_batch), chunk_size):
-            chunk = rdf_batch[i:i+chunk_size]
-            chunk = [line for line in chunk if line.strip()] # Eliminam linii goale
-            
-            if not chunk: continue
-
-            update_query = f"INSERT DATA {{ {' '.join(chunk)} }}"
-            
+# Index de căutare in-process, reconstruit după fiecare ETL și înlocuit atomic
+SEARCH_INDEXES = {}
+# Index de autocomplete (typeahead), construit odată cu cel de căutare
+SUGGEST_INDEXES = {}
+_index_lock = threading.Lock()
+# Durata fiecărei etape la ultima rulare ETL, per domeniu (/health)
+LAST_ETL_TIMINGS = {}
+
+# --- SEARCH INDEX ---
+def rebuild_search_index(domain):
+    """Build a fresh search index from the Redis catalogue and swap it in"""
+    if not cache:
+        return None
+
+    with _index_lock:
+        docs = [json.loads(d) for d in cache.lrange(f"{domain}:all", 0, -1)]
+        if not docs:
+            return SEARCH_INDEXES.get(domain)
+
+        return install_search_index(domain, docs, "redis")
+
+
+def install_search_index(domain, docs, source):
+    index = SearchIndex(docs, redis_index.SEARCH_FIELDS[domain])
+    suggest = SuggestIndex.from_docs(docs, SUGGEST_FIELDS[domain])
+    # Înlocuire atomică a referinței: cererile în curs folosesc indexul vechi
+    SEARCH_INDEXES[domain] = index
+    SUGGEST_INDEXES[domain] = suggest
+    print(f"🔎 [SEARCH] {domain} index built from {source}: {index.stats()}, suggest: {suggest.stats()}",
+          file=sys.stderr)
+    return index
+
+
+def restore_search_indexes():
+    """Search / typeahead from the local catalogue files (last good snapshot) until the ETL rebuilds them"""
+    for domain in DOMAINS:
+        with _index_lock:
+            if domain in SEARCH_INDEXES:
+                continue
             try:
-                resp = requests.post(
-                    FUSEKI_UPDATE_URL, 
-                    data={'update': update_query}, 
-                    auth=fuseki_auth
-                )
-                
-                if resp.status_code != 200:
-                    print(f"⚠️ Batch {i} Error: {resp.status_code}", file=sys.stderr)
-                else:
-                    print(".", end="", file=sys.stderr, flush=True)
-
+                table = columnar.load_file(domain)
             except Exception as e:
-                print(f"⚠️ Net Error: {e}", file=sys.stderr)
-
-        print("\n✅ [MUSIC-ETL] Fuseki Knowledge Graph Ready.", file=sys.stderr)
-        return {"status": "success", "items": len(bindings)}
-
-    except Exception as e:
-        print(f"❌ [MUSIC-ETL] Error: {e}", file=sys.stderr)
-        return {"status": "error", "message": str(e)}
-
+                print(f"⚠️ [SEARCH] {domain} catalogue file unusable: {e}", file=sys.stderr)
+                continue
+            if table is not None and len(table):
+                install_search_index(domain, list(table.docs()), f"catalogue file (version {table.version})")
+
+
+def search_domain(domain, q, limit=50):
+    """
+    Search through the in-process index; until the ETL has built it,
+    answer from the Redis-side token index instead of scanning the list.
+    """
+    index = SEARCH_INDEXES.get(domain)
+    if index is not None:
+        return index.search(q, limit=limit)
+
+    if not q.strip():
+        return [json.loads(d) for d in cache.lrange(f"{domain}:all", 0, limit - 1)]
+    return redis_index.search(cache, domain, q, limit=limit)
+
+
+def suggest_domain(domain, q, limit):
+    """Typeahead for one domain; names from the Redis index until the ETL has built the in-process one"""
+    index = SUGGEST_INDEXES.get(domain)
+    if index is not None:
+        results = index.suggest(q, limit=limit)
+    elif not cache:
+        results = []
+    else:
+        kind = SUGGEST_FIELDS[domain][0][1]
+        results = [{"text": name, "type": kind, "count": 1}
+                   for name in redis_index.complete_names(cache, domain, q, limit=limit)]
+    for r in results:
+        r["domain"] = domain
+    return results
 
-def run_art_etl():
-    """ETL Pipeline for Art Domain"""
-    print("🎨 [ART-ETL] Starting Art Pipeline...", file=sys.stderr)
 
-    # Verificam cache-ul
-    if cache and cache.exists("art:all"):
-        count = cache.llen("art:all")
+# --- ETL LOGIC ---
+def publish_derived(domain):
+    """
+    Steps that only read the published <domain>:all, run in parallel (each a no-op when already up to date):
+    search / typeahead indexes, /stats aggregates and the columnar snapshot (Redis + local mmap file).
+    Returns their timings.
+    """
+    if not cache:
+        return {}
+    return etl_pipeline.run_parallel({
+        "search": lambda: rebuild_search_index(domain),
+        "stats": lambda: aggregates.materialize(cache, domain),
+        "snapshot": lambda: columnar.publish_snapshot(cache, domain, directory=columnar.CATALOGUE_DIR)
+    }, tag=DOMAINS[domain].tag)
+
+
+def dump_path(domain):
+    return os.path.join(DUMP_DIR, f"{domain}.nt.gz")
+
+
+def fuseki_loader(tag, domain, pager):
+    """Triple sink shared by the pages of one ETL run, chosen by FUSEKI_LOAD_MODE"""
+    if FUSEKI_LOAD_MODE in ("file", "dump"):
+        return NTriplesDumpLoader(
+            dump_path(domain),
+            data_url=FUSEKI_DATA_URL if FUSEKI_LOAD_MODE == "file" else None,
+            resume_from=pager.state.get("dump_bytes") if pager.resumed else None,
+            tag=tag
+        )
+    return FusekiBulkLoader(FUSEKI_UPDATE_URL, auth=('admin', 'admin'), workers=FUSEKI_WORKERS, tag=tag)
+
+
+def fuseki_is_empty(definition):
+    """Fuseki lost (or never got) this domain: the next load must insert every entity, whatever Redis says"""
+    if FUSEKI_LOAD_MODE == "dump":
+        return False
+    count = count_subjects(FUSEKI_QUERY_URL, definition.rdf_type)
+    return count is not None and count <= 100
+
+
+def build_entity(definition, rows):
+    """
+    Collapse the Wikidata rows of one entity (one row per member/award/material...)
+    into its Redis object, its RDF triples and their fingerprints.
+    """
+    obj, triples = definition.to_entity(rows)
+    return {"obj": obj, "triples": triples, "fp": fingerprint(obj), "rdf_fp": triples_fingerprint(triples)}
+
+
+def stage_redis(entities, delta):
+    """Redis staging + index of a batch; returns (dirty ids, changed ids) for the Fuseki load"""
+    if not delta:
+        return {e["obj"]["id"] for e in entities}, []
+    new_ids, changed_ids = delta.stage(entities)
+    return set(new_ids) | set(changed_ids), changed_ids
+
+
+def load_fuseki(entities, dirty, changed_ids, loader, full_dump):
+    """Fuseki DELETE/INSERT of the dirty subjects of a batch (blocks until the batch is loaded)"""
+    # Subiectele modificate se șterg înainte de a reinsera tripletele noi
+    if changed_ids and FUSEKI_LOAD_MODE != "dump":
+        delete_subjects(FUSEKI_UPDATE_URL, changed_ids)
+
+    for entity in entities:
+        # Dump-ul de fișier rămâne complet (replay), update-ul trimite doar delta
+        if full_dump or entity["obj"]["id"] in dirty:
+            loader.add(entity["triples"])
+    loader.flush()
+
+
+def run_domain_etl(domain, force=False):
+    """
+    Incremental ETL pipeline for one domain (music / art): extract -> transform -> redis -> fuseki
+    run as concurrent stages over bounded queues (see etl_pipeline.py), then publish and the derived steps.
+    """
+    definition = DOMAINS[domain]
+    tag = definition.tag
+    print(f"{definition.icon} [{tag}] Starting {domain.capitalize()} Pipeline...", file=sys.stderr)
+    started = time.time()
+
+    # Verificam cache-ul (și Fuseki: dacă a fost golit, datele din Redis nu ajung)
+    fuseki_empty = fuseki_is_empty(definition)
+    if not force and not fuseki_empty and cache and cache.exists(f"{domain}:all"):
+        count = cache.llen(f"{domain}:all")
         if count > 100:
-            print(f"⚡ [ART-ETL] Data found in Redis ({count} items). Skipping download.", file=sys.stderr)
-            return {"status": "skipped", "message": "Art data already in cache"}
+            print(f"⚡ [{tag}] Data found in Redis ({count} items). Skipping download.", file=sys.stderr)
+            timings = publish_derived(domain)
+            LAST_ETL_TIMINGS[domain] = dict(timings, total={"seconds": round(time.time() - started, 2)})
+            return {"status": "skipped", "message": f"{domain.capitalize()} data already in cache",
+                    "timings": LAST_ETL_TIMINGS[domain]}
 
     try:
-        # 1. CITIM QUERY-UL pentru Art
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        query_path = os.path.join(base_dir, "queries/art_preload.sparql")
-
-        with open(query_path, "r") as f:
-            query = f.read()
-
-        print("-> Downloading artworks from Wikidata...", file=sys.stderr)
-        wikidata.setQuery(query)
-
-        results = wikidata.query().convert()
-        bindings = results["results"]["bindings"]
-        print(f"📦 [ART-ETL] Extracted {len(bindings)} artworks (Raw rows).", file=sys.stderr)
-
-        # 2. PROCESARE PENTRU REDIS SI FUSEKI
-        redis_pipeline = cache.pipeline() if cache else None
-        rdf_batch = []
-        seen_artworks = set()
-
-        for idx, item in enumerate(bindings):
-            # RDF pt Fuseki
-            rdf = transform_art_to_rdf(item)
-            if rdf: rdf_batch.append(rdf)
-
-            if idx == 0 and rdf:
-                print(f"   -> Sample RDF (first item):\n{rdf[:500]}", file=sys.stderr)
-
-            # JSON pt Redis (unică per artwork ID)
-            artwork_id = item.get("artwork", {}).get("value", "")
-            if artwork_id and artwork_id not in seen_artworks:
-                simple_obj = {
-                    "id": artwork_id,
-                    "name": item.get("artworkLabel", {}).get("value", "Unknown"),
-                    "type": item.get("typeLabel", {}).get("value", "Unknown"),
-                    "creator": item.get("creatorLabel", {}).get("value", "Unknown"),
-                    "movement": item.get("movementLabel", {}).get("value", "Unknown"),
-                    "country": item.get("countryLabel", {}).get("value", "Unknown"),
-                    "date": item.get("date", {}).get("value", "N/A"),
-                    "material": item.get("materialLabel", {}).get("value", "Unknown"),
-                    "location": item.get("locationLabel", {}).get("value", "Unknown")
-                }
-                if redis_pipeline: redis_pipeline.rpush("art:all", json.dumps(simple_obj))
-                seen_artworks.add(artwork_id)
-
-        # 3. INCARCARE IN REDIS
-        if redis_pipeline:
-            cache.delete("art:all")
-            redis_pipeline.execute()
-            print(f"✅ [ART-ETL] Redis Loaded with {len(seen_artworks)} unique artworks.", file=sys.stderr)
-
-        # 4. INCARCARE IN FUSEKI
-        print("🔹 Starting Fuseki upload for art...", file=sys.stderr)
-
-        chunk_size = 500
-        fuseki_auth = ('admin', 'admin')
-
-        for i in range(0, len(rdf_batch), chunk_size):
-            chunk = rdf_batch[i:i+chunk_size]
-            chunk = [line for line in chunk if line.strip()]
-
-            if not chunk: continue
-
-            update_query = f"INSERT DATA {{ {' '.join(chunk)} }}"
-
-            try:
-                resp = requests.post(
-                    FUSEKI_UPDATE_URL,
-                    data={'update': update_query},
-                    auth=fuseki_auth
-                )
-
-                if resp.status_code != 200:
-                    print(f"⚠️ Batch {i} Error: {resp.status_code}", file=sys.stderr)
-                else:
-                    print(".", end="", file=sys.stderr, flush=True)
-
-            except Exception as e:
-                print(f"⚠️ Net Error: {e}", file=sys.stderr)
-
-        print("\n✅ [ART-ETL] Fuseki Knowledge Graph Ready.", file=sys.stderr)
-        return {"status": "success", "items": len(bindings)}
+        # 1. CITIM QUERY-UL (shared/queries/, declarat în shared/models.py)
+        query = definition.read_query()
+
+        # Extragere paginată (ORDER BY + OFFSET), reluabilă din checkpoint
+        id_var = definition.id_var
+        pager = WikidataPager(query, order_by=definition.order_by,
+                              checkpoint=Checkpoint(domain, cache=cache, directory=CHECKPOINT_DIR))
+        if fuseki_empty:
+            print(f"⚠️ [{tag}] Fuseki has no {definition.label}: every entity is loaded again", file=sys.stderr)
+        delta = RedisDelta(cache, domain, resume_staged=pager.state.get("staged") if pager.resumed else None,
+                           fuseki_empty=fuseki_empty) if cache else None
+        loader = fuseki_loader(tag, domain, pager)
+        full_dump = isinstance(loader, NTriplesDumpLoader)
+
+        print(f"-> Downloading from Wikidata in pages of {pager.page_size} (max {pager.max_rows})...", file=sys.stderr)
+
+        # 2. TRANSFORM: rândurile vin sortate după entitate; ultima entitate a paginii poate continua
+        # pe pagina următoare, așa că rămâne "pending" (și e salvată în checkpoint)
+        pending = pager.state.get("pending", [])
+        show_sample = not pager.resumed
+
+        def transform(page):
+            nonlocal pending, show_sample
+            offset, rows = page
+            entities = []
+            for item in rows:
+                entity_id = item.get(id_var, {}).get("value", "")
+                if not entity_id:
+                    continue
+                if pending and pending[0][id_var]["value"] != entity_id:
+                    entities.append(build_entity(definition, pending))
+                    pending = []
+                pending.append(item)
+            if show_sample and entities:
+                show_sample = False
+                print(f"   -> Sample RDF (first item):\n{chr(10).join(entities[0]['triples'])[:500]}", file=sys.stderr)
+            return {"offset": offset, "entities": entities, "pending": list(pending)}
+
+        def transform_end():
+            # Ultima entitate (nu mai continuă pe nicio pagină)
+            if not pending:
+                return None
+            return {"offset": None, "entities": [build_entity(definition, pending)], "pending": [], "last": True}
+
+        # 3. INCARCARE IN REDIS (staging)
+        def redis_stage(batch):
+            batch["dirty"], batch["changed"] = stage_redis(batch["entities"], delta)
+            # Lungimea staging-ului după acest batch: checkpoint-ul paginii o reține, nu una ulterioară
+            batch["staged"] = delta.staged() if delta else None
+            return batch
+
+        # 4. INCARCARE IN FUSEKI + checkpoint (abia acum pagina e complet procesată)
+        def fuseki_stage(batch):
+            load_fuseki(batch["entities"], batch["dirty"], batch["changed"], loader, full_dump)
+            if delta:
+                pager.state["staged"] = batch["staged"]
+            if full_dump:
+                pager.state["dump_bytes"] = loader.position
+            pager.state["pending"] = batch["pending"]
+            pager.state["entities"] = pager.state.get("entities", 0) + len(batch["entities"])
+            if not batch.get("last"):
+                pager.commit(batch["offset"])
+                print(f"📦 [{tag}] {batch['offset']} rows, {pager.state['entities']} unique {definition.label} so far",
+                      file=sys.stderr)
+
+        timings = etl_pipeline.Pipeline(tag, queue_size=ETL_QUEUE_SIZE) \
+            .source("extract", pager.fetch()) \
+            .stage("transform", transform, end=transform_end) \
+            .stage("redis", redis_stage) \
+            .stage("fuseki", fuseki_stage) \
+            .run()
+        timings = etl_pipeline.rounded(timings)
+
+        # 5. ENTITĂȚI DISPĂRUTE + PUBLICARE ATOMICĂ (RENAME staging -> live)
+        publish_start = time.time()
+        removed = delta.removed_ids() if delta else []
+        if removed and FUSEKI_LOAD_MODE != "dump":
+            delete_subjects(FUSEKI_UPDATE_URL, removed)
+        fuseki_report = loader.close()
+
+        changes = delta.publish(removed) if delta else {}
+        pager.finish()
+        timings["publish"] = {"seconds": round(time.time() - publish_start, 2)}
+
+        # 6. DERIVATE (index de căutare, agregate /stats, snapshot columnar) în paralel
+        timings.update(publish_derived(domain))
+        timings["total"] = {"seconds": round(time.time() - started, 2)}
+        LAST_ETL_TIMINGS[domain] = timings
+
+        print(f"✅ [{tag}] Redis published {pager.state.get('entities', 0)} unique {definition.label}: {changes}", file=sys.stderr)
+        print(f"✅ [{tag}] Fuseki Knowledge Graph Ready: {fuseki_report}", file=sys.stderr)
+        print(f"⏱️ [{tag}] {etl_pipeline.format_timings(timings)}", file=sys.stderr)
+        return {"status": "success", "items": pager.rows, "changes": changes, "fuseki": fuseki_report,
+                "timings": timings}
 
     except Exception as e:
-        print(f"❌ [ART-ETL] Error: {e}", file=sys.stderr)
+        print(f"❌ [{tag}] Error: {e}", file=sys.stderr)
         return {"status": "error", "message": str(e)}
 
 
-def run_unified_etl():
-    """Run ETL for both Music and Art domains"""
+def run_unified_etl(force=False):
+    """Run the ETL pipeline of every registered domain concurrently"""
     print("=" * 60, file=sys.stderr)
-    print("🚀 [UNIFIED-ETL] Starting Unified ETL Pipeline", file=sys.stderr)
+    print(f"🚀 [UNIFIED-ETL] Starting Unified ETL Pipeline ({' + '.join(DOMAINS)} in parallel)", file=sys.stderr)
     print("=" * 60, file=sys.stderr)
 
-    results = {}
-
-    # Run Music ETL
-    music_result = run_music_etl()
-    results['music'] = music_result
-
-    # Run Art ETL
-    art_result = run_art_etl()
-    results['art'] = art_result
+    started = time.time()
+    results = etl_pipeline.run_domains({domain: (lambda d=domain: run_domain_etl(d, force=force))
+                                        for domain in DOMAINS})
 
     print("=" * 60, file=sys.stderr)
-    print("✅ [UNIFIED-ETL] Pipeline Complete!", file=sys.stderr)
-    print(f"   Music: {music_result.get('status')}", file=sys.stderr)
-    print(f"   Art: {art_result.get('status')}", file=sys.stderr)
+    print(f"✅ [UNIFIED-ETL] Pipeline Complete in {time.time() - started:.1f}s!", file=sys.stderr)
+    for domain, result in results.items():
+        print(f"   {domain.capitalize()}: {result.get('status')}", file=sys.stderr)
+        if result.get("timings"):
+            print(f"      {etl_pipeline.format_timings(result['timings'])}", file=sys.stderr)
     print("=" * 60, file=sys.stderr)
 
     return results
 
 def background_etl():
-    """Background thread to run unified ETL"""
+    """Background thread: serve search from the last good catalogue, then run the unified ETL"""
+    restore_search_indexes()
     run_unified_etl()
 
 if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
@@ -368,60 +351,66 @@ if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
 # --- ENDPOINTS ---
 @app.route('/health')
 def health():
-    """Health check endpoint with status for both domains"""
-    music_count = cache.llen("music:all") if cache else 0
-    art_count = cache.llen("art:all") if cache else 0
+    """Health check endpoint with status for every domain"""
+    counts = {domain: cache.llen(f"{domain}:all") if cache else 0 for domain in DOMAINS}
     return jsonify({
         "service": "SPARQL Service (Unified ETL)",
         "redis_connected": cache is not None,
-        "music_items": music_count,
-        "art_items": art_count,
-        "total_items": music_count + art_count
+        "music_items": counts.get("music", 0),
+        "art_items": counts.get("art", 0),
+        "items": counts,
+        "total_items": sum(counts.values()),
+        "search_index": {domain: index.stats() for domain, index in SEARCH_INDEXES.items()},
+        "suggest_index": {domain: index.stats() for domain, index in SUGGEST_INDEXES.items()},
+        "etl_timings": LAST_ETL_TIMINGS
     })
 
 @app.route('/etl/refresh', methods=['POST'])
 def force_refresh():
-    """Force refresh of both music and art data"""
-    if cache:
-        cache.delete("music:all")
-        cache.delete("art:all")
-    result = run_unified_etl()
+    """Force refresh of every domain (old snapshot stays live until the new one is published)"""
+    result = run_unified_etl(force=True)
+    return jsonify(result)
+
+@app.route('/etl/replay', methods=['POST'])
+def replay_dump():
+    """Reload Fuseki from the N-Triples dumps of the last ETL run (no Wikidata download)"""
+    domains = request.args.getlist('domain') or list(DOMAINS)
+    result = {}
+    for domain in domains:
+        path = dump_path(domain)
+        if not os.path.exists(path):
+            result[domain] = {"uploaded": False, "error": f"No dump at {path}"}
+            continue
+        result[domain] = upload_ntriples(path, FUSEKI_DATA_URL, tag=f"{domain.upper()}-REPLAY")
     return jsonify(result)
 
-@app.route('/search/music', methods=['GET'])
-def search_music():
-    q = request.args.get('q', '').lower()
-    if not cache: return jsonify({"error": "Database offline"}), 503
-
-    raw_data = cache.lrange("music:all", 0, -1)
-    results = []
-    
-    for d in raw_data:
-        obj = json.loads(d)
-        if q in obj['name'].lower() or q in obj['genre'].lower():
-            results.append(obj)
-            if len(results) >= 50: break
-    return jsonify(results)
-
-
-@app.route('/search/art', methods=['GET'])
-def search_art():
-    """Search artworks in Redis cache"""
-    q = request.args.get('q', '').lower()
-    if cache and cache.exists("art:all"):
-        raw = cache.lrange("art:all", 0, -1)
-        res = []
-        for d in raw:
-            obj = json.loads(d)
-            if (q in obj['name'].lower() or
-                q in obj['creator'].lower() or
-                q in obj['movement'].lower() or
-                q in obj['type'].lower()):
-                res.append(obj)
-                if len(res) >= 50:
-                    break
-        return jsonify(res)
-    return jsonify([])
+@app.route('/search/<domain>', methods=['GET'])
+def search(domain):
+    """Search one domain (/search/music, /search/art, ...) using the in-process inverted index"""
+    if domain not in DOMAINS:
+        return jsonify({"error": f"Unknown domain: {domain}"}), 404
+    q = request.args.get('q', '')
+    if not cache and domain not in SEARCH_INDEXES: return jsonify({"error": "Database offline"}), 503
+
+    return jsonify(search_domain(domain, q))
+
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    """Typeahead over band names, genres, artwork titles, creators and movements (most popular first)"""
+    q = request.args.get('q', '')
+    if not q.strip() or (not cache and not SUGGEST_INDEXES):
+        return jsonify([])
+
+    domain = request.args.get('domain', 'all')
+    domains = list(SUGGEST_FIELDS) if domain == 'all' else [domain]
+    if any(d not in SUGGEST_FIELDS for d in domains):
+        return jsonify({"error": f"Unknown domain: {domain}"}), 400
+    limit = min(max(request.args.get('limit', SUGGEST_MAX_LIMIT, type=int), 1), SUGGEST_MAX_LIMIT)
+
+    results = [r for d in domains for r in suggest_domain(d, q, limit)]
+    results.sort(key=lambda r: (-r["count"], len(r["text"])))
+    return jsonify(results[:limit])
 
 
 if __name__ == '__main__':
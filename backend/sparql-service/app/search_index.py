@@ -0,0 +1,128 @@
+"""
+In-process search index for the music and art catalogues.
+
+The index is immutable once built: the ETL builds a fresh instance from the
+Redis catalogue and swaps the module-level reference in main.py, so readers
+never see a half-built index.
+"""
+from array import array
+from bisect import bisect_left
+
+from shared.utils import TOKEN_RE, tokenize
+
+NGRAM = 3
+
+
+def ngrams(text, n=NGRAM):
+    """Set of character n-grams of an already lowercased string"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _contains(postings, doc_id):
+    """Binary search in a sorted posting list"""
+    i = bisect_left(postings, doc_id)
+    return i < len(postings) and postings[i] == doc_id
+
+
+class SearchIndex:
+    """
+    Inverted index over a list of catalogue objects.
+
+    - token index: token -> sorted doc ids, with a sorted vocabulary for prefix lookups
+    - n-gram index: trigram -> sorted doc ids, used for substring matching
+    Doc ids are positions in the original list, so results keep catalogue order.
+    """
+
+    def __init__(self, docs, fields):
+        self.docs = list(docs)
+        self.fields = tuple(fields)
+        self._values = []
+        tokens = {}
+        grams = {}
+
+        for doc_id, doc in enumerate(self.docs):
+            values = tuple((doc.get(f) or "").lower() for f in self.fields)
+            self._values.append(values)
+
+            doc_tokens = set()
+            doc_grams = set()
+            for value in values:
+                doc_tokens.update(TOKEN_RE.findall(value))
+                doc_grams.update(ngrams(value))
+
+            # doc ids are increasing, so posting lists come out sorted
+            for tok in doc_tokens:
+                tokens.setdefault(tok, []).append(doc_id)
+            for gram in doc_grams:
+                grams.setdefault(gram, []).append(doc_id)
+
+        self._tokens = {k: array("I", v) for k, v in tokens.items()}
+        self._grams = {k: array("I", v) for k, v in grams.items()}
+        self._vocab = sorted(self._tokens)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def stats(self):
+        return {
+            "documents": len(self.docs),
+            "tokens": len(self._vocab),
+            "ngrams": len(self._grams)
+        }
+
+    def _prefix_ids(self, prefix):
+        """Union of postings for every vocabulary token starting with prefix"""
+        ids = set()
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            ids.update(self._tokens[self._vocab[i]])
+            i += 1
+        return ids
+
+    def _substring_candidates(self, q):
+        """Doc ids containing every trigram of q, in ascending order"""
+        postings = []
+        for gram in ngrams(q):
+            p = self._grams.get(gram)
+            if p is None:
+                return
+            postings.append(p)
+        postings.sort(key=len)
+
+        smallest, rest = postings[0], postings[1:]
+        for doc_id in smallest:
+            if all(_contains(p, doc_id) for p in rest):
+                yield doc_id
+
+    def search(self, q, limit=50):
+        """
+        Substring search with the same semantics as the old linear scan
+        (q contained in any indexed field). Queries shorter than a trigram
+        fall back to token prefix matching.
+        """
+        q = (q or "").strip().lower()
+        if not q:
+            return self.docs[:limit]
+
+        results = []
+        if len(q) >= NGRAM:
+            for doc_id in self._substring_candidates(q):
+                # trigrams may come from different fields -> verify the real match
+                if any(q in value for value in self._values[doc_id]):
+                    results.append(self.docs[doc_id])
+                    if len(results) >= limit:
+                        break
+            return results
+
+        query_tokens = tokenize(q)
+        if not query_tokens:
+            return results
+
+        ids = None
+        for tok in query_tokens:
+            matched = self._prefix_ids(tok)
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                return results
+
+        return [self.docs[doc_id] for doc_id in sorted(ids)[:limit]]
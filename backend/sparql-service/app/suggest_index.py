@@ -0,0 +1,129 @@
+"""
+Typeahead index for the music and art catalogues.
+
+Suggestions are the distinct values of a few fields (band names, artwork
+titles, creators, genres, movements), weighted by popularity: the number of
+catalogue entities carrying the value. Each suggestion is keyed by its
+normalized text and by every later word start ("the beatles" is also found
+under "beatles").
+
+The keys live in one sorted array, so the keys sharing a prefix form a
+contiguous range (a flattened trie). Small ranges are ranked on the fly;
+every prefix whose range is larger than `scan_limit` (the heavy trie nodes)
+gets its best entries precomputed bottom-up at build time. A lookup is one
+dict probe or one bisect plus a scan of at most `scan_limit` entries.
+
+Like SearchIndex it is immutable: main.py builds a fresh one per ETL run and
+swaps the reference.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+from shared.models import DOMAINS
+from shared.utils import is_missing, normalize
+
+# field -> suggestion type
+SUGGEST_FIELDS = {name: domain.suggest for name, domain in DOMAINS.items()}
+
+MAX_CHAR = "\U0010ffff"
+MAX_LIMIT = 10
+MAX_WORD_STARTS = 4
+
+
+class SuggestIndex:
+    def __init__(self, suggestions, scan_limit=256, keep=MAX_LIMIT * 2):
+        """suggestions: {(text, type): count}"""
+        self.scan_limit = scan_limit
+        self.keep = keep
+        self._texts = []
+        self._types = []
+        self._counts = array("I")
+
+        entries = []
+        for (text, kind), count in suggestions.items():
+            sid = len(self._texts)
+            self._texts.append(text)
+            self._types.append(kind)
+            self._counts.append(count)
+            words = normalize(text).split(" ")
+            for i in range(min(len(words), MAX_WORD_STARTS)):
+                # (key, rank tuple, suggestion id); later word starts rank below the full text
+                entries.append((" ".join(words[i:]), (-count, i > 0, len(text), text), sid))
+
+        entries.sort(key=lambda e: e[0])
+        order = sorted(range(len(entries)), key=lambda i: entries[i][1])
+        self._rank = array("I", [0]) * len(entries)
+        for rank, i in enumerate(order):
+            self._rank[i] = rank
+        self._keys = [e[0] for e in entries]
+        self._targets = array("I", (e[2] for e in entries))
+
+        self._heavy = {}
+        self._build("", 0, len(self._keys))
+
+    @classmethod
+    def from_docs(cls, docs, fields, **kwargs):
+        # (normalized value, type) -> [first spelling seen, count]
+        counts = {}
+        for doc in docs:
+            for field, kind in fields:
+                value = doc.get(field)
+                if not is_missing(value):
+                    entry = counts.setdefault((normalize(value), kind), [" ".join(str(value).split()), 0])
+                    entry[1] += 1
+        return cls({(text, kind): count for (_, kind), (text, count) in counts.items()}, **kwargs)
+
+    def _best(self, positions):
+        return heapq.nsmallest(self.keep, positions, key=self._rank.__getitem__)
+
+    def _build(self, prefix, lo, hi):
+        """Best entries of keys[lo:hi] (all starting with prefix), recording the heavy prefixes"""
+        if hi - lo <= self.scan_limit:
+            return self._best(range(lo, hi))
+
+        depth = len(prefix)
+        best = []
+        i = lo
+        while i < hi and len(self._keys[i]) == depth:
+            best.append(i)
+            i += 1
+        while i < hi:
+            child = self._keys[i][:depth + 1]
+            j = bisect_left(self._keys, child + MAX_CHAR, i, hi)
+            best.extend(self._build(child, i, j))
+            i = j
+
+        top = self._best(best)
+        self._heavy[prefix] = array("I", top)
+        return top
+
+    def __len__(self):
+        return len(self._texts)
+
+    def stats(self):
+        return {"suggestions": len(self._texts), "keys": len(self._keys), "heavy_prefixes": len(self._heavy)}
+
+    def suggest(self, q, limit=MAX_LIMIT):
+        """[{"text", "type", "count"}] best first"""
+        prefix = normalize(q)
+        if not prefix:
+            return []
+
+        top = self._heavy.get(prefix)
+        if top is None:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + MAX_CHAR, lo)
+            top = self._best(range(lo, hi))
+
+        results = []
+        seen = set()
+        for entry in top:
+            sid = self._targets[entry]
+            if sid in seen:
+                continue
+            seen.add(sid)
+            results.append({"text": self._texts[sid], "type": self._types[sid], "count": self._counts[sid]})
+            if len(results) >= min(limit, MAX_LIMIT):
+                break
+        return results
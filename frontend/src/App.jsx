@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { apiClient } from './api/client';
+import { apiClient, batchedGet } from './api/client';
 import SemanticCard from './components/SemanticCard';
 import ArtCard from './components/ArtCard';
 import NetworkGraph from './components/NetworkGraph';
@@ -43,6 +43,26 @@ const exportToCSV = (data, filename) => {
   URL.revokeObjectURL(url);
 };
 
+// ========== TYPEAHEAD (/api/suggest, o cerere per tastă) ==========
+const useSuggestions = (query, domain) => {
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    if (query.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    apiClient.get('/api/suggest', { params: { q: query, domain, limit: 8 } })
+      .then(res => { if (!cancelled) setSuggestions(res.data); })
+      .catch(() => {});
+    // Răspunsurile vechi (taste anterioare) nu suprascriu sugestiile curente
+    return () => { cancelled = true; };
+  }, [query, domain]);
+
+  return suggestions;
+};
+
 function App() {
   // ========== TAB STATE ==========
   const [activeTab, setActiveTab] = useState('music');
@@ -59,10 +79,14 @@ function App() {
   const [artStats, setArtStats] = useState({ movements: [], countries: [] });
   const [showGraph, setShowGraph] = useState(false);
 
+  const musicSuggestions = useSuggestions(searchQuery, 'music');
+  const artSuggestions = useSuggestions(artQuery, 'art');
+
   // ========== INITIAL LOAD ==========
   useEffect(() => {
-    apiClient.get('/api/stats').then(res => setStats(res.data)).catch(console.error);
-    apiClient.get('/api/art/stats').then(res => setArtStats(res.data)).catch(console.error);
+    // Ambele pleacă într-un singur round trip (/api/batch)
+    batchedGet('/api/stats').then(res => setStats(res.data)).catch(console.error);
+    batchedGet('/api/art/stats').then(res => setArtStats(res.data)).catch(console.error);
   }, []);
 
   // ========== MUSIC FUNCTIONS (Stefan) ==========
@@ -145,8 +169,14 @@ function App() {
                 value={searchQuery}
                 onChange={(e) => setSearchQuery(e.target.value)}
                 onKeyDown={handleKeyDown}
+                list="music-suggestions"
                 style={{ flex: 1, fontSize: '1.1rem' }}
               />
+              <datalist id="music-suggestions">
+                {musicSuggestions.map(s => (
+                  <option key={`${s.type}:${s.text}`} value={s.text}>{s.type}</option>
+                ))}
+              </datalist>
               <button className="btn" onClick={performSearch} style={{ minWidth: '120px' }}>
                 {isSearching ? 'Searching...' : 'Search'}
               </button>
@@ -209,8 +239,14 @@ function App() {
                 value={artQuery}
                 onChange={e => setArtQuery(e.target.value)}
                 onKeyDown={e => e.key === 'Enter' && searchArt()}
+                list="art-suggestions"
                 style={{ flex: 1, fontSize: '1.1rem' }}
               />
+              <datalist id="art-suggestions">
+                {artSuggestions.map(s => (
+                  <option key={`${s.type}:${s.text}`} value={s.text}>{s.type}</option>
+                ))}
+              </datalist>
               <button className="btn" onClick={searchArt} style={{ minWidth: '120px' }}>
                 Search
               </button>
@@ -8,4 +8,47 @@ export const apiClient = axios.create({
     headers: {
         'Content-Type': 'application/json'
     }
-});
\ No newline at end of file
+});
+// GET-urile pornite în aceeași fereastră scurtă (ex: statisticile la load, sau multe carduri deodată)
+// pleacă împreună într-un singur POST /api/batch. O cerere singură rămâne un GET normal (ETag / 304).
+const BATCH_WINDOW_MS = 10;
+const BATCH_MAX = 100;
+let batchQueue = [];
+let batchTimer = null;
+
+const flushBatch = async () => {
+    const pending = batchQueue;
+    batchQueue = [];
+    batchTimer = null;
+
+    if (pending.length === 1) {
+        const { url, resolve, reject } = pending[0];
+        apiClient.get(url).then(resolve, reject);
+        return;
+    }
+
+    for (let start = 0; start < pending.length; start += BATCH_MAX) {
+        const chunk = pending.slice(start, start + BATCH_MAX);
+        try {
+            const res = await apiClient.post('/api/batch', {
+                requests: chunk.map((p, i) => ({ id: i, path: p.url }))
+            });
+            res.data.responses.forEach((r, i) => {
+                if (r.status >= 200 && r.status < 300) {
+                    chunk[i].resolve({ data: r.body, status: r.status });
+                } else {
+                    const err = new Error(`Request failed with status code ${r.status}`);
+                    err.response = { status: r.status, data: r.body };
+                    chunk[i].reject(err);
+                }
+            });
+        } catch (err) {
+            chunk.forEach(p => p.reject(err));
+        }
+    }
+};
+
+export const batchedGet = (url) => new Promise((resolve, reject) => {
+    batchQueue.push({ url, resolve, reject });
+    if (!batchTimer) batchTimer = setTimeout(flushBatch, BATCH_WINDOW_MS);
+});
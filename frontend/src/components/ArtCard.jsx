@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { apiClient } from '../api/client';
+import { batchedGet } from '../api/client';
 
 const ArtCard = ({ item }) => {
   const [showSimilars, setShowSimilars] = useState(false);
@@ -18,7 +18,7 @@ const ArtCard = ({ item }) => {
 
     try {
       console.log("Fetching similar artworks for:", item.name);
-      const res = await apiClient.get(`/api/art/recommend?artwork_name=${encodeURIComponent(item.name)}`);
+      const res = await batchedGet(`/api/art/recommend?artwork_name=${encodeURIComponent(item.name)}`);
       console.log("Response:", res.data);
       setSimilars(res.data || []);
     } catch (err) {
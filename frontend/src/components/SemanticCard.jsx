@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { apiClient } from '../api/client';
+import { batchedGet } from '../api/client';
 
 const SemanticCard = ({ item }) => {
   const [showSimilars, setShowSimilars] = useState(false);
@@ -18,7 +18,7 @@ const SemanticCard = ({ item }) => {
     
     try {
       // Apelăm Gateway-ul care duce la Spark
-      const res = await apiClient.get(`/api/similar?band=${item.name}`);
+      const res = await batchedGet(`/api/similar?band=${item.name}`);
       setSimilars(res.data);
     } catch (err) {
       console.error("Failed to fetch similars", err);
@@ -63,7 +63,7 @@ const SemanticCard = ({ item }) => {
                 <li key={idx} style={styles.listItem}>
                   <span style={{ fontWeight: '600' }}>{sim.name}</span> 
                   <span style={{fontSize: '0.75rem', color: '#94a3b8', marginLeft: '6px'}}>
-                    matches genre: {sim.reason}
+                    {sim.reason}
                   </span>
                 </li>
               ))}